@@ -0,0 +1,96 @@
+"""
+Benchmarks of the quiz engine hot paths against one bank, the bank is
+selected with QUIZ_DATA_FILE before src.quiz is imported (see run.py)
+
+    QUIZ_DATA_FILE=bank.json python -m benchmarks.bench_quiz results.json
+"""
+import json
+import random
+import statistics
+import sys
+import time
+from typing import Callable
+
+
+def measure(fn: Callable[[int], object], repeat: int) -> dict:
+    """
+    calls fn(i) `repeat` times and returns the timings in microseconds
+    """
+    timings = []
+    for i in range(repeat):
+        start = time.perf_counter_ns()
+        fn(i)
+        timings.append((time.perf_counter_ns() - start) / 1000)
+    timings.sort()
+    return {
+        "n": repeat,
+        "mean_us": statistics.fmean(timings),
+        "min_us": timings[0],
+        "p50_us": timings[len(timings) // 2],
+        "p95_us": timings[int(len(timings) * 0.95)],
+        "p99_us": timings[int(len(timings) * 0.99)],
+    }
+
+
+def once(us: float) -> dict:
+    """
+    timing of an operation that is measured once
+    """
+    return {"n": 1, "mean_us": us, "min_us": us, "p50_us": us, "p95_us": us, "p99_us": us}
+
+
+def run() -> dict:
+    results = {}
+    start = time.perf_counter_ns()
+    from src import quiz
+    engine = quiz.default_engine()
+    # the search index and the analytics are built on threads, let them finish so they do not
+    # skew the timings (import_quiz includes building them, the bank has no search cache yet)
+    engine._search_index.result()
+    engine._analytics.result()
+    results["import_quiz"] = once((time.perf_counter_ns() - start) / 1000)
+
+    rng = random.Random(0)
+    size = len(engine.store)
+    indexes = [rng.randrange(size) for _ in range(2000)]
+    long_history = max(range(0, size, 1000), key=lambda idx: engine.store.load(idx).get("total_times_question_attempted", 0))
+
+    results["get_random_question"] = measure(lambda _: engine.get_random_question(), 2000)
+    results["progress_summary"] = measure(lambda _: engine.progress_summary(), 200)
+
+    questions = [engine.get_question(idx) for idx in indexes]
+    results["update_probability"] = measure(lambda i: quiz.update_probability(questions[i], i % 2 == 0), 2000)
+    question = engine.get_question(long_history)
+    results["update_probability_long_history"] = measure(lambda i: quiz.update_probability(question, i % 2 == 0), 500)
+    results["long_history_length"] = question.total_times_question_attempted
+
+    with_views = next(
+        (ques for ques in (engine.store.load(idx) for idx in range(size)) if ques.get("views")), engine.store.load(0)
+    )
+    fields = {key: value for key, value in with_views.items() if key in quiz.Question.__dataclass_fields__}
+    results["question_from_dict"] = measure(lambda i: quiz.Question(index=0, **fields), 5000)
+    results["question_to_dict"] = measure(lambda i: question.to_dict(), 5000)
+
+    # per-answer cost: queueing the update on the UI thread and writing it on the persister
+    answered = [quiz.update_probability(questions[i], i % 3 != 0) for i in range(500)]
+    results["update_question_in_file"] = measure(lambda i: engine.update_question_in_file(answered[i]), 500)
+    flush_start = time.perf_counter_ns()
+    engine.flush()
+    results["flush_per_answer"] = once((time.perf_counter_ns() - flush_start) / 1000 / len(answered))
+    dicts = []
+    for ques in answered[:200]:
+        dicts.append((ques.index, quiz.update_probability(ques, True).to_dict()))
+    results["store_save"] = measure(lambda i: engine.store.save(*dicts[i]), 200)
+
+    from src.app import SinlgeQuestion
+    results["single_question_build"] = measure(lambda i: SinlgeQuestion(questions[i], lambda: None).build(), 200)
+    page = SinlgeQuestion(questions[0], lambda: None)
+    page.build()
+    results["single_question_set_question"] = measure(lambda i: page.set_question(questions[i]), 1000)
+    return results
+
+
+if __name__ == "__main__":
+    results = run()
+    with open(sys.argv[1], "w", encoding="utf8") as f:
+        json.dump(results, f, indent=4)
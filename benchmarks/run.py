@@ -0,0 +1,98 @@
+"""
+Runs the quiz engine benchmarks against synthetic banks and writes the
+timings to a json file, so runs of different commits can be compared
+
+    python -m benchmarks.run [--sizes 600 10000 100000] [--output bench_output.json] [--compare old.json]
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.synthetic import write_bank
+
+SIZES = [600, 10_000, 100_000]
+# p50 slow downs above this are reported as regressions by --compare
+REGRESSION_RATIO = 1.2
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_size(size: int) -> dict:
+    """
+    benchmarks a fresh bank of `size` questions in its own process, as
+    src.quiz opens the bank when it is imported
+    """
+    with tempfile.TemporaryDirectory() as folder:
+        bank = write_bank(Path(folder) / "bank.json", size)
+        output = Path(folder) / "results.json"
+        subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_quiz", str(output)],
+            env={**os.environ, "QUIZ_DATA_FILE": str(bank)},
+            check=True,
+        )
+        with open(output, encoding="utf8") as f:
+            return json.load(f)
+
+
+def compare(old: dict, new: dict) -> list[str]:
+    """
+    prints the p50 of both runs side by side, returns the regressions
+    """
+    regressions = []
+    for size, benchmarks in new["results"].items():
+        for name, timing in benchmarks.items():
+            old_timing = old["results"].get(size, {}).get(name)
+            if not isinstance(timing, dict) or not isinstance(old_timing, dict):
+                continue
+            old_p50, new_p50 = old_timing["p50_us"], timing["p50_us"]
+            ratio = new_p50 / old_p50 if old_p50 else float("inf")
+            print(f"{size:>7} {name:<36} {old_p50:>12.1f}us {new_p50:>12.1f}us {ratio:>6.2f}x")
+            if ratio > REGRESSION_RATIO:
+                regressions.append(f"{size} {name}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the quiz engine")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--output", type=Path, default=Path("bench_output.json"))
+    parser.add_argument("--compare", type=Path, help="results of an earlier run to compare against")
+    args = parser.parse_args()
+
+    report = {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "results": {},
+    }
+    for size in args.sizes:
+        print(f"Benchmarking {size} questions")
+        report["results"][str(size)] = run_size(size)
+    with open(args.output, "w", encoding="utf8") as f:
+        json.dump(report, f, indent=4)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf8") as f:
+            regressions = compare(json.load(f), report)
+        if regressions:
+            print("REGRESSIONS:", ", ".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
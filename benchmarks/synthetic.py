@@ -0,0 +1,64 @@
+"""
+Generates synthetic question banks in the data.json format for the benchmarks
+"""
+import json
+import random
+from pathlib import Path
+
+WORDS = (
+    "company application instance bucket region replica database latency storage "
+    "policy role traffic cluster function queue stream backup snapshot gateway "
+    "endpoint subnet availability encryption workload migration capacity cost "
+    "EC2 S3 RDS DynamoDB Lambda SQS SNS Kinesis CloudFront Route53 EBS EFS IAM VPC"
+).split()
+TAGS = ["s3", "ec2", "rds", "vpc", "iam", "lambda", "dynamodb", "networking", "security", "storage"]
+
+
+def _sentence(rng: random.Random, n_words: int) -> str:
+    return " ".join(rng.choices(WORDS, k=n_words)).capitalize() + "."
+
+
+def make_question(rng: random.Random, number: int, history_length: int = 0) -> dict:
+    """
+    returns a question that looks like the scraped ones: a numbered question,
+    4 or 5 options, 1 or 2 answers and now and then tags, views and attempts
+    """
+    n_options = 5 if rng.random() < 0.1 else 4
+    n_answers = 2 if n_options == 5 else 1
+    history = [value < 0.6 for value in (rng.random() for _ in range(history_length))]
+    ques = {
+        "question": f"Question {number}\n\n" + " ".join(_sentence(rng, 14) for _ in range(4)) + "\n\nWhich solution will meet these requirements?\n",
+        "answers": sorted(rng.sample(range(n_options), n_answers)),
+        "options": [_sentence(rng, 25) for _ in range(n_options)],
+        "explination": _sentence(rng, 40),
+        "total_times_question_attempted": len(history),
+        "correct_times_question_attempted": sum(history),
+        "current_probability": rng.random() if history else 0,
+        "attempt_history": history,
+    }
+    if rng.random() < 0.3:
+        ques["tags"] = rng.sample(TAGS, rng.randint(1, 3))
+    if rng.random() < 0.05:
+        ques["views"] = [{
+            "type": "json",
+            "name": "Policy",
+            "value": {"Version": "2012-10-17", "Statement": [{"Effect": "Deny", "Action": "s3:Delete*", "Resource": "*"}]},
+        }]
+    return ques
+
+
+def make_bank(size: int, seed: int = 0, long_history_every: int = 1000, long_history_length: int = 2000) -> list[dict]:
+    """
+    returns `size` questions, every `long_history_every`th question has a long attempt history
+    """
+    rng = random.Random(seed)
+    return [
+        make_question(rng, i + 1, long_history_length if i % long_history_every == 0 else rng.randint(0, 5))
+        for i in range(size)
+    ]
+
+
+def write_bank(path: Path, size: int, seed: int = 0) -> Path:
+    with open(path, "w", encoding="utf8") as f:
+        json.dump(make_bank(size, seed), f, indent=4)
+    return path
@@ -1,7 +1,23 @@
 """
 Entry point for the application.
+
+    python main.py [--trace trace.json]
 """
+import argparse
+
+from src import tracing
+
+parser = argparse.ArgumentParser(description="AWS Solutions Architect Associate Exam Prep")
+parser.add_argument("--trace", help="write the latency trace of the UI to this file (.json or .jsonl)")
+args, _ = parser.parse_known_args()
+if args.trace:
+    # before the app is imported so loading the questions is traced too
+    tracing.enable(args.trace)
+
 import flet as ft
 from src.app import main
+from src.quiz import default_engine
 
 ft.app(main)
+# the engine is closed at exit too, flushing here keeps the progress if that is skipped
+default_engine().flush()
@@ -0,0 +1,229 @@
+"""
+Near-duplicate question detection with shingling and MinHash/LSH.
+
+The same question scraped from the ExamTopics pages and OCR'd from a video
+differs in wording and whitespace, so questions are compared on character
+shingles of their normalized question and option text. MinHash signatures
+and LSH banding keep the comparison near-linear in the number of questions.
+"""
+import hashlib
+import json
+import re
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+
+from src.attempt_history import AttemptHistory
+
+SHINGLE_SIZE = 5
+NUM_PERMUTATIONS = 128
+# 16 bands of 8 rows puts the LSH threshold at (1/16) ** (1/8) ~= 0.7
+NUM_BANDS = 16
+SIMILARITY_THRESHOLD = 0.8
+
+_PRIME = np.uint64(4294967311)  # smallest prime above 2 ** 32
+_HEADER = re.compile(r"^\s*q(uestion)?\s*#?\s*\d+", re.IGNORECASE)
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+@dataclass
+class DuplicateCluster:
+    """
+    Questions that are near-duplicates of each other, `scores` holds the
+    estimated similarity of every matching pair
+    """
+    indexes: list[int]
+    scores: list[tuple[int, int, float]] = field(default_factory=list)
+
+
+def normalize(text: str) -> str:
+    """
+    lower cases the text and drops the question number, whitespace and punctuation
+    """
+    text = _HEADER.sub("", text)
+    return _NON_ALNUM.sub("", text.lower())
+
+
+def question_signature_text(ques: dict) -> str:
+    return normalize(ques.get("question", "")) + "|" + "|".join(
+        normalize(option) for option in ques.get("options", [])
+    )
+
+
+def shingle_hashes(text: str, size: int = SHINGLE_SIZE) -> np.ndarray:
+    """
+    returns the unique 32 bit hashes of the character shingles of the text
+    """
+    shingles = {text[i:i + size] for i in range(max(1, len(text) - size + 1))}
+    return np.fromiter(
+        (int.from_bytes(hashlib.blake2b(s.encode(), digest_size=4).digest(), "little") for s in shingles),
+        dtype=np.uint64,
+        count=len(shingles),
+    )
+
+
+def minhash_signatures(texts: list[str], num_perm: int = NUM_PERMUTATIONS, seed: int = 1) -> np.ndarray:
+    """
+    returns a (len(texts), num_perm) array of MinHash signatures
+    """
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 2 ** 32, size=num_perm, dtype=np.uint64)
+    b = rng.integers(0, 2 ** 32, size=num_perm, dtype=np.uint64)
+    signatures = np.empty((len(texts), num_perm), dtype=np.uint64)
+    for row, text in enumerate(texts):
+        hashes = shingle_hashes(text)
+        # (a * h + b) fits in 64 bits as a, h and b are all below 2 ** 32
+        signatures[row] = ((a[:, None] * hashes[None, :] + b[:, None]) % _PRIME).min(axis=1)
+    return signatures
+
+
+def find_duplicates(
+    questions: list[dict], threshold: float = SIMILARITY_THRESHOLD, num_bands: int = NUM_BANDS
+) -> list[DuplicateCluster]:
+    """
+    returns the clusters of near-duplicate questions, questions without a
+    duplicate are not part of any cluster
+    """
+    if not questions:
+        return []
+    signatures = minhash_signatures([question_signature_text(ques) for ques in questions])
+    rows = signatures.shape[1] // num_bands
+
+    # questions that share a band are candidates
+    candidates: set[tuple[int, int]] = set()
+    for band in range(num_bands):
+        buckets: dict[bytes, list[int]] = {}
+        chunk = signatures[:, band * rows:(band + 1) * rows]
+        for idx in range(len(questions)):
+            buckets.setdefault(chunk[idx].tobytes(), []).append(idx)
+        for members in buckets.values():
+            for i, first in enumerate(members):
+                for second in members[i + 1:]:
+                    candidates.add((first, second))
+
+    parents = list(range(len(questions)))
+
+    def find(idx: int) -> int:
+        while parents[idx] != idx:
+            parents[idx] = parents[parents[idx]]
+            idx = parents[idx]
+        return idx
+
+    matches: list[tuple[int, int, float]] = []
+    for first, second in sorted(candidates):
+        similarity = float(np.mean(signatures[first] == signatures[second]))
+        if similarity >= threshold:
+            matches.append((first, second, similarity))
+            parents[find(second)] = find(first)
+
+    clusters: dict[int, DuplicateCluster] = {}
+    for first, second, similarity in matches:
+        cluster = clusters.setdefault(find(first), DuplicateCluster([]))
+        cluster.scores.append((first, second, similarity))
+    for idx in range(len(questions)):
+        if find(idx) in clusters:
+            clusters[find(idx)].indexes.append(idx)
+    return sorted(clusters.values(), key=lambda cluster: cluster.indexes[0])
+
+
+def _valid_answers(ques: dict) -> bool:
+    """
+    returns whether the answer key of the question only points at its options
+    """
+    answers = ques.get("answers", [])
+    return all(isinstance(i, int) and 0 <= i < len(ques.get("options", [])) for i in answers)
+
+
+def _completeness(ques: dict) -> tuple:
+    return (
+        bool(ques.get("answers")) and _valid_answers(ques),
+        bool(ques.get("explination")),
+        ques.get("total_times_question_attempted", 0),
+        len(ques.get("question", "")),
+    )
+
+
+def conflicting_answers(questions: list[dict]) -> list[list[str]]:
+    """
+    returns the different answer keys (as the text of the chosen options) of
+    duplicate questions, an empty list if the copies agree
+    """
+    keys: dict[tuple[str, ...], list[str]] = {}
+    for ques in questions:
+        if not ques.get("answers") or not _valid_answers(ques):
+            continue
+        chosen = [ques["options"][i] for i in ques["answers"]]
+        keys.setdefault(tuple(sorted(normalize(option) for option in chosen)), chosen)
+    return list(keys.values()) if len(keys) > 1 else []
+
+
+def fold_cluster(questions: list[dict]) -> dict:
+    """
+    folds duplicate questions into one: the most complete copy is kept and
+    the stats, attempt history and tags of every copy are added to it. The
+    answer key of the kept copy wins, see `conflicting_answers`
+    """
+    canonical = max(questions, key=_completeness)
+    folded = dict(canonical)
+    total = sum(ques.get("total_times_question_attempted", 0) for ques in questions)
+    if total:
+        folded["total_times_question_attempted"] = total
+        folded["correct_times_question_attempted"] = sum(
+            ques.get("correct_times_question_attempted", 0) for ques in questions
+        )
+        # average of the probabilities weighted by the attempts
+        folded["current_probability"] = sum(
+            ques.get("current_probability", 0) * ques.get("total_times_question_attempted", 0)
+            for ques in questions
+        ) / total
+    history = AttemptHistory(
+        is_correct for ques in questions for is_correct in AttemptHistory.from_json(ques.get("attempt_history"))
+    )
+    if history:
+        folded["attempt_history"] = history.to_json()
+    tags = list(dict.fromkeys(tag for ques in questions for tag in ques.get("tags", [])))
+    if tags:
+        folded["tags"] = tags
+
+    if not folded.get("answers"):
+        # take the answer key of a copy, matched on the option text
+        options = [normalize(option) for option in folded.get("options", [])]
+        for ques in questions:
+            if not _valid_answers(ques):
+                # a scraped answer key that points past the options can not be matched
+                continue
+            dup_options = [normalize(option) for option in ques.get("options", [])]
+            dup_answers = ques.get("answers", [])
+            answers = [options.index(dup_options[i]) for i in dup_answers if dup_options[i] in options]
+            if answers and len(answers) == len(dup_answers):
+                folded["answers"] = answers
+                break
+    return folded
+
+
+def fold_duplicates(questions: list[dict], clusters: list[DuplicateCluster]) -> list[dict]:
+    """
+    returns the questions with every cluster folded into the position of its
+    first question, so the position of the questions before a duplicate is kept
+    """
+    folded: dict[int, dict] = {}
+    dropped: set[int] = set()
+    for cluster in clusters:
+        first, *rest = cluster.indexes
+        folded[first] = fold_cluster([questions[idx] for idx in cluster.indexes])
+        dropped.update(rest)
+    return [
+        folded.get(idx, ques) for idx, ques in enumerate(questions) if idx not in dropped
+    ]
+
+
+if __name__ == "__main__":
+    json_file = Path(sys.argv[1]) if len(sys.argv) > 1 else Path(__file__).parent.parent / "data.json"
+    with open(json_file, encoding="utf-8") as f:
+        data = json.load(f)
+    for cluster in find_duplicates(data):
+        print("DUPLICATES:", cluster.indexes)
+        for first, second, similarity in cluster.scores:
+            print(f"    {first} ~ {second}: {similarity:.2f}")
@@ -1,15 +1,49 @@
-from pathlib import Path 
-import json 
-from bs4 import BeautifulSoup
+"""
+Extracts the questions of saved ExamTopics pages into one jsonl file per page.
 
+Every page is parsed once with lxml and the pages are spread over a process
+pool. A manifest of the content hash of every page is kept next to the
+output so pages that did not change since the last run are skipped.
+
+    python -m preprocessing.extract_html [html_folder] [json_folder] [--workers N] [--force]
+"""
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from lxml import html as lxml_html
+
+MANIFEST_FILE = ".manifest.json"
+
+
+def _has_class(class_name: str) -> str:
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')"
+
+
+# compiled once per process
+_QUESTION_CARDS = f"//div[{_has_class('exam-question-card')}]"
+_CARD_HEADER = f".//*[{_has_class('card-header')}]"
+_CARD_TEXT = f".//*[{_has_class('card-text')}]"
+_OPTIONS = f".//*[{_has_class('question-choices-container')}]//*[{_has_class('multi-choice-item')}]"
+_IS_ANSWER = f"descendant-or-self::*[{_has_class('correct-hidden')}]"
+_EXPLINATION = f".//*[{_has_class('question-answer')}]"
+
+
+def _text_without_spans(element) -> str:
+    """
+    returns the text of the element leaving out the text inside span tags
+    (the option letter and the "Most Voted" badge)
+    """
+    parts = [element.text or ""]
+    for child in element:
+        if child.tag != "span":
+            parts.append(_text_without_spans(child))
+        parts.append(child.tail or "")
+    return "".join(parts)
 
-def find_class(text: BeautifulSoup, class_name: str):
-    tags = ["div", "p", "span", "ul", "li"]
-    for tag in tags: 
-        found_text = text.find_all(tag, {"class": class_name})
-        if found_text:
-            return found_text
-    return []
 
 def get_question_number_and_topic(card_header_text: str) -> tuple[str, str]:
     split_text = card_header_text.split("\n")
@@ -20,74 +54,111 @@ def get_question_number_and_topic(card_header_text: str) -> tuple[str, str]:
     question_topic = split_text[1].strip()
     return question_number, question_topic
 
-def extract_questions_as_json(html: str) -> list[dict[str, str]]:
-    soup = BeautifulSoup(html, "lxml")
-# the class to select are card exam-question-card
-    questions = soup.find_all("div", {"class": "card exam-question-card"})
-
-# question txt is in this class card-text
-# options are in this question-choices-container class
-# answer is in vote-bar
-    parsed_questions_json = [] 
-    for index, question in enumerate(questions):
-        try: 
-            txt = find_class(question, "card-header")
-            inner_text = txt[0].text
+
+def extract_questions_as_json(html: str | bytes) -> list[dict[str, str]]:
+    root = lxml_html.fromstring(html)
+    # question txt is in this class card-text
+    # options are in this question-choices-container class
+    # answer is in vote-bar
+    parsed_questions_json = []
+    for index, question in enumerate(root.xpath(_QUESTION_CARDS)):
+        try:
+            inner_text = question.xpath(_CARD_HEADER)[0].text_content()
             question_number, question_topic = get_question_number_and_topic(inner_text)
-            question_text = find_class(question, "card-text")[0].text.strip()
-            options_container = find_class(question, "question-choices-container")[0]
-            options_lst = find_class(options_container, "multi-choice-item")
+            question_text = question.xpath(_CARD_TEXT)[0].text_content().strip()
             answers = []
             options = []
-            for idx, opt in enumerate(options_lst): 
-                bs = BeautifulSoup(str(opt), "lxml")
-                is_answer = find_class(bs, "correct-hidden")
-                if is_answer:
+            for idx, opt in enumerate(question.xpath(_OPTIONS)):
+                if opt.xpath(_IS_ANSWER):
                     answers.append(idx)
-                # remove all the span tags 
-                for _ in bs.find_all("span"):
-                    opt.span.decompose()
-                options.append(opt.text.strip())
+                options.append(_text_without_spans(opt).strip())
 
             # explination class is question-answer
-            explination = find_class(question, "question-answer")[0].text.strip()
+            explination = question.xpath(_EXPLINATION)[0].text_content().strip()
 
             parsed_questions_json.append({
                 "question": question_number + "\n\n" + question_text,
                 "answers": answers,
-                "options": options, 
+                "options": options,
                 "explination": explination.replace("\n", " "),
                 "topic": question_topic
             })
         except Exception as e:
-            print(index)
+            print(f"Failed to parse question {index}: {e!r}")
             continue
 
     return parsed_questions_json
 
-def main():
-    folder = Path(__file__).parent.parent / "htmls"
-    json_folder = Path(__file__).parent.parent / "json" / "saa-c02"
-    # html_files = list(folder.glob("*.html"))
-    # the file names are 13.html, 25.hml, 27.html 
-    html_files = [folder / f"{i}.html" for i in [13, 25, 27]]
-    failed_files = []
-    for file in html_files:
-        print(file)
-        with open(file, "r", encoding="utf8") as f:
-            html = f.read()
 
-        parsed_questions_json = extract_questions_as_json(html)
+def extract_file(html_file: Path, json_file: Path, previous_hash: str | None) -> tuple[str, str, int | None]:
+    """
+    extracts one page into a jsonl file, returns (file name, content hash,
+    number of questions) with None questions if the page did not change
+    """
+    with open(html_file, "rb") as f:
+        content = f.read()
+    content_hash = hashlib.blake2b(content, digest_size=16).hexdigest()
+    if content_hash == previous_hash and json_file.exists():
+        return html_file.name, content_hash, None
+
+    questions = extract_questions_as_json(content)
+    tmp_file = json_file.with_name(json_file.name + ".tmp")
+    with open(tmp_file, "w", encoding="utf8") as f:
+        for ques in questions:
+            f.write(json.dumps(ques) + "\n")
+    os.replace(tmp_file, json_file)
+    return html_file.name, content_hash, len(questions)
+
+
+def extract_folder(html_folder: Path, json_folder: Path, workers: int | None = None, force: bool = False) -> None:
+    json_folder.mkdir(parents=True, exist_ok=True)
+    manifest_file = json_folder / MANIFEST_FILE
+    manifest: dict[str, str] = {}
+    if manifest_file.exists() and not force:
+        with open(manifest_file, encoding="utf8") as f:
+            manifest = json.load(f)
 
-        # save the json to a file in json/saa-c02/num.json 
-        json_folder.mkdir(parents=True, exist_ok=True)
-        json_file = json_folder / f"{file.stem}.json"
-        with open(json_file, "w", encoding="utf8") as f:
-            json.dump(parsed_questions_json, f, indent=4)
+    html_files = sorted(html_folder.glob("*.html"))
+    failed_files = []
+    skipped = 0
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(extract_file, file, json_folder / f"{file.stem}.jsonl", manifest.get(file.name)): file
+                for file in html_files
+            }
+            for future in as_completed(futures):
+                try:
+                    name, content_hash, count = future.result()
+                except Exception as e:
+                    print(f"{futures[future]}: {e!r}")
+                    failed_files.append(futures[future].name)
+                    continue
+                manifest[name] = content_hash
+                if count is None:
+                    skipped += 1
+                else:
+                    print(f"{name}: {count} questions")
+    finally:
+        # keep the hashes of the pages done so far even if the run is interrupted
+        tmp_file = manifest_file.with_name(manifest_file.name + ".tmp")
+        with open(tmp_file, "w", encoding="utf8") as f:
+            json.dump(manifest, f, indent=4)
+        os.replace(tmp_file, manifest_file)
 
+    print(f"Extracted {len(html_files) - skipped - len(failed_files)} pages, {skipped} unchanged")
     print(f"Failed files: {failed_files}")
 
 
+def main():
+    parser = argparse.ArgumentParser(description="Extract the questions of saved ExamTopics pages")
+    parser.add_argument("html_folder", nargs="?", type=Path, default=Path(__file__).parent.parent / "htmls")
+    parser.add_argument("json_folder", nargs="?", type=Path, default=Path(__file__).parent.parent / "json" / "saa-c02")
+    parser.add_argument("--workers", type=int, default=None, help="number of processes (default: all cores)")
+    parser.add_argument("--force", action="store_true", help="re-extract the pages that did not change")
+    args = parser.parse_args()
+    extract_folder(args.html_folder, args.json_folder, args.workers, args.force)
+
+
 if __name__ == "__main__":
     main()
-
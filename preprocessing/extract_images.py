@@ -1,8 +1,17 @@
 import re
-from pathlib import Path
+import shutil
 import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
 from tqdm import tqdm
 
+# timestamps further apart than this on average are seeked to one by one,
+# closer ones are grabbed in a single decode pass
+SPARSE_GAP_SECONDS = 30
+MAX_WORKERS = 4
+
 
 def extract_time_stamps(file_name: str) -> list[str]:
     # read the text fro mthe file_name + ".txt" file
@@ -25,10 +34,119 @@ def extract_time_stamps(file_name: str) -> list[str]:
     return time_stamps
 
 
+@dataclass
+class FrameFailure:
+    index: int
+    time_stamp: str
+    error: str
+
+
+def time_stamp_to_seconds(time_stamp: str) -> float:
+    seconds = 0.0
+    for part in time_stamp.split(":"):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def _stderr_tail(stderr: bytes, lines: int = 5) -> str:
+    return "\n".join(stderr.decode(errors="replace").strip().splitlines()[-lines:])
+
+
+def _extract_frame(vid_file_path: Path, time_stamp: str, output_file_path: Path) -> str | None:
+    """
+    seeks to the time stamp and writes one frame, returns the error if it failed
+    """
+    result = subprocess.run(
+        [
+            "ffmpeg", "-y", "-loglevel", "error",
+            "-ss", time_stamp,
+            "-i", str(vid_file_path),
+            "-an", "-sn",
+            "-vframes", "1",
+            "-q:v", "2",
+            str(output_file_path.resolve()),
+        ],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+    )
+    if result.returncode != 0:
+        return _stderr_tail(result.stderr) or f"ffmpeg exited with {result.returncode}"
+    if not output_file_path.exists():
+        return "no frame at this time stamp"
+    return None
+
+
+def _extract_frames_in_pool(
+    vid_file_path: Path, frames: list[tuple[int, str]], images_folder: Path, workers: int
+) -> list[FrameFailure]:
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            (i, time_stamp, pool.submit(_extract_frame, vid_file_path, time_stamp, images_folder / f"{i}.jpg"))
+            for i, time_stamp in frames
+        ]
+        failures = []
+        for i, time_stamp, future in tqdm(futures, desc="Extracting images"):
+            if error := future.result():
+                failures.append(FrameFailure(i, time_stamp, error))
+    return failures
+
+
+def _extract_frames_in_one_pass(
+    vid_file_path: Path, frames: list[tuple[int, str]], images_folder: Path
+) -> list[FrameFailure]:
+    """
+    decodes the video once and keeps the first frame at or after every time stamp
+    """
+    seconds = sorted({time_stamp_to_seconds(time_stamp) for _, time_stamp in frames})
+    # only decode the part of the video that has the time stamps in it
+    start = max(0.0, seconds[0] - 1)
+    # prev_pts is NAN for the first frame
+    select = "+".join(
+        f"(isnan(prev_pts)+lt(prev_pts*TB,{t - start:.3f}))*gte(pts*TB,{t - start:.3f})" for t in seconds
+    )
+    with tempfile.TemporaryDirectory(dir=images_folder) as tmp_folder:
+        result = subprocess.run(
+            [
+                "ffmpeg", "-y", "-loglevel", "error",
+                "-ss", f"{start:.3f}",
+                "-t", f"{seconds[-1] + 1 - start:.3f}",
+                "-i", str(vid_file_path),
+                "-an", "-sn",
+                "-vf", f"select='{select}'",
+                "-vsync", "vfr",
+                "-q:v", "2",
+                str(Path(tmp_folder).resolve() / "%d.jpg"),
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+        )
+        error = _stderr_tail(result.stderr) or f"ffmpeg exited with {result.returncode}"
+        # the selected frames are numbered from 1 in time order
+        frame_files = {t: Path(tmp_folder) / f"{n}.jpg" for n, t in enumerate(seconds, start=1)}
+        failures = []
+        for i, time_stamp in frames:
+            frame_file = frame_files[time_stamp_to_seconds(time_stamp)]
+            if frame_file.exists():
+                shutil.copyfile(frame_file, images_folder / f"{i}.jpg")
+            else:
+                failures.append(FrameFailure(i, time_stamp, error if result.returncode else "no frame selected"))
+    return failures
+
+
 def extract_images_from_video(
-    time_stamps: list[str], file_name: str, out_folder_name: str | None = None
-) -> None:
-    # for each time stamp, extract the image from the video
+    time_stamps: list[str],
+    file_name: str,
+    out_folder_name: str | None = None,
+    batched: bool | None = None,
+    workers: int = MAX_WORKERS,
+) -> list[FrameFailure]:
+    """
+    extracts one image per time stamp into ./images/out_folder_name/{i}.jpg and
+    returns the frames that could not be extracted.
+
+    With `batched` None dense time stamps are grabbed in one decode pass and
+    sparse ones are seeked to by a pool of ffmpeg processes
+    """
     vid_file_path = Path("./videos") / f"{file_name}.mp4"
 
     out_folder_name = out_folder_name or file_name
@@ -38,25 +156,25 @@ def extract_images_from_video(
     # create the folder if it doesn't exist
     images_folder.mkdir(parents=True, exist_ok=True)
 
-    # extract the images
+    frames = list(enumerate(time_stamps))
+    if not frames:
+        return []
+    if batched is None:
+        seconds = sorted(time_stamp_to_seconds(time_stamp) for time_stamp in time_stamps)
+        span = seconds[-1] - seconds[0]
+        batched = len(seconds) > 1 and span / (len(seconds) - 1) <= SPARSE_GAP_SECONDS
 
-    for i, time_stamp in tqdm(enumerate(time_stamps), desc="Extracting images"):
-        # create the output file path
-        output_file_path = images_folder / f"{i}.jpg"
-        # run the ffmpeg command
-        subprocess.run(
-            [
-                "ffmpeg",
-                "-ss",
-                time_stamp,
-                "-i",
-                vid_file_path,
-                "-vframes",
-                "1",
-                "-q:v",
-                "2",
-                str(output_file_path.resolve()),
-            ],
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-        )
+    failures = []
+    if batched:
+        failures = _extract_frames_in_one_pass(vid_file_path, frames, images_folder)
+        # retry the frames the single pass missed by seeking to them
+        retry = {failure.index for failure in failures}
+        failures = _extract_frames_in_pool(
+            vid_file_path, [frame for frame in frames if frame[0] in retry], images_folder, workers
+        ) if retry else []
+    else:
+        failures = _extract_frames_in_pool(vid_file_path, frames, images_folder, workers)
+
+    for failure in failures:
+        print(f"Failed to extract frame {failure.index} at {failure.time_stamp}: {failure.error}")
+    return failures
@@ -1,23 +1,159 @@
-from cv2 import imread
-import pytesseract
+"""
+OCR of the extracted frames into ./questions/<folder>/<frame>.txt
+
+The frames are OCR'd on a process pool, in batches per worker. The text is
+cached by the content hash of the frame (together with the engine and the
+preprocessing settings), so frames that did not change are not OCR'd again.
+"""
+import hashlib
+import os
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import astuple, dataclass
 from pathlib import Path
+
 from tqdm import tqdm
 
-pytesseract.pytesseract.tesseract_cmd = Path("./tesseract/tesseract.exe").resolve()
+CACHE_FOLDER = Path("./questions/.ocr_cache")
+BATCH_SIZE = 8
+
+
+class OcrEngine(ABC):
+    """
+    Turns an image (a numpy array as returned by cv2.imread) into text,
+    engines are pickled to the worker processes
+    """
+
+    # part of the cache key, change it when the output of the engine changes
+    name = "engine"
+
+    @abstractmethod
+    def image_to_string(self, img) -> str:
+        ...
+
+
+class TesseractEngine(OcrEngine):
+    def __init__(self, tesseract_cmd: Path | str = Path("./tesseract/tesseract.exe"), config: str = ""):
+        self.tesseract_cmd = str(Path(tesseract_cmd).resolve())
+        self.config = config
+        self.name = f"tesseract:{config}"
+
+    def image_to_string(self, img) -> str:
+        import pytesseract
+
+        pytesseract.pytesseract.tesseract_cmd = self.tesseract_cmd
+        return pytesseract.image_to_string(img, config=self.config)
+
+
+class StubEngine(OcrEngine):
+    """
+    Deterministic engine for tests and dry runs without a Tesseract binary,
+    the text is the size and a hash of the preprocessed image
+    """
+
+    name = "stub"
+
+    def image_to_string(self, img) -> str:
+        digest = hashlib.blake2b(img.tobytes(), digest_size=8).hexdigest()
+        return f"{img.shape[1]}x{img.shape[0]} {digest}\n"
+
+
+@dataclass(frozen=True)
+class Preprocess:
+    """
+    Image preprocessing applied before the OCR: crop (x, y, width, height),
+    scale, grayscale and threshold (0 picks the threshold with Otsu's method)
+    """
+    crop: tuple[int, int, int, int] | None = None
+    scale: float = 1.0
+    grayscale: bool = False
+    threshold: int | None = None
 
-def extract_text_from_images(folder_name):
+    def apply(self, img):
+        import cv2
+
+        if self.crop is not None:
+            x, y, width, height = self.crop
+            img = img[y:y + height, x:x + width]
+        if self.scale != 1.0:
+            img = cv2.resize(img, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_CUBIC)
+        if self.grayscale or self.threshold is not None:
+            img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        if self.threshold is not None:
+            flags = cv2.THRESH_BINARY | (cv2.THRESH_OTSU if self.threshold == 0 else 0)
+            _, img = cv2.threshold(img, self.threshold, 255, flags)
+        return img
+
+
+# set in every worker process by _init_worker
+_engine: OcrEngine | None = None
+_preprocess: Preprocess | None = None
+
+
+def _init_worker(engine: OcrEngine, preprocess: Preprocess) -> None:
+    global _engine, _preprocess
+    _engine = engine
+    _preprocess = preprocess
+
+
+def _ocr_batch(img_paths: list[Path]) -> list[str]:
+    from cv2 import imread
+
+    return [_engine.image_to_string(_preprocess.apply(imread(str(img_path)))) for img_path in img_paths]
+
+
+def _write_cache(batch: list[Path], texts: list[str], keys: dict[Path, str]) -> None:
+    for img_path, text in zip(batch, texts):
+        (CACHE_FOLDER / f"{keys[img_path]}.txt").write_text(text, encoding="utf8")
+
+
+def _cache_key(img_path: Path, engine: OcrEngine, preprocess: Preprocess) -> str:
+    hasher = hashlib.blake2b(digest_size=16)
+    hasher.update(img_path.read_bytes())
+    hasher.update(repr((engine.name, astuple(preprocess))).encode())
+    return hasher.hexdigest()
+
+
+def extract_text_from_images(
+    folder_name: str,
+    engine: OcrEngine | None = None,
+    preprocess: Preprocess = Preprocess(),
+    workers: int | None = None,
+) -> None:
+    engine = engine or TesseractEngine()
     img_folder = Path(f"./images/{folder_name}")
-    img_paths = list(img_folder.glob("*.jpg"))
+    img_paths = sorted(img_folder.glob("*.jpg"))
+
+    # save these texts to a file in the questions folder
+    text_folder = Path("./questions") / folder_name
+    text_folder.mkdir(parents=True, exist_ok=True)
+    CACHE_FOLDER.mkdir(parents=True, exist_ok=True)
 
-    for img_path in tqdm(img_paths, desc="Extracting text"):
-        img = imread(str(img_path.resolve()))
-        text = pytesseract.image_to_string(img)
+    keys = {img_path: _cache_key(img_path, engine, preprocess) for img_path in img_paths}
+    missing = [img_path for img_path in img_paths if not (CACHE_FOLDER / f"{keys[img_path]}.txt").exists()]
+    print(f"OCR of {len(missing)} frames, {len(img_paths) - len(missing)} cached")
 
-        # save these texts to a file in the questions folder
-        # create a file path
-        text_folder = Path("./questions") / folder_name
-        # create the folder if it doesn't exist
-        text_folder.mkdir(parents=True, exist_ok=True)
+    if missing:
+        batches = [missing[i:i + BATCH_SIZE] for i in range(0, len(missing), BATCH_SIZE)]
+        done = 0
+        if (workers or os.cpu_count() or 1) > 1:
+            try:
+                with ProcessPoolExecutor(
+                    max_workers=workers or os.cpu_count(), initializer=_init_worker, initargs=(engine, preprocess)
+                ) as pool:
+                    results = pool.map(_ocr_batch, batches)
+                    for batch, texts in tqdm(zip(batches, results), total=len(batches), desc="Extracting text"):
+                        _write_cache(batch, texts, keys)
+                        done += 1
+            except (BrokenProcessPool, OSError) as e:
+                print(f"The OCR process pool failed ({e!r}), continuing without it")
+        if done < len(batches):
+            # a single worker, or the pool failed: the rest is OCR'd in this process
+            _init_worker(engine, preprocess)
+            for batch in tqdm(batches[done:], desc="Extracting text"):
+                _write_cache(batch, _ocr_batch(batch), keys)
 
-        # # write the text to the file
+    for img_path in img_paths:
+        text = (CACHE_FOLDER / f"{keys[img_path]}.txt").read_text(encoding="utf8")
         (text_folder / f"{img_path.stem}.txt").write_text(text)
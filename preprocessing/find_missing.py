@@ -6,11 +6,16 @@ import re
 from collections import Counter
 from pathlib import Path
 
+from preprocessing.stream_merge import merge_banks
+
 CURRENT_FOLDER = Path(__file__).parent
 JSON_FILE = CURRENT_FOLDER.parent/"data.json"
-# read the question_answers.json file
-with open( JSON_FILE, encoding="utf-8") as f:
-    question_answers = json.load(f)
+
+
+def load_questions(json_file: Path = JSON_FILE) -> list[dict]:
+    # only read when a check runs, importing the module does not load the bank
+    with open(json_file, encoding="utf-8") as f:
+        return json.load(f)
 
 
 def extract_num_from_dict(questions_and_ans_dict: dict) -> int | None:
@@ -41,7 +46,8 @@ def extract_num_from_dict(questions_and_ans_dict: dict) -> int | None:
     return None
 
 
-def check_repeated_missing_and_low_options():
+def check_repeated_missing_and_low_options(json_file: Path = JSON_FILE):
+    question_answers = load_questions(json_file)
     numbers: list[int] = list()
     for ques_ans_dict in question_answers:
         num = extract_num_from_dict(ques_ans_dict)
@@ -76,13 +82,15 @@ def check_repeated_missing_and_low_options():
     print("MISSING:", sorted(missing), "TOTAL:", len(missing))
     print("LOW OPTIONS:", sorted(low_options), "TOTAL:", len(low_options))
 
-def sort_json_on_ques_no(data: list[dict]) -> list[dict]:
-    question_numbers = [ extract_num_from_dict(ques_ans_dict) for ques_ans_dict in data ]
-    data = [ x for _, x in sorted(zip(question_numbers, data)) ]
-    return data
+def sort_json_on_ques_no(json_file: Path = JSON_FILE) -> int:
+    """
+    sorts the questions of the file on their number in bounded memory (see
+    stream_merge.py), returns the number of questions. Questions without a
+    number now go last, the old in-memory sort put them first (as number 0).
+    Invalid questions are moved to data.rejected.jsonl next to the file
+    """
+    return merge_banks(json_file, [json_file])
 
 if __name__ == "__main__":
     # check_repeated_missing_and_low_options()
-    sorted_data = sort_json_on_ques_no(question_answers)
-    with open(JSON_FILE, "w", encoding="utf-8") as f:
-        json.dump(sorted_data, f, indent=4)
+    sort_json_on_ques_no()
@@ -1,16 +1,152 @@
-from yt_download import download_video_and_description
-from extract_images import extract_images_from_video, extract_time_stamps
-from extract_text import extract_text_from_images
-
-file_name = "q5"
-# yt_video_url = "https://www.youtube.com/watch?v=nL-OQ76_U4Q"
-
-# # download_video_and_description(yt_video_url, file_name)
-# time_stamps = extract_time_stamps(file_name)
-time_stamps = [
-    "24:49"
-]
-out_folder = f"{file_name}_invalid_3"
-# print(time_stamps)
-extract_images_from_video(time_stamps, file_name, out_folder)
-extract_text_from_images(out_folder)
+"""
+Runs the preprocessing pipeline (download -> frames -> OCR -> question/option
+splitting -> merge -> dedupe into data.json) for the videos listed in a json file:
+
+    [{"name": "q5", "url": "https://www.youtube.com/watch?v=...", "time_stamps": ["24:49"]}, ...]
+
+`time_stamps` is optional, by default they are read from the video description.
+Only the stages whose inputs changed are run again, so adding a video does not
+reprocess the others. Run it from the root of the repository, the working
+folders (videos, images, questions and json/videos) are created there:
+
+    python -m preprocessing.main videos.json [--jobs 2]
+"""
+import argparse
+import json
+import os
+import shutil
+from pathlib import Path
+
+from preprocessing.pipeline import Pipeline, Stage
+
+JSON_FOLDER = Path("./json/videos")
+MERGED_FILE = Path(__file__).parent.parent / "merged.json"
+DATA_FILE = Path(__file__).parent.parent / "data.json"
+
+
+def _download(name: str, url: str) -> None:
+    # an existing video is kept, delete it to download it again from a new url
+    if (Path("./videos") / f"{name}.mp4").exists():
+        return
+    from preprocessing.yt_download import download_video_and_description
+
+    download_video_and_description(url, name)
+
+
+def _extract_frames(name: str, time_stamps: list[str] | None) -> None:
+    from preprocessing.extract_images import extract_images_from_video, extract_time_stamps
+
+    # drop the frames of the previous run so removed time stamps don't linger
+    shutil.rmtree(Path("./images") / name, ignore_errors=True)
+    extract_images_from_video(time_stamps or extract_time_stamps(name), name)
+
+
+def _extract_text(name: str, workers: int) -> None:
+    from preprocessing.extract_text import extract_text_from_images
+
+    shutil.rmtree(Path("./questions") / name, ignore_errors=True)
+    extract_text_from_images(name, workers=workers)
+
+
+def _split(name: str) -> None:
+    from preprocessing.merge import extract_to_json
+
+    files = sorted((Path("./questions") / name).glob("*.txt"), key=lambda file: int(file.stem))
+    JSON_FOLDER.mkdir(parents=True, exist_ok=True)
+    with open(JSON_FOLDER / f"{name}.json", "w", encoding="utf8") as f:
+        json.dump(extract_to_json(files), f, indent=4)
+
+
+def _merge(names: list[str]) -> None:
+    merged = []
+    for name in names:
+        with open(JSON_FOLDER / f"{name}.json", encoding="utf8") as f:
+            merged.extend(json.load(f))
+    with open(MERGED_FILE, "w", encoding="utf8") as f:
+        json.dump(merged, f, indent=4)
+
+
+def _merge_into_data_file() -> None:
+    from preprocessing.merge_jsons import merge_into_data_file
+
+    with open(MERGED_FILE, encoding="utf8") as f:
+        merged = json.load(f)
+    merge_into_data_file(DATA_FILE, merged)
+
+
+def build_pipeline(videos: list[dict], jobs: int) -> Pipeline:
+    pipeline = Pipeline(Path("./.pipeline_manifest.json"))
+    # the OCR pools of the videos that run at the same time share the cores
+    ocr_workers = max(1, (os.cpu_count() or 1) // jobs)
+    for video in videos:
+        name = video["name"]
+        video_file = Path("./videos") / f"{name}.mp4"
+        description_file = Path("./videos") / f"{name}.txt"
+        images_folder = Path("./images") / name
+        text_folder = Path("./questions") / name
+        pipeline.add(Stage(
+            f"download:{name}",
+            lambda name=name, url=video["url"]: _download(name, url),
+            outputs=lambda files=[video_file, description_file]: files,
+            params=video["url"],
+        ))
+        pipeline.add(Stage(
+            f"frames:{name}",
+            lambda name=name, time_stamps=video.get("time_stamps"): _extract_frames(name, time_stamps),
+            inputs=lambda files=[video_file, description_file]: files,
+            outputs=lambda files=[images_folder]: files,
+            params=video.get("time_stamps"),
+            deps=[f"download:{name}"],
+        ))
+        pipeline.add(Stage(
+            f"ocr:{name}",
+            lambda name=name: _extract_text(name, ocr_workers),
+            inputs=lambda folder=images_folder: list(folder.glob("*.jpg")),
+            outputs=lambda files=[text_folder]: files,
+            deps=[f"frames:{name}"],
+        ))
+        pipeline.add(Stage(
+            f"split:{name}",
+            lambda name=name: _split(name),
+            inputs=lambda folder=text_folder: list(folder.glob("*.txt")),
+            outputs=lambda files=[JSON_FOLDER / f"{name}.json"]: files,
+            deps=[f"ocr:{name}"],
+        ))
+
+    names = [video["name"] for video in videos]
+    pipeline.add(Stage(
+        "merge",
+        lambda: _merge(names),
+        inputs=lambda: [JSON_FOLDER / f"{name}.json" for name in names],
+        outputs=lambda: [MERGED_FILE],
+        deps=[f"split:{name}" for name in names],
+    ))
+    # data.json changes with every quiz session, so only a new merged.json re-runs this
+    pipeline.add(Stage(
+        "dedupe",
+        _merge_into_data_file,
+        inputs=lambda: [MERGED_FILE],
+        outputs=lambda: [DATA_FILE],
+        deps=["merge"],
+    ))
+    return pipeline
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the preprocessing pipeline")
+    parser.add_argument("videos", type=Path, help="json file with the list of videos")
+    parser.add_argument("--jobs", type=int, default=2, help="number of stages that run at the same time")
+    args = parser.parse_args()
+    with open(args.videos, encoding="utf8") as f:
+        videos = json.load(f)
+
+    pipeline = build_pipeline(videos, args.jobs)
+    states = pipeline.run(args.jobs)
+    for name in pipeline.stages:
+        print(f"{states[name]:>8} {name}")
+    if any(state in ("failed", "blocked") for state in states.values()):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -55,24 +55,25 @@ def extract_to_json(files: list[Path]) -> list[dict]:
     return question_answers_json
 
 
-# read all the file from questions folder including the subfolders
-# all_files = list(Path("./questions").rglob("*.txt"))
-# read all the files fro questions folder and the subfolder ending with _invalid
-all_files = list(Path("./questions").glob("q5_invalid_3/*.txt"))
-question_answers_json = extract_to_json(all_files)
+if __name__ == "__main__":
+    # read all the file from questions folder including the subfolders
+    # all_files = list(Path("./questions").rglob("*.txt"))
+    # read all the files fro questions folder and the subfolder ending with _invalid
+    all_files = list(Path("./questions").glob("q5_invalid_3/*.txt"))
+    question_answers_json = extract_to_json(all_files)
 
-with open("question_answers_invalid_3.json", "w") as f:
-    json.dump(question_answers_json, f, indent=4)
+    with open("question_answers_invalid_3.json", "w") as f:
+        json.dump(question_answers_json, f, indent=4)
 
-# read question_answers.json and question_answers_invalid.json
-# and merge them into one file
-# with open("question_answers_merged.json", "r") as f:
-#     question_answers = json.load(f)
+    # read question_answers.json and question_answers_invalid.json
+    # and merge them into one file
+    # with open("question_answers_merged.json", "r") as f:
+    #     question_answers = json.load(f)
 
-# with open("question_answers_invalid_2.json", "r") as f:
-#     question_answers_invalid = json.load(f)
+    # with open("question_answers_invalid_2.json", "r") as f:
+    #     question_answers_invalid = json.load(f)
 
-# question_answers.extend(question_answers_invalid)
+    # question_answers.extend(question_answers_invalid)
 
-# with open("question_answers_merged_2.json", "w") as f:
-#     json.dump(question_answers, f, indent=4)
+    # with open("question_answers_merged_2.json", "w") as f:
+    #     json.dump(question_answers, f, indent=4)
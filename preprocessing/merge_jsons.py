@@ -12,15 +12,58 @@ from pathlib import Path
 # with open("merged.json", "w", encoding="utf8") as f:
 #     json.dump(merged_json, f, indent=4)
 
-# read data.json and merged.json and merge them into data.json 
-folder = Path(__file__).parent.parent
-data_file = folder / "data.json"
-merged_file = folder / "merged.json"
-with open(data_file, "r", encoding="utf8") as f:
-    data = json.load(f)
-with open(merged_file, "r", encoding="utf8") as f:
-    merged = json.load(f)
+# read data.json and merged.json and merge them into data.json, near-duplicate
+# questions (eg. the same question from the html pages and from a video) are
+# folded into one so their stats and tags are not split across copies
+from preprocessing.dedupe import DuplicateCluster, conflicting_answers, find_duplicates, fold_duplicates, normalize
+from preprocessing.stream_merge import write_records
 
-data.extend(merged)
-with open(data_file, "w", encoding="utf8") as f:
-    json.dump(data, f, indent=4)
+
+def merge_into_data_file(data_file: Path, merged: list[dict]) -> list[DuplicateCluster]:
+    """
+    merges the questions into the data file, returns the clusters of
+    duplicates whose answer keys disagree (indexes before folding), only
+    the answer key of one copy is kept for them
+    """
+    journal_file = data_file.with_suffix(".journal")
+    stats_file = data_file.with_suffix(".stats")
+    if journal_file.exists() and journal_file.stat().st_size > 0:
+        # the journal refers to the questions by index, which the merge changes
+        raise SystemExit(f"{journal_file} has unsaved changes, open and close the quiz to fold them in first")
+    with open(data_file, "r", encoding="utf8") as f:
+        data = json.load(f)
+
+    # the records already in the bank are not appended again, so merging the
+    # same file twice changes nothing even where the near-duplicate search misses
+    known = {normalize(ques.get("question", "")) for ques in data}
+    new = []
+    for ques in merged:
+        key = normalize(ques.get("question", ""))
+        if key and key in known:
+            continue
+        known.add(key)
+        new.append(ques)
+    data.extend(new)
+    clusters = find_duplicates(data)
+    conflicts = []
+    for cluster in clusters:
+        print("DUPLICATES:", cluster.indexes, ", ".join(f"{i}~{j}: {s:.2f}" for i, j, s in cluster.scores))
+        if keys := conflicting_answers([data[idx] for idx in cluster.indexes]):
+            conflicts.append(cluster)
+            print("    CONFLICTING ANSWERS:", " | ".join(", ".join(key) for key in keys))
+    data = fold_duplicates(data, clusters)
+    # written to a temporary file and renamed, a crash never leaves a half written bank
+    write_records(data_file, data)
+    # the stats file is keyed by index as well, it is rebuilt from data.json on the next start
+    stats_file.unlink(missing_ok=True)
+    print(f"Merged {len(new)} of {len(merged)} questions, folded {sum(len(c.indexes) - 1 for c in clusters)} duplicates")
+    if conflicts:
+        print(f"{len(conflicts)} folded questions had conflicting answer keys, check their answers")
+    return conflicts
+
+
+if __name__ == "__main__":
+    folder = Path(__file__).parent.parent
+    with open(folder / "merged.json", "r", encoding="utf8") as f:
+        merged = json.load(f)
+    merge_into_data_file(folder / "data.json", merged)
@@ -0,0 +1,133 @@
+"""
+Incremental runner of the preprocessing stages.
+
+The stages form a DAG, a stage runs once the stages it depends on are done
+and independent stages (eg. the stages of different videos) run concurrently.
+The hashes of the inputs of every stage are kept in a manifest, a stage whose
+inputs did not change since its last successful run and whose outputs still
+exist is skipped.
+"""
+import hashlib
+import json
+import os
+import threading
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable
+
+MANIFEST_VERSION = 1
+
+
+@dataclass
+class Stage:
+    """
+    `inputs` and `outputs` return the files the stage reads and writes, they
+    are called when the stage is about to run so they can list the outputs
+    of the previous stages. `params` are hashed along with the inputs.
+    """
+    name: str
+    run: Callable[[], None]
+    inputs: Callable[[], list[Path]] = list
+    outputs: Callable[[], list[Path]] = list
+    params: object = None
+    deps: list[str] = field(default_factory=list)
+
+
+class Pipeline:
+    def __init__(self, manifest_path: Path):
+        self.manifest_path = Path(manifest_path)
+        self.stages: dict[str, Stage] = {}
+        self._lock = threading.Lock()
+        self._manifest = {"version": MANIFEST_VERSION, "files": {}, "stages": {}}
+        if self.manifest_path.exists():
+            with open(self.manifest_path, encoding="utf8") as f:
+                manifest = json.load(f)
+            if manifest.get("version") == MANIFEST_VERSION:
+                self._manifest = manifest
+
+    def add(self, stage: Stage) -> Stage:
+        for dep in stage.deps:
+            if dep not in self.stages:
+                raise ValueError(f"{stage.name} depends on the unknown stage {dep}")
+        self.stages[stage.name] = stage
+        return stage
+
+    def run(self, jobs: int = 2) -> dict[str, str]:
+        """
+        runs the stages that are out of date, returns the state of every stage
+        ("ran", "skipped", "failed" or "blocked" when a dependency failed)
+        """
+        states: dict[str, str] = {}
+        waiting = dict(self.stages)
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            running = {}
+            while waiting or running:
+                # stages are added in dependency order, so a stage is only blocked by earlier ones
+                for name, stage in list(waiting.items()):
+                    if any(states.get(dep) in ("failed", "blocked") for dep in stage.deps):
+                        states[name] = "blocked"
+                        del waiting[name]
+                    elif all(dep in states for dep in stage.deps):
+                        running[pool.submit(self._run_stage, stage)] = name
+                        del waiting[name]
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        states[name] = "ran" if future.result() else "skipped"
+                    except BaseException:
+                        print(f"Stage {name} failed:")
+                        traceback.print_exc()
+                        states[name] = "failed"
+        return states
+
+    def _run_stage(self, stage: Stage) -> bool:
+        key = self._input_key(stage)
+        with self._lock:
+            up_to_date = self._manifest["stages"].get(stage.name) == key
+        if up_to_date and all(path.exists() for path in stage.outputs()):
+            return False
+        print(f"Running {stage.name}")
+        stage.run()
+        with self._lock:
+            self._manifest["stages"][stage.name] = key
+            self._save()
+        return True
+
+    def _input_key(self, stage: Stage) -> str:
+        hasher = hashlib.blake2b(digest_size=16)
+        hasher.update(json.dumps([stage.name, stage.params], default=str).encode())
+        for path in sorted(stage.inputs()):
+            hasher.update(str(path).encode())
+            hasher.update(self._file_hash(path).encode())
+        return hasher.hexdigest()
+
+    def _file_hash(self, path: Path) -> str:
+        """
+        returns the content hash of a file, cached by size and modification time
+        so large videos are not re-hashed on every run
+        """
+        if not path.exists():
+            return "missing"
+        stat = path.stat()
+        with self._lock:
+            cached = self._manifest["files"].get(str(path))
+        if cached and cached[:2] == [stat.st_size, stat.st_mtime_ns]:
+            return cached[2]
+        hasher = hashlib.blake2b(digest_size=16)
+        with open(path, "rb") as f:
+            while chunk := f.read(1 << 20):
+                hasher.update(chunk)
+        with self._lock:
+            self._manifest["files"][str(path)] = [stat.st_size, stat.st_mtime_ns, hasher.hexdigest()]
+        return hasher.hexdigest()
+
+    def _save(self) -> None:
+        tmp_path = self.manifest_path.with_name(self.manifest_path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf8") as f:
+            json.dump(self._manifest, f, indent=4)
+        os.replace(tmp_path, self.manifest_path)
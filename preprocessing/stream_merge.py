@@ -0,0 +1,241 @@
+"""
+Streaming merge and sort of question banks.
+
+The banks (json arrays or jsonl files) are read one record at a time and
+every record is validated on the way in. The records are sorted on the
+question number with an external merge sort: sorted runs of at most
+`chunk_size` records are spilled to temporary jsonl files and merged with a
+heap, so the memory used does not grow with the size of the banks.
+
+    python -m preprocessing.stream_merge output.json bank1.json bank2.jsonl ... [--renumber]
+"""
+import argparse
+import heapq
+import json
+import os
+import re
+import sys
+import tempfile
+from contextlib import nullcontext
+from itertools import count
+from pathlib import Path
+from typing import Iterable, Iterator, TextIO
+
+CHUNK_SIZE = 10_000
+READ_SIZE = 1 << 20
+_NUMBER = re.compile(r"\d+")
+_SEPARATOR = re.compile(r"[\s,]*")
+_decoder = json.JSONDecoder()
+
+
+def iter_records(path: Path) -> Iterator[dict]:
+    """
+    yields the records of a jsonl file or of a json array without loading the whole file
+    """
+    with open(path, encoding="utf8") as f:
+        if path.suffix == ".jsonl":
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+            return
+
+        buffer = f.read(READ_SIZE).lstrip()
+        if not buffer.startswith("["):
+            raise ValueError(f"{path} is not a json array")
+        pos = 1
+        eof = False
+        while True:
+            pos = _SEPARATOR.match(buffer, pos).end()
+            if pos < len(buffer) and buffer[pos] == "]":
+                return
+            try:
+                if pos == len(buffer):
+                    raise json.JSONDecodeError("Unterminated array", buffer, pos)
+                record, pos = _decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # the record continues in the next chunk
+                if eof:
+                    raise
+                chunk = f.read(READ_SIZE)
+                eof = not chunk
+                buffer = buffer[pos:] + chunk
+                pos = 0
+                continue
+            yield record
+
+
+def validate(record) -> str | None:
+    """
+    returns what is wrong with a question record, None if it is valid
+    """
+    if not isinstance(record, dict):
+        return "not an object"
+    if not isinstance(record.get("question"), str):
+        return "question is not a string"
+    options = record.get("options")
+    if not isinstance(options, list) or not all(isinstance(option, str) for option in options):
+        return "options is not a list of strings"
+    answers = record.get("answers")
+    if not isinstance(answers, list) or not all(isinstance(answer, int) for answer in answers):
+        return "answers is not a list of integers"
+    if any(not 0 <= answer < len(options) for answer in answers):
+        return "answer out of the range of the options"
+    return None
+
+
+def question_number(record: dict) -> int | None:
+    """
+    returns the number in the first line of the question if it starts with Q
+    (see find_missing.extract_num_from_dict)
+    """
+    first_line = record["question"].lstrip().split("\n", 1)[0]
+    if not first_line.startswith("Q"):
+        return None
+    if res := _NUMBER.search(first_line):
+        return int(res.group())
+    return None
+
+
+def renumber(record: dict, number: int) -> dict:
+    question = record["question"].lstrip()
+    first_line, sep, rest = question.partition("\n")
+    if first_line.startswith("Q") and _NUMBER.search(first_line):
+        first_line = _NUMBER.sub(str(number), first_line, count=1)
+    else:
+        first_line, sep, rest = f"Question #{number}", "\n\n", question
+    return {**record, "question": first_line + sep + rest}
+
+
+def _sort_key(record: dict, seq: int) -> tuple:
+    # questions without a number go last, ties keep the input order
+    number = question_number(record)
+    return (number is None, number or 0, seq)
+
+
+def _write_run(records: list[tuple[tuple, dict]], folder: str) -> Path:
+    records.sort(key=lambda item: item[0])
+    fd, path = tempfile.mkstemp(suffix=".jsonl", dir=folder)
+    with os.fdopen(fd, "w", encoding="utf8") as f:
+        for key, record in records:
+            f.write(json.dumps([key, record]) + "\n")
+    return Path(path)
+
+
+def _read_run(path: Path) -> Iterator[tuple[tuple, dict]]:
+    with open(path, encoding="utf8") as f:
+        for line in f:
+            key, record = json.loads(line)
+            yield tuple(key), record
+
+
+def sorted_records(
+    paths: Iterable[Path], chunk_size: int = CHUNK_SIZE, strict: bool = False, rejected: TextIO | None = None
+) -> Iterator[dict]:
+    """
+    yields the valid records of the banks sorted on the question number, the
+    invalid ones are written to `rejected` (one per line) if given
+    """
+    seq = count()
+    with tempfile.TemporaryDirectory() as folder:
+        runs: list[Path] = []
+        chunk: list[tuple[tuple, dict]] = []
+        for path in paths:
+            for position, record in enumerate(iter_records(path)):
+                if error := validate(record):
+                    message = f"{path}[{position}]: {error}"
+                    if strict:
+                        raise ValueError(message)
+                    print("INVALID:", message, file=sys.stderr)
+                    if rejected is not None:
+                        rejected.write(json.dumps(record) + "\n")
+                    continue
+                chunk.append((_sort_key(record, next(seq)), record))
+                if len(chunk) >= chunk_size:
+                    runs.append(_write_run(chunk, folder))
+                    chunk = []
+
+        if not runs:
+            # everything fits in one chunk
+            chunk.sort(key=lambda item: item[0])
+            yield from (record for _, record in chunk)
+            return
+        if chunk:
+            runs.append(_write_run(chunk, folder))
+        del chunk
+        for _, record in heapq.merge(*(_read_run(run) for run in runs), key=lambda item: item[0]):
+            yield record
+
+
+def write_records(path: Path, records: Iterable[dict]) -> int:
+    """
+    streams the records to a jsonl file or to a json array formatted like
+    json.dump(..., indent=4), returns the number of records
+    """
+    tmp_path = path.with_name(path.name + ".tmp")
+    written = 0
+    with open(tmp_path, "w", encoding="utf8") as f:
+        if path.suffix == ".jsonl":
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+                written += 1
+        else:
+            f.write("[")
+            for record in records:
+                f.write(",\n    " if written else "\n    ")
+                f.write(json.dumps(record, indent=4).replace("\n", "\n    "))
+                written += 1
+            f.write("\n]" if written else "]")
+    os.replace(tmp_path, path)
+    return written
+
+
+def merge_banks(
+    output: Path,
+    inputs: list[Path],
+    renumber_questions: bool = False,
+    chunk_size: int = CHUNK_SIZE,
+    strict: bool = False,
+) -> int:
+    """
+    merges the banks sorted on the question number into `output`, which can
+    be one of the inputs. Returns the number of questions written.
+
+    When `output` is one of the inputs the invalid records are not dropped,
+    they are appended to `<output>.rejected.jsonl`.
+    """
+    journal_file = output.with_suffix(".journal")
+    if journal_file.exists() and journal_file.stat().st_size > 0:
+        # the journal refers to the questions by index, which the merge changes
+        raise SystemExit(f"{journal_file} has unsaved changes, open and close the quiz to fold them in first")
+    rejected_file = output.with_suffix(".rejected.jsonl")
+    in_place = any(Path(path).resolve() == Path(output).resolve() for path in inputs)
+    kept = rejected_file.stat().st_size if rejected_file.exists() else 0
+    with open(rejected_file, "a", encoding="utf8") if in_place else nullcontext() as rejected:
+        records = sorted_records(inputs, chunk_size, strict, rejected)
+        if renumber_questions:
+            records = (renumber(record, number) for number, record in enumerate(records, start=1))
+        written = write_records(output, records)
+    if in_place and rejected_file.stat().st_size == 0:
+        rejected_file.unlink()
+    elif in_place and rejected_file.stat().st_size > kept:
+        print(f"The invalid questions are kept in {rejected_file}", file=sys.stderr)
+    # the quiz keeps the stats of a data file by index, they are rebuilt from the merged file
+    output.with_suffix(".stats").unlink(missing_ok=True)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge and sort question banks in constant memory")
+    parser.add_argument("output", type=Path, help=".json or .jsonl file to write")
+    parser.add_argument("inputs", type=Path, nargs="+", help=".json or .jsonl banks to merge")
+    parser.add_argument("--renumber", action="store_true", help="renumber the questions from 1 in sorted order")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="records sorted in memory at a time")
+    parser.add_argument("--strict", action="store_true", help="stop at the first invalid record")
+    args = parser.parse_args()
+
+    written = merge_banks(args.output, args.inputs, args.renumber, args.chunk_size, args.strict)
+    print(f"Wrote {written} questions to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""
+This module contains the progress analytics shown on the progress dashboard.
+
+The aggregates (accuracy per tag and per topic, accuracy by attempt number,
+the distribution of the probabilities) are computed with numpy over the
+counters and the attempt histories of every question in one pass, and are
+then updated with the difference of every saved question instead of being
+computed again.
+"""
+from collections import deque
+from dataclasses import dataclass
+
+import numpy as np
+
+from src.attempt_history import AttemptHistory
+from src.storage import QuestionStore
+
+# attempt numbers of the learning curve, the last one counts every later attempt too
+CURVE_LENGTH = 10
+PROBABILITY_BINS = 10
+# the accuracy of the session is the one of the last answers
+SESSION_WINDOW = 50
+
+
+@dataclass
+class GroupAccuracy:
+    name: str
+    questions: int
+    attempts: int
+    correct: int
+
+    @property
+    def accuracy(self) -> float:
+        return self.correct / self.attempts if self.attempts else 0.0
+
+
+@dataclass
+class ProgressSummary:
+    """
+    Snapshot of the aggregates, the groups are sorted from the least to the most accurate
+    """
+    questions: int
+    answered: int
+    attempts: int
+    correct: int
+    tags: list[GroupAccuracy]
+    topics: list[GroupAccuracy]
+    # (attempts, correct) of the 1st, 2nd, ... attempt at a question
+    learning_curve: list[tuple[int, int]]
+    session_attempts: int
+    session_correct: int
+    # (index, probability) of the questions most likely to be answered wrong
+    weakest: list[tuple[int, float]]
+    # number of answered questions per probability bin of width 1 / PROBABILITY_BINS
+    probability_histogram: list[int]
+
+
+def _probability_bin(probability: float) -> int:
+    return min(PROBABILITY_BINS - 1, max(0, int(probability * PROBABILITY_BINS)))
+
+
+class Analytics:
+    """
+    Progress aggregates of the question bank
+    """
+
+    def __init__(
+        self,
+        stats: dict[str, np.ndarray],
+        tags: dict[int, list[str]],
+        topics: list[str | None],
+        histories: list[AttemptHistory],
+    ):
+        self.total = np.asarray(stats["total_times_question_attempted"], dtype=np.int64)
+        self.correct = np.asarray(stats["correct_times_question_attempted"], dtype=np.int64)
+        self.probability = np.asarray(stats["current_probability"], dtype=np.float64)
+
+        self.tag_names: list[str] = []
+        self._tag_ids: dict[str, int] = {}
+        self.question_tags = {idx: [self._tag_id(tag) for tag in names] for idx, names in tags.items()}
+        pairs = [(idx, tag_id) for idx, tag_ids in self.question_tags.items() for tag_id in tag_ids]
+        pair_questions = np.array([idx for idx, _ in pairs], dtype=np.int64)
+        pair_tags = np.array([tag_id for _, tag_id in pairs], dtype=np.int64)
+        self.tag_questions, self.tag_total, self.tag_correct = self._group(pair_questions, pair_tags, len(self.tag_names))
+
+        self.topic_names = sorted({topic for topic in topics if topic})
+        topic_ids = {name: i for i, name in enumerate(self.topic_names)}
+        self.topic_of = np.array([topic_ids.get(topic, -1) if topic else -1 for topic in topics], dtype=np.int64)
+        with_topic = np.flatnonzero(self.topic_of >= 0)
+        self.topic_questions, self.topic_total, self.topic_correct = self._group(
+            with_topic, self.topic_of[with_topic], len(self.topic_names)
+        )
+
+        self.curve_attempts, self.curve_correct = self._learning_curve(histories)
+
+        answered = self.total > 0
+        bins = np.clip((self.probability[answered] * PROBABILITY_BINS).astype(np.int64), 0, PROBABILITY_BINS - 1)
+        self.probability_histogram = np.bincount(bins, minlength=PROBABILITY_BINS)
+        self.session: deque[bool] = deque(maxlen=SESSION_WINDOW)
+
+    @classmethod
+    def from_store(cls, store: QuestionStore) -> "Analytics":
+        """
+        computes the aggregates of every question of the store from the stats
+        columns, the topics and the histories of the answered questions, the
+        questions themselves are not decoded
+        """
+        names = ["total_times_question_attempted", "correct_times_question_attempted", "current_probability"]
+        stats = {name: np.array(store.column(name)) for name in names}
+        topics = store.topics()
+        histories = store.histories()
+        empty = AttemptHistory()
+        return cls(
+            stats,
+            store.tags(),
+            [topics.get(idx) for idx in range(len(store))],
+            [histories.get(idx, empty) for idx in range(len(store))],
+        )
+
+    def _tag_id(self, tag: str) -> int:
+        if tag not in self._tag_ids:
+            self._tag_ids[tag] = len(self.tag_names)
+            self.tag_names.append(tag)
+        return self._tag_ids[tag]
+
+    def _group(self, questions: np.ndarray, groups: np.ndarray, size: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        returns the number of questions, attempts and correct attempts of every
+        group, `questions` and `groups` are the pairs of (question, group)
+        """
+        return (
+            np.bincount(groups, minlength=size).astype(np.int64),
+            np.bincount(groups, weights=self.total[questions], minlength=size).astype(np.int64),
+            np.bincount(groups, weights=self.correct[questions], minlength=size).astype(np.int64),
+        )
+
+    def _learning_curve(self, histories: list[AttemptHistory]) -> tuple[np.ndarray, np.ndarray]:
+        """
+        returns the number of attempts and of correct attempts by attempt number
+        """
+        lengths = np.array([len(history) for history in histories], dtype=np.int64)
+        rows = np.flatnonzero(lengths)
+        if not len(rows):
+            return np.zeros(CURVE_LENGTH, dtype=np.int64), np.zeros(CURVE_LENGTH, dtype=np.int64)
+        size = (int(lengths.max()) + 7) // 8
+        width = size * 8
+        # one row of bits per answered question, the history is right-aligned
+        packed = np.frombuffer(b"".join(histories[row].packed(size) for row in rows), dtype=np.uint8)
+        bits = np.unpackbits(packed.reshape(len(rows), size), axis=1)
+        columns = np.arange(width)
+        valid = columns >= width - lengths[rows, None]
+        # the history only keeps the last attempts, the earlier ones are counted in the totals
+        first_attempt = np.maximum(self.total[rows], lengths[rows]) - width
+        attempt_number = np.clip(first_attempt[:, None] + columns, 0, CURVE_LENGTH - 1)
+        return (
+            np.bincount(attempt_number[valid], minlength=CURVE_LENGTH).astype(np.int64),
+            np.bincount(attempt_number[valid], weights=bits[valid], minlength=CURVE_LENGTH).astype(np.int64),
+        )
+
+    def questions_in_topic(self, topic: str) -> list[int]:
+        """
+        returns the indexes of the questions of the topic
+        """
+        if topic not in self.topic_names:
+            return []
+        return np.flatnonzero(self.topic_of == self.topic_names.index(topic)).tolist()
+
+    def update(self, idx: int, ques: dict) -> None:
+        """
+        applies the changes of a saved question to the aggregates
+        """
+        total = ques.get("total_times_question_attempted", 0)
+        correct = ques.get("correct_times_question_attempted", 0)
+        probability = ques.get("current_probability", 0)
+        old_total, old_correct = int(self.total[idx]), int(self.correct[idx])
+
+        old_tags = self.question_tags.get(idx, [])
+        new_tags = [self._tag_id(tag) for tag in ques.get("tags") or []]
+        if len(self.tag_names) > len(self.tag_total):
+            grow = len(self.tag_names) - len(self.tag_total)
+            self.tag_questions = np.append(self.tag_questions, np.zeros(grow, dtype=np.int64))
+            self.tag_total = np.append(self.tag_total, np.zeros(grow, dtype=np.int64))
+            self.tag_correct = np.append(self.tag_correct, np.zeros(grow, dtype=np.int64))
+        for tag_id in old_tags:
+            self.tag_questions[tag_id] -= 1
+            self.tag_total[tag_id] -= old_total
+            self.tag_correct[tag_id] -= old_correct
+        for tag_id in new_tags:
+            self.tag_questions[tag_id] += 1
+            self.tag_total[tag_id] += total
+            self.tag_correct[tag_id] += correct
+        self.question_tags[idx] = new_tags
+
+        topic = self.topic_of[idx]
+        if topic >= 0:
+            self.topic_total[topic] += total - old_total
+            self.topic_correct[topic] += correct - old_correct
+
+        if total == old_total + 1:
+            history = AttemptHistory.from_json(ques.get("attempt_history"))
+            is_correct = history[-1] if history else correct > old_correct
+            attempt_number = min(total - 1, CURVE_LENGTH - 1)
+            self.curve_attempts[attempt_number] += 1
+            self.curve_correct[attempt_number] += is_correct
+            self.session.append(is_correct)
+
+        if old_total > 0:
+            self.probability_histogram[_probability_bin(self.probability[idx])] -= 1
+        if total > 0:
+            self.probability_histogram[_probability_bin(probability)] += 1
+        self.total[idx] = total
+        self.correct[idx] = correct
+        self.probability[idx] = probability
+
+    def summary(self, weakest: int = 10) -> ProgressSummary:
+        """
+        returns the current aggregates and the `weakest` questions most likely
+        to be answered wrong
+        """
+        answered = np.flatnonzero(self.total > 0)
+        if len(answered) > weakest:
+            top = answered[np.argpartition(-self.probability[answered], weakest - 1)[:weakest]]
+        else:
+            top = answered
+        top = top[np.argsort(-self.probability[top], kind="stable")]
+
+        def groups(names, questions, total, correct) -> list[GroupAccuracy]:
+            accuracies = [
+                GroupAccuracy(name, int(questions[i]), int(total[i]), int(correct[i]))
+                for i, name in enumerate(names)
+                if questions[i] > 0
+            ]
+            return sorted(accuracies, key=lambda group: (group.accuracy if group.attempts else 2.0, group.name))
+
+        return ProgressSummary(
+            questions=len(self.total),
+            answered=len(answered),
+            attempts=int(self.total.sum()),
+            correct=int(self.correct.sum()),
+            tags=groups(self.tag_names, self.tag_questions, self.tag_total, self.tag_correct),
+            topics=groups(self.topic_names, self.topic_questions, self.topic_total, self.topic_correct),
+            learning_curve=[(int(a), int(c)) for a, c in zip(self.curve_attempts, self.curve_correct)],
+            session_attempts=len(self.session),
+            session_correct=sum(self.session),
+            weakest=[(int(idx), float(self.probability[idx])) for idx in top],
+            probability_histogram=[int(count) for count in self.probability_histogram],
+        )
@@ -1,37 +1,152 @@
 """
 This file contains the main app logic and Flet UI entry point.
 """
+from concurrent.futures import Future
 from copy import deepcopy
 from functools import partial
+from pathlib import Path
 from typing import Callable
 import re
-import json 
+import threading
 
 import flet as ft
-from src.quiz import Question, View
-from src.quiz import get_random_question, update_probability, update_question_in_file, all_tags_list
+from src.prefetch import Prefetcher
+from src.quiz import Question, QuizEngine, View, default_engine, update_probability
+from src.analytics import PROBABILITY_BINS, GroupAccuracy, ProgressSummary
+from src.exam import Exam, ExamResult
+from src.render_cache import RenderedQuestion, render_view_markdown
+from src.scheduler import SCHEDULERS
+from src.thumbnails import ThumbnailCache, default_cache
+from src.tracing import span, traced
 
 OPTIONS_MARGIN = ft.margin.only(left=10)
 CHECKBOX_MARGIN = ft.margin.all(-14)
+# the prefetched question is drawn again if an answer moves the distribution more than this
+PREFETCH_MAX_SHIFT = 0.05
 
-def main(page: ft.Page):
+def main(page: ft.Page, engine: QuizEngine | None = None) -> Callable[[], None]:
     """
-    Main entry point of the app
+    Main entry point of the app, the desktop app uses the default engine and
+    the web server the engine of the signed in user. Returns the function that
+    releases the threads of the session, the web server calls it when the
+    session is closed
     """
+    engine = engine or default_engine()
     page.title = "AWS Solutions Architect Associate Exam Prep"
     page.scroll = ft.ScrollMode.ADAPTIVE
 
+    # two question pages are reused in turns, the one that is not on screen gets the next question
+    question_pages: list["SinlgeQuestion"] = []
+
+    def _new_question_page() -> "SinlgeQuestion":
+        question = engine.get_random_question()
+        single_question = next(
+            (ques_page for ques_page in question_pages if ques_page is not app_container.content), None
+        )
+        if single_question is None:
+            single_question = SinlgeQuestion(question, _on_next_page, on_answered=_on_answered, engine=engine)
+            question_pages.append(single_question)
+        single_question.set_question(question)
+        return single_question
+
+    prefetcher = Prefetcher(_new_question_page)
+    # questions answered after the prefetched page was drawn, its data is outdated if it is one of them
+    answered_since_prefetch: set[int] = set()
+
+    @traced("next_page")
     def _on_next_page():
-        app_container.clean()
-        single_question = SinlgeQuestion(get_random_question(), _on_next_page)
-        app_container.content = single_question
-        app_container.update()
+        with span("prefetcher.take"):
+            app_container.content = prefetcher.take(
+                lambda single_question: single_question.question.index not in answered_since_prefetch
+            )
+        with span("app_container.update"):
+            app_container.update()
+        # build the next question while the user reads this one
+        answered_since_prefetch.clear()
+        prefetcher.prefetch()
+
+    def _on_answered(old_question: Question, new_question: Question):
+        if engine.distribution_shift(new_question.index, old_question.current_probability) > PREFETCH_MAX_SHIFT:
+            prefetcher.invalidate()
+            answered_since_prefetch.clear()
+            prefetcher.prefetch()
+        else:
+            answered_since_prefetch.add(new_question.index)
 
 
     def _on_click(_: ft.ControlEvent):
+        engine.set_scheduler(scheduler_dropdown.value or engine.scheduler_name)
+        matching = engine.set_tag_filter(selected_tags, match_all=bool(match_all_switch.value))
+        if selected_tags and matching == 0:
+            tag_filter_info.value = "No question has all the selected tags"
+            tag_filter_info.update()
+            return
         page.clean()
         page.add(app_container)
         _on_next_page()
+
+    selected_tags: list[str] = []
+
+    def _on_tag_selected(tag: str, e: ft.ControlEvent):
+        if tag in selected_tags:
+            selected_tags.remove(tag)
+        else:
+            selected_tags.append(tag)
+        e.control.selected = tag in selected_tags
+        e.control.update()
+
+    def _on_search(e: ft.ControlEvent):
+        query = e.control.value or ""
+        search_results.controls = []
+        for idx, _ in engine.search_questions(query):
+            question = engine.get_question(idx)
+            header, *body = question.question.split("\n")
+            search_results.controls.append(ft.ListTile(
+                title=ft.Text(header),
+                subtitle=ft.Text(re.sub(r"\s+", " ", " ".join(body)).strip(), max_lines=2),
+                on_click=partial(_open_question, question),
+            ))
+        if query and not search_results.controls:
+            search_results.controls.append(ft.Text("No question matches the search"))
+        search_results.update()
+
+    def _open_question(question: Question, _: ft.ControlEvent | None):
+        page.clean()
+        page.add(app_container)
+        app_container.content = SinlgeQuestion(question, _on_next_page, on_answered=_on_answered, engine=engine)
+        app_container.update()
+        prefetcher.prefetch()
+
+    def _on_progress(_: ft.ControlEvent):
+        with span("progress_summary"):
+            summary = engine.progress_summary()
+        page.show_dialog(ft.AlertDialog(
+            title=ft.Text("Progress"),
+            content=ft.Container(get_progress_view(engine, summary, _open_weak_question), width=700, height=600),
+            actions=[ft.TextButton("Close", on_click=lambda _: page.close_dialog())],
+        ))
+
+    def _on_exam(_: ft.ControlEvent):
+        page.clean()
+        page.add(app_container)
+        app_container.content = ExamPage(
+            engine, engine.start_exam(), lambda idx: _open_question(engine.get_question(idx), None)
+        )
+        app_container.update()
+
+    def _open_weak_question(idx: int, e: ft.ControlEvent):
+        page.close_dialog()
+        _open_question(engine.get_question(idx), e)
+
+    search_results = ft.Column()
+    match_all_switch = ft.Switch(label="Match all selected tags")
+    scheduler_dropdown = ft.Dropdown(
+        label="Question order",
+        value=engine.scheduler_name,
+        options=[ft.dropdown.Option(name, label) for name, label in SCHEDULERS.items()],
+        width=300,
+    )
+    tag_filter_info = ft.Text(color=ft.colors.RED_400)
     
     app_container = ft.Container(margin=ft.margin.only(left=5, top=10))
 
@@ -49,106 +164,245 @@ def main(page: ft.Page):
                     size=18,
                 ),
                 ft.Container(margin=ft.margin.only(bottom=10)),
-                ft.FilledButton("Start", on_click=_on_click),
+                ft.Text("Practice only the questions with these tags (optional)", size=16),
+                ft.Row(
+                    [ft.Chip(ft.Text(tag), on_select=partial(_on_tag_selected, tag)) for tag in engine.all_tags_list],
+                    wrap=True,
+                ),
+                match_all_switch,
+                tag_filter_info,
+                ft.Container(margin=ft.margin.only(bottom=10)),
+                scheduler_dropdown,
+                ft.Container(margin=ft.margin.only(bottom=10)),
+                ft.Row([
+                    ft.FilledButton("Start", on_click=_on_click),
+                    ft.OutlinedButton("Mock exam", icon=ft.icons.TIMER, on_click=_on_exam),
+                    ft.OutlinedButton("Progress", icon=ft.icons.INSIGHTS, on_click=_on_progress),
+                ]),
+                ft.Container(margin=ft.margin.only(bottom=10)),
+                ft.TextField(
+                    hint_text="Search questions, options and explinations",
+                    prefix_icon=ft.icons.SEARCH,
+                    on_submit=_on_search,
+                ),
+                search_results,
             ]
         )
     ) 
+    return prefetcher.close
+
+def get_progress_view(engine: QuizEngine, summary: ProgressSummary, on_open_question: Callable[[int, ft.ControlEvent], None]) -> ft.Control:
+    """
+    Renders the progress aggregates, `on_open_question` is called with the
+    index of a weak question that is clicked
+    """
+    def percent(correct: int, attempts: int) -> str:
+        return f"{correct / attempts:.0%}" if attempts else "-"
+
+    def bar(label: str, fraction: float, value: str) -> ft.Control:
+        return ft.Row([
+            ft.Text(label, width=140),
+            ft.ProgressBar(value=fraction, width=380, bar_height=12),
+            ft.Text(value, width=120),
+        ])
+
+    def groups_table(title: str, groups: list[GroupAccuracy]) -> list[ft.Control]:
+        if not groups:
+            return []
+        return [
+            ft.Text(title, size=18),
+            ft.DataTable(
+                columns=[
+                    ft.DataColumn(ft.Text(title.split()[-1].capitalize())),
+                    ft.DataColumn(ft.Text("Questions"), numeric=True),
+                    ft.DataColumn(ft.Text("Attempts"), numeric=True),
+                    ft.DataColumn(ft.Text("Accuracy"), numeric=True),
+                ],
+                rows=[
+                    ft.DataRow(cells=[
+                        ft.DataCell(ft.Text(group.name)),
+                        ft.DataCell(ft.Text(str(group.questions))),
+                        ft.DataCell(ft.Text(str(group.attempts))),
+                        ft.DataCell(ft.Text(percent(group.correct, group.attempts))),
+                    ])
+                    for group in groups
+                ],
+            ),
+        ]
+
+    curve = [
+        bar(
+            f"Attempt {number}{'+' if number == len(summary.learning_curve) else ''}",
+            correct / attempts,
+            f"{percent(correct, attempts)} of {attempts}",
+        )
+        for number, (attempts, correct) in enumerate(summary.learning_curve, start=1)
+        if attempts
+    ]
+    most = max(summary.probability_histogram, default=0) or 1
+    histogram = [
+        bar(f"{i / PROBABILITY_BINS:.1f} - {(i + 1) / PROBABILITY_BINS:.1f}", count / most, f"{count} questions")
+        for i, count in enumerate(summary.probability_histogram)
+    ]
+    weakest = []
+    for idx, probability in summary.weakest:
+        header = engine.get_question(idx).question.split("\n")[0]
+        weakest.append(ft.ListTile(
+            title=ft.Text(header),
+            trailing=ft.Text(f"{probability:.2f}"),
+            on_click=partial(on_open_question, idx),
+        ))
+
+    return ft.Column(
+        controls=[
+            ft.Text(
+                f"{summary.answered} of {summary.questions} questions answered, "
+                f"{summary.attempts} attempts, {percent(summary.correct, summary.attempts)} correct",
+                size=16,
+            ),
+            ft.Text(
+                f"This session: {percent(summary.session_correct, summary.session_attempts)} correct"
+                f" of the last {summary.session_attempts} answers",
+                size=16,
+            ),
+            *groups_table("Accuracy per tag", summary.tags),
+            *groups_table("Accuracy per topic", summary.topics),
+            *([ft.Text("Accuracy by attempt", size=18), *curve] if curve else []),
+            *([ft.Text("Weakest questions", size=18), *weakest] if weakest else []),
+            ft.Text("Probability of the answered questions", size=18),
+            *histogram,
+        ],
+        scroll=ft.ScrollMode.AUTO,
+    )
+
 
 class SinlgeQuestion(ft.UserControl):
-    def __init__(self, question: Question, next_page_callback: Callable[[], None], is_editable: bool = False):
+    def __init__(
+        self,
+        question: Question,
+        next_page_callback: Callable[[], None],
+        is_editable: bool = False,
+        on_answered: Callable[[Question, Question], None] | None = None,
+        engine: QuizEngine | None = None,
+    ):
+        self.engine = engine or default_engine()
         self.question = question
         self.chosen_answers_list: list[int] = []
         self.allowed_answers = max(1, len(question.answers))
         self.next_page_callback = next_page_callback
         self.is_editable = is_editable
+        self.on_answered = on_answered
+        self.built_view: ft.Control | None = None
         super().__init__()
 
+    @traced()
     def build(self):
-        ques_header, ques_body = self.get_header_and_description()
-        # is_editable = self.is_editable
-
-        self.checkboxes = []
-        for i in range(len(self.question.options)):
-            check_box = ft.Checkbox(
-                on_change=partial(self.on_option_selected, i),
-            )
-            self.checkboxes.append(check_box)
+        if self.built_view is None:
+            self.prebuild()
+        return self.built_view
 
-        options_group: list[ft.Control] = [
-            ft.Container(
-                ft.Row(
-                    [
-                        ft.Container(
-                            self.checkboxes[i],
-                            margin = CHECKBOX_MARGIN,
-                        ),
-                        *self.__split_text_to_widgets(
-                            option, partial(self.on_option_selected, i), size=14
-                        ),
-                        ft.Container(margin=ft.margin.only(bottom=4))
-                    ],
-                    wrap=True,  # Wrap the options to next line if the options exceed the width of the screen
-                ),
-                on_click=partial(self.on_option_selected, i),
-            )
-            for i, option in enumerate(self.question.options)
-        ]
+    @traced()
+    def prebuild(self):
+        """
+        builds the control tree ahead of time, it can run outside the UI thread
+        as long as the control is not on the page yet. The tree is built once,
+        later questions only rebind it (see set_question)
+        """
+        self.checkboxes: list[ft.Checkbox] = []
+        self.option_texts: list[ft.Text] = []
+        self.option_rows: list[ft.Control] = []
+        self.options_column = ft.Column()
 
-        self.submit_button = ft.FilledButton(
-            "Submit",
-            on_click=self.on_submit_button_click,
-            disabled=len(self.chosen_answers_list) < self.allowed_answers,
-        )
+        self.submit_button = ft.FilledButton("Submit")
 
-        self.tags_view = []
+        self.header_text = ft.Text(size=28)
+        self.tags_row = ft.Row(wrap=True)
         self.header_row: ft.Control = ft.Row([ 
-            ft.Text(ques_header, size=28), 
-            ft.Row(self.tags_view, wrap=True),
+            self.header_text,
+            self.tags_row,
             ft.IconButton(
                 icon=ft.icons.NEW_LABEL, on_click=self.show_add_tag_dialog
             ),
         ], wrap=True)
+        self.body_text = ft.Text(size=18, selectable=True)
         self.explination_view = ft.Container()
-        self.update_tags_view()
+        self.additional_view = ft.Column()
 
-        self.additional_view: ft.Control = ft.Column(
-            controls=[
-                self.get_json_view(view, silent=False)
-                for view in self.question.views
-            ]
-        ) if self.question.views is not None else ft.Container()
-
-        return ft.Column(
+        self.built_view = ft.Column(
             controls=[
                 self.header_row,
-                ft.Text(ques_body, size=18, selectable=True),
+                self.body_text,
                 self.additional_view,
                 ft.Container(margin=ft.margin.only(bottom=16)),
-                ft.Container(ft.Column(options_group), margin=OPTIONS_MARGIN),
+                ft.Container(self.options_column, margin=OPTIONS_MARGIN),
                 ft.Container(margin=ft.margin.only(bottom=10)),
                 self.submit_button,
                 self.explination_view,
             ]
         )
+        self.bind_question()
+
+    @traced()
+    def set_question(self, question: Question):
+        """
+        shows another question reusing the existing controls, like prebuild
+        it must not be called while the control is on the page
+        """
+        self.question = question
+        self.chosen_answers_list = []
+        self.allowed_answers = max(1, len(question.answers))
+        if self.built_view is None:
+            self.prebuild()
+        else:
+            self.bind_question()
 
-    def get_json_view(self, view: View, silent: bool = True) -> ft.Control:
+    def bind_question(self):
+        """
+        puts the current question into the controls
+        """
+        rendered = self.engine.render(self.question)
+        ques_header, ques_body = self.get_header_and_description(rendered)
+        self.header_text.value = ques_header
+        self.body_text.value = ques_body
+        self.update_tags_view()
+
+        self.additional_view.controls = [
+            self.get_json_view(view, silent=False, markdown=markdown)
+            for view, markdown in zip(self.question.views or [], rendered.views)
+        ]
+
+        # grow the pool of option rows if this question has more options than any before
+        for i in range(len(self.option_rows), len(self.question.options)):
+            self.__add_option_row(i)
+        for i, row in enumerate(self.option_rows):
+            row.visible = i < len(self.question.options)
+            self.checkboxes[i].value = False
+            self.checkboxes[i].fill_color = None
+            self.option_texts[i].value = self.question.options[i] if row.visible else None
+
+        self.submit_button.text = "Submit"
+        self.submit_button.on_click = self.on_submit_button_click
+        self.submit_button.disabled = len(self.chosen_answers_list) < self.allowed_answers
+        self.explination_view.content = None
+
+    def get_json_view(self, view: View, silent: bool = True, markdown: str | None = None) -> ft.Control:
         """
         Returns a Flet control based on the view json
         if silent is True, then it will not raise an error if the view is invalid
+        markdown is the cached render of a json view (see src.render_cache)
         """
         try: 
             view_type = view.type
             if view_type == "text":
                 return ft.Text(str(view.value))
             elif view_type == "json":
-                json_str = json.dumps(view.value, indent=4)
-                md_text = f"```json\n{json_str}\n```"
-                md_header = view.name
-                md = f"### {md_header}\n{md_text}\n"
+                md = markdown or render_view_markdown(view)
                 return ft.Markdown(md,
                     extension_set=ft.MarkdownExtensionSet.GITHUB_WEB,
                     code_theme="tomorrow-night-eighties",
                     code_style=ft.TextStyle(font_family="Roboto Mono"),)
+            elif view_type == "image":
+                return ImageView(view, default_cache())
             else:
                 if not silent:
                     raise ValueError(f"Invalid view type {view_type}")
@@ -160,18 +414,16 @@ class SinlgeQuestion(ft.UserControl):
 
     def delete_tag(self, tag: str, _: ft.ControlEvent | None):
         self.question.tags.remove(tag)
-        update_question_in_file(self.question)
+        self.engine.update_question_in_file(self.question)
         self.update_tags_view()
         self.update()
         if self.page is not None:
             self.page.update()
 
     def update_tags_view(self):
-        self.tags_view: list[ft.Control] = [
+        self.tags_row.controls = [
             ft.Chip(ft.Text(tag), on_delete=partial(self.delete_tag, tag))  for tag in self.question.tags
         ]
-        header: ft.Row = self.header_row # type: ignore
-        header.controls[1] = ft.Row(self.tags_view, wrap=True)
 
     def show_add_tag_dialog(self, _: ft.ControlEvent):
         """
@@ -187,7 +439,7 @@ class SinlgeQuestion(ft.UserControl):
 
         def assign_tag(tag:str):
             self.question.tags.append(tag)
-            update_question_in_file(self.question)
+            self.engine.update_question_in_file(self.question)
             self.update_tags_view()
             self.update()
             if self.page is not None:
@@ -198,7 +450,7 @@ class SinlgeQuestion(ft.UserControl):
             assign_tag(tag)
 
         tag_input = ft.TextField()
-        tags_list: list[ft.Control] = [ ft.TextButton(tag, on_click=partial(change_input, tag) ) for tag in all_tags_list ]
+        tags_list: list[ft.Control] = [ ft.TextButton(tag, on_click=partial(change_input, tag) ) for tag in self.engine.all_tags_list ]
         dialog = ft.AlertDialog(
             title=ft.Text("Add new tag"),
             content=ft.Column(
@@ -216,9 +468,9 @@ class SinlgeQuestion(ft.UserControl):
         if self.page is not None:
             self.page.show_dialog(dialog)
     
-    def get_header_and_description(self):
-        global __get_header_and_description
-        header_text, body = self.__get_header_and_description(self.question)
+    def get_header_and_description(self, rendered: RenderedQuestion | None = None):
+        rendered = rendered or self.engine.render(self.question)
+        header_text, body = rendered.header, rendered.body
         if self.allowed_answers > 1:
             body += (
                 f" (Choose any { 'two' if self.allowed_answers == 2 else 'three' } options.)"
@@ -231,8 +483,10 @@ class SinlgeQuestion(ft.UserControl):
         self.__put_ans_in_list(i, self.chosen_answers_list, self.allowed_answers)
         self.__update_check_boxes_ui(i, self.checkboxes, self.chosen_answers_list, is_tapped_on_text)
         self.submit_button.disabled = len(self.chosen_answers_list) < self.allowed_answers
-        self.update()
+        with span("SinlgeQuestion.update"):
+            self.update()
 
+    @traced()
     def on_submit_button_click(self, _: ft.ControlEvent):
         """If submit button is clicked, this function is called"""
         self.update_wrong_and_right_checkboxes_ui()
@@ -247,7 +501,8 @@ class SinlgeQuestion(ft.UserControl):
     
         if len(self.question.answers) > 0:
             self.update_question_details()
-        self.update()
+        with span("SinlgeQuestion.update"):
+            self.update()
 
     def show_explination(self):
         explination = self.question.explination
@@ -258,9 +513,11 @@ class SinlgeQuestion(ft.UserControl):
                     ft.Text(explination, size=14, selectable=True),
                 ]
             )
-            self.update()
+            with span("SinlgeQuestion.update"):
+                self.update()
         if self.page is not None:
-            self.page.update()
+            with span("page.update"):
+                self.page.update()
 
     def update_wrong_and_right_checkboxes_ui(self):
         for i in self.question.answers:
@@ -282,12 +539,14 @@ class SinlgeQuestion(ft.UserControl):
     def update_question_details(self):
         is_correct = set(self.chosen_answers_list) == set(self.question.answers)
         new_data = update_probability(self.question, is_correct)
-        update_question_in_file(new_data)
+        self.engine.update_question_in_file(new_data)
+        if self.on_answered is not None:
+            self.on_answered(self.question, new_data)
 
     def update_answer_and_get_next_page(self, _: ft.ControlEvent | None = None):
         new_ques_data = deepcopy(self.question)
         new_ques_data.answers = self.chosen_answers_list
-        update_question_in_file(new_ques_data)
+        self.engine.update_question_in_file(new_ques_data)
         page = self.page
         if page is not None:
             page.close_dialog()
@@ -320,16 +579,6 @@ class SinlgeQuestion(ft.UserControl):
         )
 
 
-    def __get_header_and_description(self, question_data: Question) -> tuple[str, str]:
-        """
-        Returns header and description for the question
-        """
-        ques = question_data.question.split("\n")
-        question_header = ques[0]
-        question_body = re.sub(r'\s+', " ", r" ".join(ques[1:]))
-        return question_header, question_body
-
-
     def __put_ans_in_list(self, i: int, chosen_answers_list: list[int], allowed_answers: int):
         """
         Selects an answer
@@ -362,16 +611,221 @@ class SinlgeQuestion(ft.UserControl):
             checkbox.value = False
 
 
-    def __split_text_to_widgets(self, text: str, click_fn, **kwargs) -> list[ft.Control]:
+    def __add_option_row(self, i: int):
         """
-        Breaks text into list of ft.Text widgets this is used to wrap the options to next line
-        as the default ft.Text widget does not support wrapping it wraps the whole text field
+        Adds a reusable option row, the option text is a single wrapping
+        ft.Text and tapping anywhere on the row toggles the checkbox
         """
-        return [
+        check_box = ft.Checkbox(on_change=partial(self.on_option_selected, i))
+        text = ft.Text(size=14, expand=True)
+        row = ft.Container(
+            ft.Row(
+                [
+                    ft.Container(check_box, margin=CHECKBOX_MARGIN),
+                    text,
+                ],
+                vertical_alignment=ft.CrossAxisAlignment.START,
+            ),
+            padding=ft.padding.only(bottom=4),
+            on_click=lambda _: self.on_option_selected(i, None),
+        )
+        self.checkboxes.append(check_box)
+        self.option_texts.append(text)
+        self.option_rows.append(row)
+        self.options_column.controls.append(row)
+
+
+class ImageView(ft.UserControl):
+    """
+    Thumbnail of an image view, the full resolution image is shown in a
+    dialog when the thumbnail is clicked. The images are read on the threads
+    of the thumbnail cache and shown when they are ready
+    """
+
+    def __init__(self, view: View, thumbnails: ThumbnailCache):
+        self.view = view
+        self.thumbnails = thumbnails
+        self.image = ft.Image(fit=ft.ImageFit.CONTAIN, visible=False, gapless_playback=True)
+        self.status = ft.Container(ft.ProgressRing(width=24, height=24))
+        super().__init__()
+        # the controls exist before build, the thumbnail may be ready before the view is on the page
+        self.thumbnails.thumbnail_base64(Path(str(view.value))).add_done_callback(self._on_thumbnail)
+
+    def build(self):
+        return ft.Column([
+            ft.Text(self.view.name, size=16),
             ft.Container(
-                ft.Text(line, **kwargs),
-                margin=ft.margin.only(right=-6, top=-4, bottom=-4),
-                on_click=lambda _: click_fn(None),
-            )
-            for line in text.replace("\n", "").split()
+                ft.Stack([self.status, self.image]),
+                width=self.thumbnails.size,
+                on_click=self.show_full_image,
+                tooltip="Click to expand",
+            ),
+        ])
+
+    def _on_thumbnail(self, future: Future[str]):
+        try:
+            self.image.src_base64 = future.result()
+            self.image.visible = True
+            self.status.visible = False
+        except Exception as e:
+            self.status.content = ft.Text(f"Could not load {self.view.value}: {e}", color=ft.colors.RED_400)
+        if self.page is not None:
+            self.update()
+
+    def show_full_image(self, _: ft.ControlEvent):
+        page = self.page
+        if page is None or not self.image.visible:
+            return
+        full_image = ft.Image(src_base64=self.image.src_base64, fit=ft.ImageFit.CONTAIN, gapless_playback=True)
+        page.show_dialog(ft.AlertDialog(
+            title=ft.Text(self.view.name),
+            content=ft.Container(full_image, width=1280),
+            actions=[ft.TextButton("Close", on_click=lambda _: page.close_dialog())],
+        ))
+
+        def _on_full_image(future: Future[str]):
+            if future.exception() is None:
+                full_image.src_base64 = future.result()
+                if full_image.page is not None:
+                    full_image.update()
+
+        # the thumbnail is shown until the full resolution image is read
+        self.thumbnails.full_image_base64(Path(str(self.view.value))).add_done_callback(_on_full_image)
+
+
+class ExamQuestion(SinlgeQuestion):
+    """
+    Question page of a mock exam, the chosen options are recorded in the exam
+    and only graded when it ends
+    """
+
+    def __init__(self, engine: QuizEngine, exam: Exam, on_answer: Callable[[], None] | None = None):
+        self.exam = exam
+        self.position = 0
+        self.on_answer = on_answer
+        super().__init__(exam.questions[0], lambda: None, engine=engine)
+
+    def show(self, position: int):
+        self.position = position
+        self.set_question(self.exam.questions[position])
+
+    def bind_question(self):
+        super().bind_question()
+        self.submit_button.visible = False
+        self.chosen_answers_list = list(self.exam.answers.get(self.position, []))
+        for i in self.chosen_answers_list:
+            self.checkboxes[i].value = True
+
+    def on_option_selected(self, i: int, e: ft.ControlEvent | None):
+        if self.exam.is_over():
+            return
+        super().on_option_selected(i, e)
+        self.exam.answer(self.position, self.chosen_answers_list)
+        if self.on_answer is not None:
+            self.on_answer()
+
+
+class ExamPage(ft.UserControl):
+    """
+    Runs a mock exam: one question at a time with a countdown, the exam is
+    graded and saved when it is finished or the time is up
+    """
+
+    def __init__(self, engine: QuizEngine, exam: Exam, on_open_question: Callable[[int], None]):
+        self.engine = engine
+        self.exam = exam
+        self.on_open_question = on_open_question
+        self.result: ExamResult | None = None
+        self._stop_timer = threading.Event()
+        self._finish_lock = threading.Lock()
+        super().__init__()
+
+    def build(self):
+        self.question_page = ExamQuestion(self.engine, self.exam, on_answer=self.on_answer)
+        self.position_text = ft.Text(size=16)
+        self.timer_text = ft.Text(size=16, weight=ft.FontWeight.BOLD)
+        self.previous_button = ft.OutlinedButton("Previous", on_click=lambda _: self.go_to(self.question_page.position - 1))
+        self.next_button = ft.FilledButton("Next", on_click=lambda _: self.go_to(self.question_page.position + 1))
+        self.view = ft.Column([
+            ft.Row([
+                self.position_text,
+                self.timer_text,
+                self.previous_button,
+                self.next_button,
+                ft.TextButton("Finish exam", on_click=lambda _: self.finish()),
+            ], wrap=True),
+            self.question_page,
+        ])
+        self.update_status()
+        return self.view
+
+    def did_mount(self):
+        threading.Thread(target=self._run_timer, name="exam-timer", daemon=True).start()
+
+    def will_unmount(self):
+        self._stop_timer.set()
+
+    def _run_timer(self):
+        while not self._stop_timer.wait(1):
+            if self.exam.is_over():
+                self.finish()
+                return
+            self.timer_text.value = self._format_remaining()
+            self.timer_text.update()
+
+    def _format_remaining(self) -> str:
+        minutes, seconds = divmod(int(self.exam.remaining()), 60)
+        return f"{minutes // 60}:{minutes % 60:02}:{seconds:02} left"
+
+    def update_status(self):
+        position = self.question_page.position
+        self.position_text.value = f"Question {position + 1} of {len(self.exam)} ({self.exam.answered()} answered)"
+        self.timer_text.value = self._format_remaining()
+        self.previous_button.disabled = position == 0
+        self.next_button.disabled = position == len(self.exam) - 1
+
+    def on_answer(self):
+        self.update_status()
+        self.position_text.update()
+
+    def go_to(self, position: int):
+        if not 0 <= position < len(self.exam):
+            return
+        self.question_page.show(position)
+        self.update_status()
+        self.update()
+
+    def finish(self):
+        """
+        grades and saves the exam once and shows the results
+        """
+        with self._finish_lock:
+            if self.result is not None:
+                return
+            self._stop_timer.set()
+            self.result = self.engine.finish_exam(self.exam)
+        result = self.result
+        minutes = int(result.time_taken // 60)
+        rows: list[ft.Control] = []
+        for position, (question, grade) in enumerate(zip(self.exam.questions, result.grades)):
+            if grade is None:
+                icon, color = ft.icons.HELP_OUTLINE, ft.colors.GREY_500
+            elif grade:
+                icon, color = ft.icons.CHECK_CIRCLE, ft.colors.GREEN_900
+            else:
+                icon, color = ft.icons.CANCEL, ft.colors.RED_900
+            header = question.question.split("\n")[0]
+            rows.append(ft.ListTile(
+                leading=ft.Icon(icon, color=color),
+                title=ft.Text(f"{position + 1}. {header}"),
+                on_click=lambda _, idx=question.index: self.on_open_question(idx),
+            ))
+        self.view.controls = [
+            ft.Text("Passed" if result.passed else "Not passed", size=28),
+            ft.Text(
+                f"{result.correct} of {result.graded} correct ({result.score:.0%}) in {minutes} minutes",
+                size=18,
+            ),
+            *rows,
         ]
+        self.update()
@@ -0,0 +1,128 @@
+"""
+This module contains the compact attempt history of a question.
+
+The attempts are packed one bit each into a python int (the oldest attempt is
+the highest bit). Every attempt is kept unless a window is set with
+QUIZ_HISTORY_WINDOW, then only the last `HISTORY_WINDOW` attempts are kept and
+the totals of all the attempts live in the question counters. The history is
+stored in the data file as "<length>:<bits in hex>" instead of a list of
+true/false tokens, the old list format is still read.
+"""
+import os
+from typing import Iterable, Iterator
+
+# number of attempts kept per question, 0 (the default) keeps all of them
+HISTORY_WINDOW = int(os.environ.get("QUIZ_HISTORY_WINDOW") or 0)
+
+
+class AttemptHistory:
+    """
+    Bit-packed sequence of the results (True if correct) of the last
+    attempts of a question, oldest first
+    """
+
+    __slots__ = ("_bits", "_length", "window")
+
+    def __init__(self, attempts: Iterable[bool] = (), window: int = HISTORY_WINDOW):
+        attempts = list(attempts)
+        if window:
+            attempts = attempts[-window:]
+        self._bits = int("".join(["1" if is_correct else "0" for is_correct in attempts]), 2) if attempts else 0
+        self._length = len(attempts)
+        self.window = window
+
+    @classmethod
+    def from_json(cls, value, window: int = HISTORY_WINDOW) -> "AttemptHistory":
+        """
+        parses the stored form of the history (see `to_json`), a list of
+        booleans or None
+        """
+        if isinstance(value, AttemptHistory):
+            return value.copy()
+        if isinstance(value, str):
+            length, _, bits = value.partition(":")
+            history = cls._packed(int(bits, 16) if bits else 0, int(length), window)
+            history._trim()
+            return history
+        return cls(value or (), window)
+
+    @classmethod
+    def _packed(cls, bits: int, length: int, window: int) -> "AttemptHistory":
+        history = cls.__new__(cls)
+        history._bits = bits
+        history._length = length
+        history.window = window
+        return history
+
+    def to_json(self) -> str:
+        """
+        returns the history as "<length>:<bits in hex>"
+        """
+        return f"{self._length}:{self._bits:x}"
+
+    def append(self, is_correct: bool) -> None:
+        self._bits = (self._bits << 1) | bool(is_correct)
+        self._length += 1
+        self._trim()
+
+    def follows(self, previous: "AttemptHistory") -> bool:
+        """
+        returns whether this history is `previous` plus one attempt
+        """
+        if not self._length or self._length != min(previous._length + 1, self.window or previous._length + 1):
+            return False
+        bits = (previous._bits << 1) | (self._bits & 1)
+        if self.window:
+            bits &= (1 << self.window) - 1
+        return bits == self._bits
+
+    def copy(self) -> "AttemptHistory":
+        return self._packed(self._bits, self._length, self.window)
+
+    def correct(self) -> int:
+        """
+        returns the number of correct attempts in the history
+        """
+        return self._bits.bit_count()
+
+    def packed(self, size: int) -> bytes:
+        """
+        returns the bits right-aligned in `size` bytes (big endian), the
+        oldest attempt first
+        """
+        return self._bits.to_bytes(size, "big")
+
+    def _trim(self) -> None:
+        if self.window and self._length > self.window:
+            self._length = self.window
+            self._bits &= (1 << self.window) - 1
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __iter__(self) -> Iterator[bool]:
+        bits, length = self._bits, self._length
+        for shift in range(length - 1, -1, -1):
+            yield bool((bits >> shift) & 1)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return list(self)[key]
+        if key < 0:
+            key += self._length
+        if not 0 <= key < self._length:
+            raise IndexError("attempt history index out of range")
+        return bool((self._bits >> (self._length - 1 - key)) & 1)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, AttemptHistory):
+            return self._length == other._length and self._bits == other._bits
+        if isinstance(other, (list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __deepcopy__(self, memo) -> "AttemptHistory":
+        return self.copy()
+
+    def __repr__(self) -> str:
+        return f"AttemptHistory({list(self)!r})"
@@ -0,0 +1,131 @@
+"""
+This module contains the timed mock exam.
+
+The whole exam is drawn up front with weighted sampling without replacement
+(Efraimidis-Spirakis): every question gets the key log(u) / weight for a
+uniform u and the questions with the largest keys are taken, which is the
+same as drawing them one by one proportionally to their weights without
+putting them back. Only the k largest keys are kept in a heap, so drawing k
+out of n questions is O(n log k). The answers are graded when the exam ends.
+"""
+import heapq
+import math
+import random
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Sequence
+
+if TYPE_CHECKING:
+    from src.quiz import Question
+
+# the SAA-C03 exam has 65 questions in 130 minutes and is passed with 720 out of 1000
+EXAM_QUESTIONS = 65
+EXAM_MINUTES = 130
+PASSING_SCORE = 0.72
+
+
+def draw_exam(
+    weights: Sequence[float],
+    size: int,
+    quotas: dict[str, int] | None = None,
+    groups: dict[str, list[int]] | None = None,
+    rng: random.Random | None = None,
+) -> list[int]:
+    """
+    draws the questions of an exam, at least `quotas[name]` of them out of
+    `groups[name]` (as long as the group has that many) and the rest out of
+    every question. The questions are returned in random order.
+    """
+    rng = rng or random.Random()
+    # the key of a question is drawn once so it ranks the same in every group
+    keys: dict[int, float] = {}
+
+    def key(idx: int) -> float:
+        if idx not in keys:
+            keys[idx] = math.log(1.0 - rng.random()) / weights[idx] if weights[idx] > 0 else -math.inf
+        return keys[idx]
+
+    chosen: list[int] = []
+    taken: set[int] = set()
+    for name, quota in (quotas or {}).items():
+        members = (idx for idx in (groups or {}).get(name, []) if idx not in taken and weights[idx] > 0)
+        for idx in heapq.nlargest(min(quota, size - len(chosen)), members, key=key):
+            chosen.append(idx)
+            taken.add(idx)
+    rest = (idx for idx in range(len(weights)) if idx not in taken and weights[idx] > 0)
+    chosen.extend(heapq.nlargest(size - len(chosen), rest, key=key))
+    rng.shuffle(chosen)
+    return chosen
+
+
+@dataclass
+class ExamResult:
+    """
+    Grades of an exam, a grade is None for a question without an answer key
+    """
+    grades: list[bool | None]
+    time_taken: float
+
+    @property
+    def graded(self) -> int:
+        return sum(grade is not None for grade in self.grades)
+
+    @property
+    def correct(self) -> int:
+        return sum(grade is True for grade in self.grades)
+
+    @property
+    def score(self) -> float:
+        return self.correct / self.graded if self.graded else 0.0
+
+    @property
+    def passed(self) -> bool:
+        return self.score >= PASSING_SCORE
+
+
+@dataclass
+class Exam:
+    """
+    A running exam, the answers are only recorded until `grade` is called
+    """
+    questions: list["Question"]
+    duration: float = EXAM_MINUTES * 60
+    started_at: float = field(default_factory=time.monotonic)
+    # position of the question in the exam -> chosen options
+    answers: dict[int, list[int]] = field(default_factory=dict)
+    finished_at: float | None = None
+    # set once the results are saved to the questions, see QuizEngine.finish_exam
+    saved: bool = False
+
+    def __len__(self) -> int:
+        return len(self.questions)
+
+    def remaining(self) -> float:
+        """
+        returns the seconds left, the clock stops when the exam is finished
+        """
+        end = self.finished_at if self.finished_at is not None else time.monotonic()
+        return max(0.0, self.duration - (end - self.started_at))
+
+    def is_over(self) -> bool:
+        return self.finished_at is not None or self.remaining() == 0
+
+    def answer(self, position: int, chosen: list[int]) -> None:
+        if self.is_over():
+            raise RuntimeError("The exam is over")
+        self.answers[position] = list(chosen)
+
+    def answered(self) -> int:
+        return sum(bool(chosen) for chosen in self.answers.values())
+
+    def grade(self) -> ExamResult:
+        """
+        ends the exam and grades the answers, unanswered questions are wrong
+        """
+        if self.finished_at is None:
+            self.finished_at = min(time.monotonic(), self.started_at + self.duration)
+        grades: list[bool | None] = [
+            set(self.answers.get(position, [])) == set(question.answers) if question.answers else None
+            for position, question in enumerate(self.questions)
+        ]
+        return ExamResult(grades, self.finished_at - self.started_at)
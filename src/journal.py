@@ -0,0 +1,214 @@
+"""
+This module contains the append-only journal used to persist question updates.
+
+Instead of rewriting the whole question bank on every answer, every change is
+appended to the journal as a small json record (one record per line). The
+journal is replayed on load and compacted back into the data file in the
+background, the data file is always replaced with an atomic rename.
+"""
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Callable, Iterator, MutableSequence
+
+from src.attempt_history import AttemptHistory
+
+ATTEMPT_FIELDS = {
+    "total_times_question_attempted",
+    "correct_times_question_attempted",
+    "current_probability",
+    "attempt_history",
+}
+
+
+def diff_records(index: int, old: dict, new: dict) -> list[dict]:
+    """
+    returns the journal records needed to turn the `old` question dict into `new`
+    """
+    records: list[dict] = []
+    handled = {"tags", "answers"}
+
+    old_total = old.get("total_times_question_attempted", 0)
+    new_total = new.get("total_times_question_attempted", 0)
+    old_history = AttemptHistory.from_json(old.get("attempt_history"))
+    new_history = AttemptHistory.from_json(new.get("attempt_history"))
+    if new_total == old_total + 1 and new_history.follows(old_history):
+        records.append({
+            "op": "attempt",
+            "index": index,
+            "correct": new_history[-1],
+            "total": new_total,
+            "correct_total": new.get("correct_times_question_attempted", 0),
+            "probability": new.get("current_probability", 0),
+        })
+        handled |= ATTEMPT_FIELDS
+
+    old_tags = old.get("tags") or []
+    new_tags = new.get("tags") or []
+    for tag in old_tags:
+        if tag not in new_tags:
+            records.append({"op": "tag_remove", "index": index, "tag": tag})
+    for tag in new_tags:
+        if tag not in old_tags:
+            records.append({"op": "tag_add", "index": index, "tag": tag})
+
+    if (new.get("answers") or []) != (old.get("answers") or []):
+        records.append({"op": "answers", "index": index, "answers": new["answers"]})
+
+    changed = {
+        key: value for key, value in new.items()
+        if key not in handled and key != "attempt_history" and old.get(key) != value
+    }
+    if "attempt_history" not in handled and new_history != old_history:
+        changed["attempt_history"] = new_history.to_json()
+    if changed:
+        records.append({"op": "set", "index": index, "fields": changed})
+    return records
+
+
+def apply_record(questions: MutableSequence[dict], record: dict) -> None:
+    """
+    applies a journal record to the list of question dicts
+
+    Every record is idempotent so replaying records that were already
+    compacted into the data file is harmless. The stored dict is replaced
+    instead of being mutated so snapshots taken for compaction stay valid.
+    """
+    idx = record["index"]
+    ques = dict(questions[idx])
+    op = record["op"]
+    if op == "attempt":
+        if ques.get("total_times_question_attempted", 0) >= record["total"]:
+            return
+        ques["total_times_question_attempted"] = record["total"]
+        ques["correct_times_question_attempted"] = record["correct_total"]
+        ques["current_probability"] = record["probability"]
+        history = AttemptHistory.from_json(ques.get("attempt_history"))
+        history.append(record["correct"])
+        ques["attempt_history"] = history.to_json()
+    elif op == "tag_add":
+        tags = ques.get("tags") or []
+        if record["tag"] not in tags:
+            ques["tags"] = [*tags, record["tag"]]
+    elif op == "tag_remove":
+        ques["tags"] = [tag for tag in ques.get("tags") or [] if tag != record["tag"]]
+    elif op == "answers":
+        ques["answers"] = list(record["answers"])
+    elif op == "set":
+        ques.update(record["fields"])
+    else:
+        raise ValueError(f"Invalid journal record {op}")
+    questions[idx] = ques
+
+
+def write_json_atomic(path: Path, data) -> None:
+    """
+    writes the data as json to a temporary file and renames it over `path`
+    so a crash never leaves a truncated file behind
+    """
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=4)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class Journal:
+    """
+    Append-only log of question changes that belongs to a data file,
+    `write_snapshot` is called with a snapshot to write the data file
+    """
+
+    def __init__(self, path: Path, write_snapshot: Callable[[Any], None]):
+        self.path = Path(path)
+        self.write_snapshot = write_snapshot
+        self.pending = 0
+        self._lock = threading.Lock()
+        self._compaction: threading.Thread | None = None
+        self._file = open(self.path, "ab")
+
+    def replay(self) -> Iterator[dict]:
+        """
+        yields the records stored in the journal, a partially written
+        trailing record (crash during append) is dropped from the file
+        """
+        good_until = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                good_until += len(line)
+                self.pending += 1
+                yield record
+        if good_until != self._file.tell():
+            with self._lock:
+                self._file.truncate(good_until)
+                self._file.seek(good_until)
+
+    def append(self, records: list[dict]) -> None:
+        """
+        appends the records to the journal and syncs them to disk
+        """
+        if not records:
+            return
+        data = "".join(json.dumps(record) + "\n" for record in records).encode("utf-8")
+        with self._lock:
+            self._file.write(data)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self.pending += len(records)
+
+    def compact(self, snapshot: Callable[[], Any], background: bool = True, force: bool = False) -> None:
+        """
+        writes the snapshot to the data file and drops the records it contains
+        from the journal, `snapshot` is called while appends are blocked and
+        should only copy references, the expensive work happens in `write_snapshot`.
+        `force` writes the snapshot even if the journal is empty (eg. for
+        changes that are not journaled)
+        """
+        with self._lock:
+            if (self.pending == 0 and not force) or self.is_compacting():
+                return
+            offset = self._file.tell()
+            compaction = threading.Thread(
+                target=self._compact, args=(snapshot(), offset), name="journal-compaction"
+            )
+            self._compaction = compaction
+            compaction.start()
+        if not background:
+            compaction.join()
+
+    def is_compacting(self) -> bool:
+        return self._compaction is not None and self._compaction.is_alive()
+
+    def close(self, snapshot: Callable[[], Any] | None = None, force: bool = False) -> None:
+        """
+        waits for a running compaction, compacts once more if a snapshot
+        function is given and closes the journal
+        """
+        if self._compaction is not None:
+            self._compaction.join()
+        if snapshot is not None:
+            self.compact(snapshot, background=False, force=force)
+        self._file.close()
+
+    def _compact(self, snapshot: Any, offset: int) -> None:
+        self.write_snapshot(snapshot)
+        with self._lock:
+            # keep only the records appended while the snapshot was written
+            self._file.close()
+            with open(self.path, "rb") as f:
+                f.seek(offset)
+                tail = f.read()
+            tmp_path = self.path.with_name(self.path.name + ".tmp")
+            with open(tmp_path, "wb") as f:
+                f.write(tail)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            self._file = open(self.path, "ab")
+            self.pending = tail.count(b"\n")
@@ -0,0 +1,124 @@
+"""
+This module contains the write-behind persister that keeps disk I/O out of
+the UI event handlers
+"""
+import threading
+import time
+import traceback
+
+from src.storage import QuestionStore
+from src.tracing import span
+
+
+class WriteBehindPersister:
+    """
+    Collects question updates and writes them to the store on a worker thread.
+
+    Updates of the same question are coalesced (only the latest version is
+    written) and a burst of updates is flushed in one batch once no update
+    came in for `delay` seconds, or at the latest `max_delay` seconds after
+    the first pending update.
+    """
+
+    def __init__(self, store: QuestionStore, delay: float = 0.5, max_delay: float = 2.0):
+        self.store = store
+        self.delay = delay
+        self.max_delay = max_delay
+        self._pending: dict[int, dict] = {}
+        self._first_submit = 0.0
+        self._last_submit = 0.0
+        self._closed = False
+        self._condition = threading.Condition()
+        # held while a batch is written so flush() never races the worker
+        self._write_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+
+    def submit(self, idx: int, ques: dict) -> None:
+        """
+        queues the question to be saved, the dict must not be mutated afterwards
+        """
+        self.submit_many({idx: ques})
+
+    def submit_many(self, questions: dict[int, dict]) -> None:
+        """
+        queues the questions to be saved together, they are written in the same batch
+        """
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("The persister is closed")
+            now = time.monotonic()
+            if not self._pending:
+                self._first_submit = now
+            self._last_submit = now
+            self._pending.update(questions)
+            self._condition.notify()
+
+    def pending(self, idx: int) -> dict | None:
+        """
+        returns the queued version of a question that is not written yet
+        """
+        with self._condition:
+            return self._pending.get(idx)
+
+    def pending_questions(self) -> dict[int, dict]:
+        """
+        returns a copy of every queued question (index -> question)
+        """
+        with self._condition:
+            return dict(self._pending)
+
+    def flush(self) -> None:
+        """
+        writes every queued update on the calling thread
+        """
+        with self._write_lock:
+            with self._condition:
+                batch = dict(self._pending)
+            if batch:
+                self._write(batch)
+
+    def close(self) -> None:
+        """
+        flushes the queued updates and stops the worker
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+        self.flush()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+                # wait for the burst to end
+                while not self._closed:
+                    deadline = min(self._last_submit + self.delay, self._first_submit + self.max_delay)
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                if self._closed:
+                    return
+            try:
+                self.flush()
+            except Exception:
+                # the updates stay queued and are retried with the next batch
+                traceback.print_exc()
+                with self._condition:
+                    self._first_submit = self._last_submit = time.monotonic()
+
+    def _write(self, batch: dict[int, dict]) -> None:
+        with span("persister.write", questions=len(batch)):
+            self.store.save_many(batch)
+        with self._condition:
+            for idx, ques in batch.items():
+                # an update that came in while writing stays queued
+                if self._pending.get(idx) is ques:
+                    del self._pending[idx]
+            if self._pending:
+                self._first_submit = time.monotonic()
@@ -0,0 +1,54 @@
+"""
+This module contains the prefetcher used to prepare the next question page
+in the background
+"""
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Generic, TypeVar
+
+T = TypeVar("T")
+
+
+class Prefetcher(Generic[T]):
+    """
+    Runs `factory` in a background thread ahead of time so the next item is
+    ready (or already being built) when it is taken
+    """
+
+    def __init__(self, factory: Callable[[], T]):
+        self.factory = factory
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
+        self._future: Future[T] | None = None
+
+    def prefetch(self) -> None:
+        """
+        starts building the next item unless one is already built or building
+        """
+        if self._future is None:
+            self._future = self._executor.submit(self.factory)
+
+    def take(self, is_valid: Callable[[T], bool] | None = None) -> T:
+        """
+        returns the prefetched item, waiting for it if it is still being
+        built, or builds one right away when nothing was prefetched or the
+        prefetched item is not valid anymore
+        """
+        future, self._future = self._future, None
+        if future is None:
+            future = self._executor.submit(self.factory)
+        item = future.result()
+        if is_valid is not None and not is_valid(item):
+            # still built on the worker so `factory` never runs concurrently
+            item = self._executor.submit(self.factory).result()
+        return item
+
+    def invalidate(self) -> None:
+        """
+        drops the prefetched item, an item that is being built is discarded
+        """
+        future, self._future = self._future, None
+        if future is not None:
+            future.cancel()
+
+    def close(self) -> None:
+        self.invalidate()
+        self._executor.shutdown(wait=False)
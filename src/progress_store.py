@@ -0,0 +1,234 @@
+"""
+This module contains the storage backend of the progress of one user over a
+shared question bank.
+
+The content of the questions (question, options, answers, explination,
+views, ...) is read from the shared bank, which is never written. The
+counters, the attempt history, the tags and the fields the user edited (eg.
+the answer key) are kept in a small SQLite database of the user, so users
+never write to the same file.
+
+The rows are keyed by the index of the question in the bank, the database
+records the hash of the bank and a key of the question text of every row.
+When the bank was rewritten (eg. sorted or merged) the rows are moved to the
+new index of their question, the rows of questions that are gone are kept
+in the `unmatched_progress` table.
+"""
+import hashlib
+import json
+import re
+import sqlite3
+import sys
+import threading
+from pathlib import Path
+
+from src.attempt_history import AttemptHistory
+from src.question_index import LazyQuestionBank
+from src.storage import STATS_FIELDS, QuestionStore
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS progress (
+    id INTEGER PRIMARY KEY,
+    {", ".join(f"{name} REAL NOT NULL DEFAULT 0" for name in STATS_FIELDS)},
+    attempt_history TEXT,
+    tags TEXT,
+    fields TEXT NOT NULL DEFAULT '{{}}',
+    question_key TEXT
+);
+
+CREATE TABLE IF NOT EXISTS unmatched_progress AS SELECT * FROM progress WHERE 0;
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+# columns added after the first version of the schema, with their definition
+ADDED_COLUMNS = {"question_key": "TEXT"}
+# fields of a question that belong to the user, the shared values are ignored
+PROGRESS_FIELDS = {*STATS_FIELDS, "attempt_history", "tags"}
+INTEGER_FIELDS = {"total_times_question_attempted", "correct_times_question_attempted", "repetitions"}
+# the question number, it changes when the bank is renumbered
+_HEADER = re.compile(r"^\s*q(uestion)?\s*#?\s*\d+", re.IGNORECASE)
+
+
+def question_key(ques: dict) -> str:
+    """
+    returns the key that finds the question again after the bank was reordered
+    """
+    text = _HEADER.sub("", ques.get("question", "")).strip()
+    return hashlib.blake2b(text.encode(), digest_size=8).hexdigest()
+
+
+class ProgressStore(QuestionStore):
+    """
+    Questions of a shared, read-only bank with the progress of one user
+    """
+
+    def __init__(self, bank: LazyQuestionBank, path: Path):
+        self.bank = bank
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        for table in ("progress", "unmatched_progress"):
+            existing = {row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+            for name, definition in ADDED_COLUMNS.items():
+                if name not in existing:
+                    self._conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+        self._match_bank()
+
+    def _match_bank(self) -> None:
+        """
+        moves the rows to the index of their question if the bank changed
+        since the database was last opened
+        """
+        with self._conn:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'bank_hash'").fetchone()
+            if row is None:
+                # a new database or one written before the bank hash was recorded, it is taken to match
+                rows = self._conn.execute("SELECT id FROM progress WHERE question_key IS NULL").fetchall()
+                self._conn.executemany(
+                    "UPDATE progress SET question_key = ? WHERE id = ?",
+                    [(question_key(self.bank[idx]), idx) for idx, in rows if idx < len(self.bank)],
+                )
+            elif row[0] != self.bank.data_hash:
+                self._remap()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('bank_hash', ?)", (self.bank.data_hash,)
+            )
+
+    def _remap(self) -> None:
+        cursor = self._conn.execute("SELECT * FROM progress")
+        columns = [description[0] for description in cursor.description]
+        rows = cursor.fetchall()
+        if not rows:
+            return
+        # indexes of every question text, duplicates are matched in order
+        positions: dict[str, list[int]] = {}
+        for idx in range(len(self.bank)):
+            positions.setdefault(question_key(self.bank[idx]), []).append(idx)
+        key_column = columns.index("question_key")
+        matched, unmatched = [], []
+        for row in sorted(rows):
+            indexes = positions.get(row[key_column])
+            if indexes:
+                matched.append((indexes.pop(0), *row[1:]))
+            else:
+                unmatched.append(row)
+        insert = f"({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+        self._conn.execute("DELETE FROM progress")
+        self._conn.executemany(f"INSERT INTO progress {insert}", matched)
+        self._conn.executemany(f"INSERT INTO unmatched_progress {insert}", unmatched)
+        print(
+            f"{self.path}: the question bank changed, {len(matched)} questions matched"
+            f" and {len(unmatched)} kept in unmatched_progress",
+            file=sys.stderr,
+        )
+
+    def __len__(self) -> int:
+        return len(self.bank)
+
+    def load(self, idx: int) -> dict:
+        ques = {key: value for key, value in self.bank[idx].items() if key not in PROGRESS_FIELDS or key == "tags"}
+        ques.update({name: 0 for name in STATS_FIELDS})
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(STATS_FIELDS)}, attempt_history, tags, fields FROM progress WHERE id = ?", (idx,)
+            ).fetchone()
+        if row is None:
+            return ques
+        *stats, history, tags, fields = row
+        for name, value in zip(STATS_FIELDS, stats):
+            ques[name] = int(value) if name in INTEGER_FIELDS else value
+        if history is not None:
+            ques["attempt_history"] = history
+        if tags is not None:
+            ques["tags"] = json.loads(tags)
+        ques.update(json.loads(fields))
+        return ques
+
+    def save(self, idx: int, ques: dict) -> None:
+        self.save_many({idx: ques})
+
+    def save_many(self, questions: dict[int, dict]) -> None:
+        rows = []
+        for idx, ques in questions.items():
+            shared = self.bank[idx]
+            # only what differs from the shared bank is stored
+            fields = {
+                key: value for key, value in ques.items()
+                if key not in PROGRESS_FIELDS and shared.get(key) != value
+            }
+            tags = ques.get("tags")
+            rows.append((
+                idx,
+                *(ques.get(name, 0) or 0 for name in STATS_FIELDS),
+                ques.get("attempt_history"),
+                json.dumps(tags) if tags is not None and tags != shared.get("tags", []) else None,
+                json.dumps(fields),
+                question_key(shared),
+            ))
+        columns = ["id", *STATS_FIELDS, "attempt_history", "tags", "fields", "question_key"]
+        with self._lock, self._conn:
+            # the rows of the batch are written in one transaction
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO progress ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                rows,
+            )
+
+    def save_stats(self, stats: dict[int, dict]) -> None:
+        with self._lock, self._conn:
+            for idx, values in stats.items():
+                names = [name for name in STATS_FIELDS if name in values]
+                # the other columns of a new row keep their defaults
+                self._conn.execute(
+                    f"INSERT INTO progress (id, question_key, {', '.join(names)})"
+                    f" VALUES (?, ?, {', '.join('?' * len(names))})"
+                    f" ON CONFLICT (id) DO UPDATE SET {', '.join(f'{name} = excluded.{name}' for name in names)}",
+                    (idx, question_key(self.bank[idx]), *(values[name] for name in names)),
+                )
+
+    def probabilities(self) -> list[float]:
+        return self.column("current_probability")
+
+    def column(self, name: str) -> list:
+        if name not in STATS_FIELDS:
+            raise ValueError(f"Unknown stats column {name}")
+        values = [0] * len(self.bank)
+        with self._lock:
+            for idx, value in self._conn.execute(f"SELECT id, {name} FROM progress"):
+                values[idx] = int(value) if name in INTEGER_FIELDS else value
+        return values
+
+    def tags(self) -> dict[int, list[str]]:
+        tags = self.bank.tags()
+        with self._lock:
+            rows = self._conn.execute("SELECT id, tags FROM progress WHERE tags IS NOT NULL").fetchall()
+        for idx, names in rows:
+            names = json.loads(names)
+            if names:
+                tags[idx] = names
+            else:
+                tags.pop(idx, None)
+        return tags
+
+    def questions_with_tag(self, tag: str) -> list[int]:
+        return sorted(idx for idx, tags in self.tags().items() if tag in tags)
+
+    def topics(self) -> dict[int, str]:
+        return self.bank.topics()
+
+    def histories(self) -> dict[int, AttemptHistory]:
+        # read from the database of the user, the shared bank is not decoded
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, attempt_history FROM progress WHERE attempt_history IS NOT NULL"
+            ).fetchall()
+        return {idx: AttemptHistory.from_json(history) for idx, history in rows}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
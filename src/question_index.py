@@ -0,0 +1,257 @@
+"""
+This module contains the lazily loaded question bank.
+
+The json data file is never parsed as a whole. An offset index (question
+index -> byte range of its json object) is built once and cached next to the
+data file, keyed by the hash of the file. Questions are decoded on demand and
+kept in a small LRU cache, only the tags and topics of every question stay
+resident.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable
+
+INDEX_VERSION = 2
+_WHITESPACE = re.compile(r"\s*")
+
+
+def file_hash(path: Path) -> str:
+    """
+    returns the blake2b hash of a file
+    """
+    hasher = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        while chunk := f.read(1 << 20):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def scan_offsets(data: bytes) -> tuple[array, dict[int, list[str]], dict[int, str]]:
+    """
+    returns the start and end byte offset of every object in the json array
+    `data` (flattened in one array) and the tags and topics of the questions
+    that have any
+    """
+    text = data.decode("utf-8")
+    is_ascii = len(text) == len(data)
+    decoder = json.JSONDecoder()
+    offsets = array("q")
+    tags: dict[int, list[str]] = {}
+    topics: dict[int, str] = {}
+    # last known position as (char offset, byte offset) for non ascii files
+    char_pos, byte_pos = 0, 0
+
+    def to_bytes(pos: int) -> int:
+        nonlocal char_pos, byte_pos
+        if is_ascii:
+            return pos
+        byte_pos += len(text[char_pos:pos].encode("utf-8"))
+        char_pos = pos
+        return byte_pos
+
+    pos = _WHITESPACE.match(text, 0).end()
+    if text[pos:pos + 1] != "[":
+        raise ValueError("The question file must contain a json array")
+    pos = _WHITESPACE.match(text, pos + 1).end()
+    while text[pos:pos + 1] != "]":
+        ques, end = decoder.raw_decode(text, pos)
+        if ques.get("tags"):
+            tags[len(offsets) // 2] = ques["tags"]
+        if ques.get("topic"):
+            topics[len(offsets) // 2] = ques["topic"]
+        offsets.append(to_bytes(pos))
+        offsets.append(to_bytes(end))
+        pos = _WHITESPACE.match(text, end).end()
+        if text[pos:pos + 1] == ",":
+            pos = _WHITESPACE.match(text, pos + 1).end()
+    return offsets, tags, topics
+
+
+class LazyQuestionBank:
+    """
+    Sequence of question dicts backed by a json file and its offset index.
+
+    Updated questions are kept in memory (the overlay) until `write` folds
+    them into the file.
+    """
+
+    def __init__(self, path: Path, index_path: Path, cache_size: int = 512):
+        self.path = Path(path)
+        self.index_path = Path(index_path)
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._overlay: dict[int, dict] = {}
+        # hash of the data file, it changes whenever `write` rewrites it
+        self.data_hash = ""
+        self._cache: OrderedDict[int, dict] = OrderedDict()
+        self._offsets, self._tags, self._topics = self._load_index()
+        self._file = open(self.path, "rb")
+
+    def __len__(self) -> int:
+        return len(self._offsets) // 2
+
+    def __getitem__(self, idx: int) -> dict:
+        if not 0 <= idx < len(self):
+            raise IndexError(f"No question at index {idx}")
+        if idx in self._overlay:
+            return self._overlay[idx]
+        with self._lock:
+            if idx in self._cache:
+                self._cache.move_to_end(idx)
+                return self._cache[idx]
+            start, end = self._offsets[2 * idx], self._offsets[2 * idx + 1]
+            self._file.seek(start)
+            ques = json.loads(self._file.read(end - start))
+            self._cache[idx] = ques
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return ques
+
+    def __setitem__(self, idx: int, ques: dict) -> None:
+        """
+        replaces a question, stored dicts must not be mutated afterwards
+        """
+        if not 0 <= idx < len(self):
+            raise IndexError(f"No question at index {idx}")
+        # the compaction thread reads the overlay and the tags while the bank is written
+        with self._lock:
+            self._overlay[idx] = ques
+            self._cache.pop(idx, None)
+            if ques.get("tags"):
+                self._tags[idx] = list(ques["tags"])
+            else:
+                self._tags.pop(idx, None)
+            if ques.get("topic"):
+                self._topics[idx] = ques["topic"]
+            else:
+                self._topics.pop(idx, None)
+
+    def tags(self) -> dict[int, list[str]]:
+        """
+        returns a copy of the tags of every question that has any
+        """
+        with self._lock:
+            return dict(self._tags)
+
+    def topics(self) -> dict[int, str]:
+        """
+        returns a copy of the topic of every question that has one
+        """
+        with self._lock:
+            return dict(self._topics)
+
+    def snapshot(self) -> dict[int, dict]:
+        """
+        returns a copy of the overlay for `write`
+        """
+        with self._lock:
+            return dict(self._overlay)
+
+    def write(self, overlay: dict[int, dict], patch: Callable[[int, dict], dict]) -> None:
+        """
+        writes the bank back to its file with an atomic rename, the questions
+        in `overlay` are serialized after `patch(index, question)` and every
+        other question is copied byte for byte from the current file
+        """
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        offsets = array("q")
+        hasher = hashlib.blake2b(digest_size=16)
+        pos = 0
+        with open(tmp_path, "wb") as out, open(self.path, "rb") as src:
+            def emit(data: bytes) -> None:
+                nonlocal pos
+                out.write(data)
+                hasher.update(data)
+                pos += len(data)
+
+            emit(b"[")
+            for idx in range(len(self)):
+                emit(b"\n    " if idx == 0 else b",\n    ")
+                if idx in overlay:
+                    text = json.dumps(patch(idx, overlay[idx]), indent=4)
+                    data = text.replace("\n", "\n    ").encode("utf-8")
+                else:
+                    start, end = self._offsets[2 * idx], self._offsets[2 * idx + 1]
+                    src.seek(start)
+                    data = src.read(end - start)
+                offsets.append(pos)
+                emit(data)
+                offsets.append(pos)
+            emit(b"\n]" if len(self) else b"]")
+            out.flush()
+            os.fsync(out.fileno())
+
+        with self._lock:
+            self._file.close()
+            os.replace(tmp_path, self.path)
+            self._file = open(self.path, "rb")
+            self._offsets = offsets
+            for idx, ques in overlay.items():
+                # questions updated while writing stay in the overlay
+                if self._overlay.get(idx) is ques:
+                    del self._overlay[idx]
+            # the index is serialized from a copy, the tags may be edited meanwhile
+            tags = dict(self._tags)
+            topics = dict(self._topics)
+            offsets = self._offsets
+        self._save_index(hasher.hexdigest(), offsets, tags, topics)
+
+    def close(self) -> None:
+        self._file.close()
+
+    def _load_index(self) -> tuple[array, dict[int, list[str]], dict[int, str]]:
+        """
+        loads the cached offset index, it is rebuilt when the data file changed
+        """
+        stat = self.path.stat()
+        meta = None
+        if self.index_path.exists():
+            with open(self.index_path, "rb") as f:
+                try:
+                    meta = json.loads(f.readline())
+                    raw_offsets = f.read()
+                except ValueError:
+                    meta = None
+        if meta is not None and meta.get("version") == INDEX_VERSION:
+            is_same_file = meta["size"] == stat.st_size and meta["mtime_ns"] == stat.st_mtime_ns
+            if is_same_file or meta["hash"] == file_hash(self.path):
+                offsets = array("q")
+                offsets.frombytes(raw_offsets)
+                self._offsets = offsets
+                self._tags = {int(idx): tags for idx, tags in meta["tags"].items()}
+                self._topics = {int(idx): topic for idx, topic in meta["topics"].items()}
+                self.data_hash = meta["hash"]
+                if not is_same_file:
+                    self._save_index(meta["hash"], self._offsets, self._tags, self._topics)
+                return self._offsets, self._tags, self._topics
+
+        data = self.path.read_bytes()
+        self._offsets, self._tags, self._topics = scan_offsets(data)
+        self._save_index(hashlib.blake2b(data, digest_size=16).hexdigest(), self._offsets, self._tags, self._topics)
+        return self._offsets, self._tags, self._topics
+
+    def _save_index(self, digest: str, offsets: array, tags: dict[int, list[str]], topics: dict[int, str]) -> None:
+        """
+        caches the offsets, the tags and the topics, they must not change while they are saved
+        """
+        self.data_hash = digest
+        stat = self.path.stat()
+        meta = {
+            "version": INDEX_VERSION,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "hash": digest,
+            "tags": tags,
+            "topics": topics,
+        }
+        tmp_path = self.index_path.with_name(self.index_path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(json.dumps(meta).encode("utf-8") + b"\n")
+            f.write(offsets.tobytes())
+        os.replace(tmp_path, self.index_path)
@@ -2,23 +2,43 @@
 This module contains the functions related to the quiz
 """
 
-import json
-import random
-from dataclasses import asdict, dataclass, field
+import atexit
+import heapq
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field, replace
+from functools import partial
+from pathlib import Path
 
-from copy import deepcopy
+from src.analytics import Analytics, ProgressSummary
+from src.attempt_history import AttemptHistory
+from src.exam import EXAM_MINUTES, EXAM_QUESTIONS, Exam, ExamResult, draw_exam
+from src.persister import WriteBehindPersister
+from src.question_index import file_hash
+from src.render_cache import RENDER_WARMUP, RenderCache, RenderedQuestion, content_changed
+from src.scheduler import (
+    PROBABILITY_SMOOTHING, ProbabilityScheduler, ReviewState, Scheduler, open_scheduler, review, state_from_history,
+)
+from src.search import SearchIndex, question_text
+from src.sqlite_store import SqliteStore
+from src.storage import JsonStore, QuestionStore
+from src.tag_index import TagIndex
+from src.tracing import span, traced
 
-@dataclass 
+@dataclass(slots=True)
 class View:
     type: str 
     name: str 
     value: str | dict | list | None = None
 
 
-@dataclass
+@dataclass(slots=True)
 class Question:
     """
-    Question dataclass
+    Question dataclass, the content (question, options, explination, views)
+    is shared between the copies made by `update_probability`
     """
     index: int
     question: str
@@ -29,59 +49,368 @@ class Question:
     current_probability: float
     explination: str | None = None
     tags: list[str] = field(default_factory=list)
-    attempt_history: list[bool] = field(default_factory=list)
+    attempt_history: AttemptHistory = field(default_factory=AttemptHistory)
     views: list[View] = field(default_factory=list)
+    # SM-2 state (see src.scheduler), an ease of 0 means it was never computed
+    ease: float = 0
+    interval_days: float = 0
+    due_at: float = 0
+    repetitions: int = 0
 
     def __post_init__(self):
         # parse and convert the views to View objects
         if self.views:
-            self.views = [View(**view) for view in self.views] # type: ignore
+            self.views = [view if isinstance(view, View) else View(**view) for view in self.views] # type: ignore
+        if not isinstance(self.attempt_history, AttemptHistory):
+            self.attempt_history = AttemptHistory.from_json(self.attempt_history)
 
+    def to_dict(self) -> dict:
+        """
+        returns the question in the data.json format, without its index
+        """
+        ques_dict = asdict(self)
+        ques_dict.pop("index")
+        ques_dict["attempt_history"] = self.attempt_history.to_json()
+        return ques_dict
 
-QUESTIONS_ANSWERS_FILE = "data.json"
-with open(QUESTIONS_ANSWERS_FILE, encoding="utf-8") as _file:
-    questions_and_answers: list[dict] = json.load(_file)
 
-all_tags_list = []
-for ques in questions_and_answers:
-    all_tags_list.extend(ques.get("tags", []))
-all_tags_list = sorted(list(set(all_tags_list)))
+# a .db/.sqlite file selects the SQLite backend, anything else is a json file
+QUESTIONS_ANSWERS_FILE = os.environ.get("QUIZ_DATA_FILE", "data.json")
+SQLITE_SUFFIXES = {".db", ".sqlite", ".sqlite3"}
+# "probability" (weighted random) or "sm2" (spaced repetition), see src.scheduler.SCHEDULERS
+SCHEDULER = os.environ.get("QUIZ_SCHEDULER", "probability")
 
 
-def get_random_question() -> Question:
+def open_store(path: Path) -> QuestionStore:
     """
-    returns a random question from the list of questions
+    returns the storage backend for the given file
     """
+    if path.suffix in SQLITE_SUFFIXES:
+        return SqliteStore(path)
+    return JsonStore(path)
 
-    scores = [ques.get("current_probability", 0) for ques in questions_and_answers]
-    scores = [ 0.01 + x for x in scores ]
-    if sum(scores) == 0:
-        idx = random.randint(0, len(questions_and_answers) - 1)
-    else:
-        idx = random.choices(range(len(questions_and_answers)), weights=scores)[0]
-    ques = questions_and_answers[idx]
-    ques =  Question(
-        index=idx,
-        question=ques["question"],
-        answers=ques.get("answers", []),
-        options=ques["options"],
-        total_times_question_attempted=ques.get("total_times_question_attempted", 0),
-        correct_times_question_attempted=ques.get("correct_times_question_attempted", 0),
-        current_probability=ques.get("current_probability", 0),
-        tags=ques.get("tags", []),
-        attempt_history=ques.get("attempt_history", []),
-        explination=ques.get("explination", None)
-        explination=ques.get("explination", None),
-        views=ques.get("views", None)
-    )
-    return ques
 
+class QuizEngine:
+    """
+    Quiz state of one question store: the write-behind persister, the tag,
+    search and analytics indexes and the scheduler. Every user of the web
+    server has an engine of their own, the methods lock the engine so the
+    sessions of one user can share it.
+
+    The search index is loaded (or built) and cached next to `data_file`,
+    unless a shared, read-only `search_index` is given.
+    """
+
+    def __init__(
+        self,
+        store: QuestionStore,
+        data_file: Path | None = None,
+        search_index: Future[SearchIndex] | None = None,
+        scheduler_name: str = SCHEDULER,
+        render_warmup: int = RENDER_WARMUP,
+    ):
+        self.store = store
+        self.data_file = data_file
+        self._lock = threading.RLock()
+        # handlers only queue their updates, the disk writes happen on the persister thread
+        self.persister = WriteBehindPersister(store)
+
+        # the search index is loaded (or built) and updated on its own thread
+        self._search_hash = ""
+        self._search_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="search")
+        self._owns_search_index = search_index is None
+        self._search_index = search_index or self._search_executor.submit(self._load_search_index)
+
+        # the progress aggregates are computed and updated on their own thread
+        self._analytics_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="analytics")
+        self._analytics = self._analytics_executor.submit(Analytics.from_store, store)
+
+        self.tag_index = TagIndex(store.tags())
+        # sorted list of every tag, it is updated in place
+        self.all_tags_list = self.tag_index.sorted_tags
+
+        self.scheduler_name = scheduler_name
+        self.scheduler: Scheduler = open_scheduler(scheduler_name, store)
+
+        # rendered headers, bodies and views, the most likely questions can be rendered ahead
+        self.render_cache = RenderCache()
+        self._render_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="render")
+        if render_warmup > 0:
+            self.warm_render_cache(render_warmup)
+
+    def _search_cache_file(self) -> Path | None:
+        return self.data_file.with_suffix(".search") if self.data_file is not None else None
+
+    def _load_search_index(self) -> SearchIndex:
+        """
+        loads the cached search index, it is rebuilt when the data file changed
+        """
+        cache_file = self._search_cache_file()
+        if cache_file is not None:
+            self._search_hash = file_hash(self.data_file)
+            index = SearchIndex.load(cache_file, self._search_hash)
+            if index is not None:
+                return index
+        index = SearchIndex.build((idx, question_text(self.store.load(idx))) for idx in range(len(self.store)))
+        if cache_file is not None:
+            index.save(cache_file, self._search_hash)
+        return index
+
+    def _save_search_index(self):
+        """
+        caches the search index for the data file as it is after the store is closed
+        """
+        cache_file = self._search_cache_file()
+        if cache_file is None or not self._owns_search_index or not self._search_index.done():
+            return
+        if self._search_index.cancelled() or self._search_index.exception() is not None:
+            # the index was never built, it is built again on the next start
+            return
+        data_hash = file_hash(self.data_file)
+        if data_hash != self._search_hash:
+            self._search_index.result().save(cache_file, data_hash)
+
+    def set_scheduler(self, name: str) -> None:
+        """
+        switches the scheduler that picks the questions, the tag filter has to be set again
+        """
+        with self._lock:
+            if name != self.scheduler_name:
+                # the scheduler is built from the stored state
+                self.persister.flush()
+                self.scheduler = open_scheduler(name, self.store)
+                self.scheduler_name = name
+
+    def set_tag_filter(self, tags: list[str], match_all: bool = False) -> int:
+        """
+        only draws questions that have all (match_all) or any of the tags,
+        returns the number of matching questions. An empty list of tags removes
+        the filter
+        """
+        with self._lock:
+            questions = self.tag_index.questions(tags, match_all) if tags else []
+            self.scheduler.set_filter(tags, match_all, questions)
+        return len(questions) if tags else len(self.store)
+
+    def search_questions(self, query: str, limit: int = 20) -> list[tuple[int, float]]:
+        """
+        returns the indexes and scores of the questions that best match the query
+        """
+        return self._search_executor.submit(lambda: self._search_index.result().search(query, limit)).result()
+
+    def progress_summary(self) -> ProgressSummary:
+        """
+        returns the progress aggregates of the question bank
+        """
+        return self._analytics_executor.submit(lambda: self._analytics.result().summary()).result()
+
+    @traced("get_random_question")
+    def get_random_question(self) -> Question:
+        """
+        returns a random question from the list of questions, if a tag filter is
+        set and no question matches it anymore the whole list is used
+        """
+        with span("get_random_question.sample"), self._lock:
+            idx = self.scheduler.next()
+        return self.get_question(idx)
+
+    @traced("get_question")
+    def get_question(self, idx: int) -> Question:
+        """
+        returns the question at the given index
+        """
+        ques = self.persister.pending(idx) or self.store.load(idx)
+        ques =  Question(
+            index=idx,
+            question=ques["question"],
+            answers=list(ques.get("answers", [])),
+            options=ques["options"],
+            total_times_question_attempted=ques.get("total_times_question_attempted", 0),
+            correct_times_question_attempted=ques.get("correct_times_question_attempted", 0),
+            current_probability=ques.get("current_probability", 0),
+            tags=list(ques.get("tags", [])),
+            attempt_history=AttemptHistory.from_json(ques.get("attempt_history")),
+            explination=ques.get("explination", None),
+            views=ques.get("views", None),
+            ease=ques.get("ease", 0),
+            interval_days=ques.get("interval_days", 0),
+            due_at=ques.get("due_at", 0),
+            repetitions=ques.get("repetitions", 0),
+        )
+        return ques
+
+    @traced("render_question")
+    def render(self, question: Question) -> RenderedQuestion:
+        """
+        returns the rendered header, body and views of the question
+        """
+        return self.render_cache.get(question)
+
+    def warm_render_cache(self, count: int) -> Future[int]:
+        """
+        renders the `count` questions with the highest probabilities in the
+        background, returns the number of questions that were rendered
+        """
+        def warm() -> int:
+            probabilities = self.store.probabilities()
+            count_ = min(count, self.render_cache.size)
+            indexes = heapq.nlargest(count_, range(len(probabilities)), key=probabilities.__getitem__)
+            rendered = 0
+            for idx in indexes:
+                if not self.render_cache.contains(idx):
+                    self.render_cache.get(self.get_question(idx))
+                    rendered += 1
+            return rendered
+
+        return self._render_executor.submit(warm)
 
+    def distribution_shift(self, idx: int, old_probability: float) -> float:
+        """
+        returns how much the question order changed (0 to 1) when the probability
+        of the question at `idx` changed from `old_probability` to its current value
+        """
+        with self._lock:
+            return self.scheduler.shift(idx, old_probability)
+
+    @traced("update_question_in_file")
+    def update_question_in_file(self, question: Question):
+        """
+        updates the question with the given data, it is written to the storage
+        backend in the background (see `flush`)
+        """
+        self.update_questions_in_file([question])
+
+    def update_questions_in_file(self, questions: list[Question]):
+        """
+        updates the questions with the given data, they are written to the
+        storage backend together in one batch
+        """
+        batch = {}
+        with self._lock:
+            for question in questions:
+                idx = question.index
+                ques_dict = question.to_dict()
+                self.tag_index.update(idx, question.tags)
+                old_dict = self.persister.pending(idx) or self.store.load(idx)
+                if content_changed(old_dict, ques_dict):
+                    self.render_cache.invalidate(idx)
+                old_text = question_text(old_dict)
+                new_text = question_text(ques_dict)
+                if old_text != new_text and self._owns_search_index:
+                    self._search_executor.submit(partial(self._update_search_index, idx, old_text, new_text))
+                self.scheduler.update(idx, ques_dict)
+                batch[idx] = ques_dict
+            self.persister.submit_many(batch)
+        self._analytics_executor.submit(self._update_analytics, batch)
+
+    def _update_search_index(self, idx: int, old_text: str, new_text: str):
+        self._search_index.result().update(idx, old_text, new_text)
+
+    def _update_analytics(self, batch: dict[int, dict]):
+        analytics = self._analytics.result()
+        for idx, ques_dict in batch.items():
+            analytics.update(idx, ques_dict)
+
+    def start_exam(
+        self,
+        size: int = EXAM_QUESTIONS,
+        minutes: float = EXAM_MINUTES,
+        tag_quotas: dict[str, int] | None = None,
+        topic_quotas: dict[str, int] | None = None,
+    ) -> Exam:
+        """
+        draws a mock exam of `size` different questions, the questions that are
+        answered wrong more often are more likely to be drawn. The quotas are the
+        minimum number of questions of a tag or topic.
+        """
+        quotas: dict[str, int] = {}
+        groups: dict[str, list[int]] = {}
+        with self._lock:
+            # the weights are taken from memory, the queued updates are left to the persister
+            if isinstance(self.scheduler, ProbabilityScheduler):
+                weights = list(self.scheduler.sampler.weights)
+            else:
+                pending = self.persister.pending_questions()
+                weights = [PROBABILITY_SMOOTHING + probability for probability in self.store.probabilities()]
+                for idx, ques in pending.items():
+                    weights[idx] = PROBABILITY_SMOOTHING + ques.get("current_probability", 0)
+            for tag, quota in (tag_quotas or {}).items():
+                quotas[f"tag:{tag}"] = quota
+                groups[f"tag:{tag}"] = self.tag_index.questions([tag])
+        for topic, quota in (topic_quotas or {}).items():
+            quotas[f"topic:{topic}"] = quota
+            groups[f"topic:{topic}"] = self._analytics_executor.submit(
+                lambda topic=topic: self._analytics.result().questions_in_topic(topic)
+            ).result()
+        with span("draw_exam", size=size):
+            indexes = draw_exam(weights, size, quotas, groups)
+        return Exam([self.get_question(idx) for idx in indexes], minutes * 60)
+
+    @traced("finish_exam")
+    def finish_exam(self, exam: Exam) -> ExamResult:
+        """
+        grades the exam and saves the results of every graded question in one
+        batch, the results of an exam are only saved once
+        """
+        result = exam.grade()
+        with self._lock:
+            if exam.saved:
+                return result
+            exam.saved = True
+            self.update_questions_in_file([
+                update_probability(question, grade)
+                for question, grade in zip(exam.questions, result.grades)
+                if grade is not None
+            ])
+        return result
+
+    def flush(self):
+        """
+        writes the queued question updates to the storage backend
+        """
+        self.persister.flush()
+
+    def close(self):
+        """
+        writes the queued updates and closes the store, the search index is
+        cached after the store is closed
+        """
+        self.persister.close()
+        # the background work still reads the store, it is finished (or cancelled if not started) first
+        self._render_executor.shutdown(wait=True, cancel_futures=True)
+        self._analytics_executor.shutdown(wait=True, cancel_futures=True)
+        # the queued search updates are kept, the cached index must match the data file
+        self._search_executor.shutdown(wait=True)
+        self.store.close()
+        self._save_search_index()
+
+
+_default_engine: QuizEngine | None = None
+_default_engine_lock = threading.Lock()
+
+
+def default_engine() -> QuizEngine:
+    """
+    returns the engine of the desktop app over QUIZ_DATA_FILE, it is opened
+    on first use and closed on exit
+    """
+    global _default_engine
+    with _default_engine_lock:
+        if _default_engine is None:
+            with span("open_store"):
+                store = open_store(Path(QUESTIONS_ANSWERS_FILE))
+            _default_engine = QuizEngine(store, Path(QUESTIONS_ANSWERS_FILE))
+            atexit.register(_default_engine.close)
+        return _default_engine
+
+
+@traced()
 def update_probability(question: Question, is_correct: bool) -> Question:
     """
     updates the probability of the question based on the correctness of the answer
     """
-    new_question = deepcopy(question)
+    # only the stats change, the content is shared with `question`
+    new_question = replace(question, attempt_history=question.attempt_history.copy())
     n = new_question.total_times_question_attempted
     prev_avg = new_question.current_probability * n
     if is_correct:
@@ -93,27 +422,19 @@ def update_probability(question: Question, is_correct: bool) -> Question:
         new_question.current_probability = else_score
     new_question.total_times_question_attempted += 1
     new_question.correct_times_question_attempted += 1 if is_correct else 0
+    # the SM-2 state is kept up to date with either scheduler
+    if new_question.ease:
+        state = ReviewState(new_question.ease, new_question.interval_days, new_question.due_at, new_question.repetitions)
+    else:
+        state = state_from_history(new_question.attempt_history)
+    state = review(state, is_correct, time.time())
+    new_question.ease = state.ease
+    new_question.interval_days = state.interval_days
+    new_question.due_at = state.due_at
+    new_question.repetitions = state.repetitions
     new_question.attempt_history.append(is_correct)
     return new_question
 
 
-def update_question_in_file(question: Question):
-    """
-    updates the question in the json file with the given data
-    """
-    idx = question.index
-    ques_dict = asdict(question)
-    # update any new tags 
-    for tag in question.tags:
-        if tag not in all_tags_list:
-            all_tags_list.append(tag)
-    # remove the index from the dict
-    ques_dict.pop("index")
-    questions_and_answers[idx] = ques_dict
-    # write the updated list to the file
-    with open(QUESTIONS_ANSWERS_FILE, "w", encoding="utf-8") as f:
-        json.dump(questions_and_answers, f, indent=4)
-
-
 def __map_domain(x1, x2, y1, y2, value):
     return y1 + (value - x1) * (y2 - y1) / (x2 - x1)
@@ -0,0 +1,109 @@
+"""
+This module contains the render cache of the question pages.
+
+Rendering a question normalizes the whitespace of its text and turns every
+json view into a Markdown code block with json.dumps, which is slow for the
+large IAM policy views. The rendered strings are kept in a bounded LRU cache
+keyed by the question index and its content version, the version of a
+question is bumped when its content is edited so an outdated render is never
+returned (even one that was still being rendered while the edit happened).
+"""
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from src.quiz import Question, View
+
+RENDER_CACHE_SIZE = int(os.environ.get("QUIZ_RENDER_CACHE_SIZE") or 256)
+# number of the most likely questions rendered in the background when the engine opens, 0 disables it
+RENDER_WARMUP = int(os.environ.get("QUIZ_RENDER_WARMUP") or 0)
+# fields of a question dict that are rendered, editing any other field keeps the render
+RENDERED_FIELDS = ("question", "views")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@dataclass(frozen=True, slots=True)
+class RenderedQuestion:
+    header: str
+    body: str
+    # Markdown of every view, None for the views that are not rendered as Markdown
+    views: tuple[str | None, ...]
+
+
+def render_header_and_body(text: str) -> tuple[str, str]:
+    """
+    returns the first line of the question and the rest with its whitespace collapsed
+    """
+    lines = text.split("\n")
+    return lines[0], _WHITESPACE.sub(" ", " ".join(lines[1:]))
+
+
+def render_view_markdown(view: "View") -> str | None:
+    """
+    returns the Markdown of a json view, None for the other view types
+    """
+    if view.type != "json":
+        return None
+    json_str = json.dumps(view.value, indent=4)
+    return f"### {view.name}\n```json\n{json_str}\n```\n"
+
+
+def render_question(question: "Question") -> RenderedQuestion:
+    header, body = render_header_and_body(question.question)
+    return RenderedQuestion(header, body, tuple(render_view_markdown(view) for view in question.views or []))
+
+
+def content_changed(old: dict, new: dict) -> bool:
+    return any(old.get(name) != new.get(name) for name in RENDERED_FIELDS)
+
+
+class RenderCache:
+    """
+    LRU cache of the rendered questions, it is safe to use from several threads
+    """
+
+    def __init__(self, size: int = RENDER_CACHE_SIZE):
+        self.size = size
+        self._lock = threading.Lock()
+        self._cache: OrderedDict[tuple[int, int], RenderedQuestion] = OrderedDict()
+        self._versions: dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def get(self, question: "Question") -> RenderedQuestion:
+        """
+        returns the render of the question, rendering it on a miss
+        """
+        with self._lock:
+            key = (question.index, self._versions.get(question.index, 0))
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        # rendered outside of the lock, an edit in the meantime bumps the version so the
+        # render is stored under a key that is not looked up anymore
+        rendered = render_question(question)
+        with self._lock:
+            self._cache[key] = rendered
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.size:
+                self._cache.popitem(last=False)
+        return rendered
+
+    def contains(self, idx: int) -> bool:
+        with self._lock:
+            return (idx, self._versions.get(idx, 0)) in self._cache
+
+    def invalidate(self, idx: int) -> None:
+        """
+        drops the render of the question after its content was edited
+        """
+        with self._lock:
+            version = self._versions.get(idx, 0)
+            self._cache.pop((idx, version), None)
+            self._versions[idx] = version + 1
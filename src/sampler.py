@@ -0,0 +1,95 @@
+"""
+This module contains the weighted sampler used to draw questions
+"""
+import random
+
+
+class WeightedSampler:
+    """
+    Fenwick (binary indexed) tree over the question weights.
+
+    Drawing an index and updating a single weight are both O(log n), the
+    weights are kept alongside the tree so it can be rebuilt from the exact
+    values once the accumulated floating point drift may matter.
+    """
+
+    def __init__(self, weights: list[float]):
+        self.weights = list(weights)
+        self._updates = 0
+        self._rebuild()
+
+    def __len__(self) -> int:
+        return len(self.weights)
+
+    @property
+    def total(self) -> float:
+        return self._total
+
+    def update(self, idx: int, weight: float) -> None:
+        """
+        sets the weight of the item at `idx`
+        """
+        delta = weight - self.weights[idx]
+        self.weights[idx] = weight
+        self._total += delta
+        i = idx + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+        self._updates += 1
+        if self._updates > len(self.weights):
+            self._rebuild()
+
+    def append(self, weight: float) -> None:
+        """
+        adds a new item at the end with the given weight
+        """
+        self.weights.append(weight)
+        i = len(self.weights)
+        # the new node covers the range (i - lowbit(i), i]
+        self._tree.append(weight + self._prefix_sum(i - 1) - self._prefix_sum(i - (i & -i)))
+        self._total += weight
+
+    def sample(self, rng: random.Random | None = None) -> int:
+        """
+        returns a random index, each index is chosen proportional to its weight
+        """
+        n = len(self.weights)
+        if n == 0:
+            raise IndexError("Cannot sample from an empty sampler")
+        if self._total <= 0:
+            return (rng or random).randrange(n)
+        target = (rng or random).random() * self._total
+        pos = 0
+        step = 1 << n.bit_length()
+        while step:
+            nxt = pos + step
+            if nxt <= n and self._tree[nxt] <= target:
+                pos = nxt
+                target -= self._tree[nxt]
+            step >>= 1
+        # guard against rounding pushing the target past the last item
+        pos = min(pos, n - 1)
+        while pos > 0 and self.weights[pos] <= 0:
+            pos -= 1
+        return pos
+
+    def _prefix_sum(self, i: int) -> float:
+        """
+        sum of the first `i` weights
+        """
+        res = 0.0
+        while i > 0:
+            res += self._tree[i]
+            i -= i & -i
+        return res
+
+    def _rebuild(self) -> None:
+        tree = [0.0, *self.weights]
+        for i in range(1, len(tree)):
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self._tree = tree
+        self._total = sum(self.weights)
+        self._updates = 0
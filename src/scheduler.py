@@ -0,0 +1,330 @@
+"""
+This module contains the schedulers that pick the next question: a weighted
+random draw on the current probabilities and an SM-2 spaced repetition
+scheduler that keeps the questions in min-heaps of their due times.
+
+The SM-2 state (ease, interval, due time and repetitions) is stored next to
+the counters of every question and updated on every answer whichever
+scheduler is selected. Questions without a state are seeded from their
+attempt history, see `migrate`::
+
+    python -m src.scheduler data.json
+"""
+import heapq
+import sys
+import time
+from abc import ABC, abstractmethod
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from src.attempt_history import AttemptHistory
+from src.sampler import WeightedSampler
+from src.storage import QuestionStore
+from src.tag_index import TagFilter
+
+# added to every probability so questions that are always answered correctly still show up
+PROBABILITY_SMOOTHING = 0.01
+
+DAY = 24 * 60 * 60
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+MAX_INTERVAL_DAYS = 365
+# SM-2 answer qualities (0-5), a multiple choice answer is either right or wrong
+CORRECT_QUALITY = 5
+WRONG_QUALITY = 2
+# a missed question comes back after this many seconds
+RELEARN_DELAY = 10 * 60
+# a drawn question that is not answered (eg. a discarded prefetch) is held back this long
+DRAWN_DELAY = 60
+
+
+@dataclass
+class ReviewState:
+    """
+    SM-2 state of a question, a due time of 0 marks a question never answered
+    """
+    ease: float = DEFAULT_EASE
+    interval_days: float = 0.0
+    due_at: float = 0.0
+    repetitions: int = 0
+
+
+def _next_ease(ease: float, is_correct: bool) -> float:
+    quality = CORRECT_QUALITY if is_correct else WRONG_QUALITY
+    return max(MIN_EASE, ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+
+
+def _next_interval(interval_days: float, ease: float, repetitions: int) -> float:
+    """
+    interval after the `repetitions`th correct answer in a row, `ease` is the
+    ease before the answer
+    """
+    if repetitions == 1:
+        return 1.0
+    if repetitions == 2:
+        return 6.0
+    return min(MAX_INTERVAL_DAYS, interval_days * ease)
+
+
+def review(state: ReviewState, is_correct: bool, now: float) -> ReviewState:
+    """
+    returns the state after answering the question at `now` (SM-2)
+    """
+    ease = _next_ease(state.ease, is_correct)
+    if not is_correct:
+        return ReviewState(ease, 0.0, now + RELEARN_DELAY, 0)
+    repetitions = state.repetitions + 1
+    interval_days = _next_interval(state.interval_days, state.ease, repetitions)
+    return ReviewState(ease, interval_days, now + interval_days * DAY, repetitions)
+
+
+def state_from_history(history: AttemptHistory | list[bool], now: float | None = None) -> ReviewState:
+    """
+    replays the attempt history, the times of past attempts are unknown so
+    the last one is taken to be `now`
+    """
+    now = time.time() if now is None else now
+    if not history:
+        return ReviewState()
+    # same as calling review for every attempt, without the intermediate states
+    ease, interval_days, repetitions = DEFAULT_EASE, 0.0, 0
+    for is_correct in history:
+        if is_correct:
+            repetitions += 1
+            interval_days = _next_interval(interval_days, ease, repetitions)
+        else:
+            repetitions, interval_days = 0, 0.0
+        ease = _next_ease(ease, is_correct)
+    due_at = now + (interval_days * DAY if history[-1] else RELEARN_DELAY)
+    return ReviewState(ease, interval_days, due_at, repetitions)
+
+
+def migrate(store: QuestionStore, now: float | None = None) -> int:
+    """
+    seeds the SM-2 state of the questions that have none (an ease of 0) from
+    their attempt history, returns the number of migrated questions
+    """
+    updates = {
+        idx: asdict(state_from_history(AttemptHistory.from_json(store.load(idx).get("attempt_history")), now))
+        for idx, ease in enumerate(store.column("ease"))
+        if ease == 0
+    }
+    if updates:
+        # only the SM-2 columns change, the questions themselves are not rewritten
+        store.save_stats(updates)
+    return len(updates)
+
+
+class Scheduler(ABC):
+    """
+    Picks the next question, it is told about every saved question so it can
+    reorder them
+    """
+
+    @abstractmethod
+    def next(self) -> int:
+        """
+        returns the index of the next question, if a filter is set and no
+        question matches it anymore every question is considered
+        """
+
+    @abstractmethod
+    def update(self, idx: int, ques: dict) -> None:
+        """
+        the question was answered or edited, `ques` is its new dict
+        """
+
+    @abstractmethod
+    def set_filter(self, tags: list[str], match_all: bool, questions: list[int]) -> None:
+        """
+        only picks `questions`, the questions that have all (match_all) or any
+        of the tags. An empty list of tags removes the filter
+        """
+
+    def shift(self, idx: int, old_probability: float) -> float:
+        """
+        returns how much the question order changed with the last update of
+        the question at `idx`, between 0 and 1
+        """
+        return 0.0
+
+
+class ProbabilityScheduler(Scheduler):
+    """
+    Draws questions at random weighted by their current probability
+    """
+
+    def __init__(self, probabilities: list[float]):
+        self.sampler = WeightedSampler([PROBABILITY_SMOOTHING + probability for probability in probabilities])
+        self.tag_filter: TagFilter | None = None
+
+    def next(self) -> int:
+        idx = self.tag_filter.sample() if self.tag_filter is not None else None
+        if idx is None:
+            idx = self.sampler.sample()
+        return idx
+
+    def update(self, idx: int, ques: dict) -> None:
+        weight = PROBABILITY_SMOOTHING + ques.get("current_probability", 0)
+        self.sampler.update(idx, weight)
+        if self.tag_filter is not None:
+            self.tag_filter.update(idx, ques.get("tags") or [], weight)
+
+    def set_filter(self, tags: list[str], match_all: bool, questions: list[int]) -> None:
+        self.tag_filter = TagFilter(tags, match_all, questions, self.sampler.weights) if tags else None
+
+    def shift(self, idx: int, old_probability: float) -> float:
+        """
+        returns the total variation distance between the question distribution
+        before and after the probability of the question changed from
+        `old_probability` to its current value
+        """
+        new_weight = self.sampler.weights[idx]
+        old_weight = PROBABILITY_SMOOTHING + old_probability
+        new_total = self.sampler.total
+        old_total = new_total - new_weight + old_weight
+        others = new_total - new_weight
+        return 0.5 * (
+            others * abs(1 / old_total - 1 / new_total)
+            + abs(old_weight / old_total - new_weight / new_total)
+        )
+
+
+class SM2Scheduler(Scheduler):
+    """
+    Spaced repetition: the questions that are due come first (the earliest
+    first), then the questions never answered (in order), then the questions
+    that are due the soonest.
+
+    Answered questions are in a min-heap of (due time, index) and new ones in
+    a min-heap of (0, index), so picking a question is O(log n). A tag filter
+    gets a pair of heaps of its own questions. Entries are not removed when a
+    question is rescheduled or leaves the filter, an entry whose due time is
+    not the current one of its question (or whose question is not allowed
+    anymore) is dropped when it comes up.
+    """
+
+    def __init__(self, due_at: list[float]):
+        # due time of every question, including the delay of the drawn questions
+        self.due_at = list(due_at)
+        # due time of every question as last saved
+        self._saved_due_at = list(due_at)
+        self._heaps = self._build_heaps(range(len(self.due_at)))
+        self._filter: tuple[set[str], bool] | None = None
+        self._allowed: set[int] = set()
+        self._filter_heaps: tuple[list[tuple[float, int]], list[tuple[float, int]]] | None = None
+
+    def _build_heaps(self, questions) -> tuple[list[tuple[float, int]], list[tuple[float, int]]]:
+        """
+        returns the heaps of the scheduled and of the new questions
+        """
+        scheduled = [(self.due_at[idx], idx) for idx in questions if self.due_at[idx] > 0]
+        new = [(0.0, idx) for idx in questions if self.due_at[idx] == 0]
+        heapq.heapify(scheduled)
+        heapq.heapify(new)
+        return scheduled, new
+
+    def _push(self, idx: int) -> None:
+        """
+        adds the current due time of the question to the heaps
+        """
+        due = self.due_at[idx]
+        heapq.heappush(self._heaps[0] if due > 0 else self._heaps[1], (due, idx))
+        if self._filter_heaps is not None and idx in self._allowed:
+            self._push_filtered(idx)
+
+    def next(self) -> int:
+        now = time.time()
+        idx = self._pop(now, self._filter_heaps, self._allowed) if self._filter_heaps is not None else None
+        if idx is None:
+            # no filter or no question matches it anymore
+            idx = self._pop(now, self._heaps, None)
+        assert idx is not None, "the scheduler has no questions"
+        # keep it from being drawn again until it is answered
+        self.due_at[idx] = max(self.due_at[idx], now) + DRAWN_DELAY
+        self._push(idx)
+        return idx
+
+    def update(self, idx: int, ques: dict) -> None:
+        if self._filter is not None:
+            tags, match_all = self._filter
+            ques_tags = set(ques.get("tags") or [])
+            if tags <= ques_tags if match_all else not tags.isdisjoint(ques_tags):
+                if idx not in self._allowed:
+                    self._allowed.add(idx)
+                    self._push_filtered(idx)
+            else:
+                self._allowed.discard(idx)
+        due = ques.get("due_at", 0)
+        if due == self._saved_due_at[idx]:
+            # not answered (eg. a tag was edited), a drawn question stays held back
+            return
+        self._saved_due_at[idx] = due
+        self.due_at[idx] = due
+        self._push(idx)
+
+    def _push_filtered(self, idx: int) -> None:
+        assert self._filter_heaps is not None
+        due = self.due_at[idx]
+        heapq.heappush(self._filter_heaps[0] if due > 0 else self._filter_heaps[1], (due, idx))
+
+    def set_filter(self, tags: list[str], match_all: bool, questions: list[int]) -> None:
+        if tags:
+            self._filter = (set(tags), match_all)
+            self._allowed = set(questions)
+            self._filter_heaps = self._build_heaps(self._allowed)
+        else:
+            self._filter = None
+            self._allowed = set()
+            self._filter_heaps = None
+
+    def _pop(
+        self, now: float, heaps: tuple[list[tuple[float, int]], list[tuple[float, int]]], allowed: set[int] | None
+    ) -> int | None:
+        """
+        removes and returns the next question of the heaps, `allowed` are the
+        questions that may still be in them (None allows all)
+        """
+        scheduled, new = heaps
+        for heap, until in ((scheduled, now), (new, 0.0), (scheduled, float("inf"))):
+            idx = self._pop_heap(heap, until, allowed)
+            if idx is not None:
+                return idx
+        return None
+
+    def _pop_heap(self, heap: list[tuple[float, int]], until: float, allowed: set[int] | None) -> int | None:
+        """
+        removes and returns the first valid entry of the heap that is due by
+        `until`, the outdated entries on the way are dropped
+        """
+        while heap and heap[0][0] <= until:
+            due, idx = heapq.heappop(heap)
+            if self.due_at[idx] == due and (allowed is None or idx in allowed):
+                return idx
+        return None
+
+
+SCHEDULERS = {"probability": "Weighted random", "sm2": "Spaced repetition (SM-2)"}
+
+
+def open_scheduler(name: str, store: QuestionStore) -> Scheduler:
+    """
+    returns the scheduler with the given name (see SCHEDULERS) over the questions of the store
+    """
+    if name == "probability":
+        return ProbabilityScheduler(store.probabilities())
+    if name == "sm2":
+        migrate(store)
+        return SM2Scheduler(store.column("due_at"))
+    raise ValueError(f"Unknown scheduler {name}, expected one of {', '.join(SCHEDULERS)}")
+
+
+if __name__ == "__main__":
+    from src.sqlite_store import SqliteStore
+    from src.storage import JsonStore
+
+    # the store is opened directly, an engine would also start the search index and the analytics
+    path = Path(sys.argv[1])
+    data_store = SqliteStore(path) if path.suffix in (".db", ".sqlite", ".sqlite3") else JsonStore(path)
+    print(f"Migrated {migrate(data_store)} questions")
+    data_store.close()
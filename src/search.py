@@ -0,0 +1,124 @@
+"""
+This module contains the full-text search over the questions, options and
+explinations: a tokenized inverted index ranked with BM25 that is cached on
+disk next to the data file and keyed by the hash of the data file
+"""
+import heapq
+import math
+import os
+import pickle
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Iterable
+
+CACHE_VERSION = 1
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> list[str]:
+    return _TOKEN.findall(text.lower())
+
+
+def question_text(ques: dict) -> str:
+    """
+    returns the searchable text of a question dict
+    """
+    return "\n".join([ques.get("question", ""), *ques.get("options", []), ques.get("explination") or ""])
+
+
+class SearchIndex:
+    """
+    Inverted index (term -> question index -> term frequency) ranked with BM25
+    """
+
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self):
+        self.postings: dict[str, dict[int, int]] = {}
+        self.doc_lengths: dict[int, int] = {}
+        self.total_length = 0
+
+    @classmethod
+    def build(cls, docs: Iterable[tuple[int, str]]) -> "SearchIndex":
+        index = cls()
+        for idx, text in docs:
+            index.add(idx, text)
+        return index
+
+    def add(self, idx: int, text: str) -> None:
+        tokens = tokenize(text)
+        for term, freq in Counter(tokens).items():
+            self.postings.setdefault(term, {})[idx] = freq
+        self.doc_lengths[idx] = len(tokens)
+        self.total_length += len(tokens)
+
+    def remove(self, idx: int, text: str) -> None:
+        """
+        removes a question, `text` must be the text it was added with
+        """
+        for term in set(tokenize(text)):
+            docs = self.postings.get(term)
+            if docs is None:
+                continue
+            docs.pop(idx, None)
+            if not docs:
+                del self.postings[term]
+        self.total_length -= self.doc_lengths.pop(idx, 0)
+
+    def update(self, idx: int, old_text: str, new_text: str) -> None:
+        if old_text != new_text:
+            self.remove(idx, old_text)
+            self.add(idx, new_text)
+
+    def search(self, query: str, limit: int = 20) -> list[tuple[int, float]]:
+        """
+        returns up to `limit` (question index, score) pairs, best first
+        """
+        n_docs = len(self.doc_lengths)
+        if n_docs == 0:
+            return []
+        avg_length = self.total_length / n_docs
+        terms = [term for term in set(tokenize(query)) if term in self.postings]
+        # rare terms first, very common terms only re-rank the questions found so far
+        terms.sort(key=lambda term: len(self.postings[term]))
+        scores: dict[int, float] = {}
+        for term in terms:
+            docs = self.postings[term]
+            idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            if scores and len(docs) > n_docs / 2:
+                candidates = ((idx, docs[idx]) for idx in scores if idx in docs)
+            else:
+                candidates = docs.items()
+            for idx, freq in candidates:
+                norm = self.K1 * (1 - self.B + self.B * self.doc_lengths[idx] / avg_length)
+                scores[idx] = scores.get(idx, 0.0) + idf * freq * (self.K1 + 1) / (freq + norm)
+        return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+
+    def save(self, path: Path, data_hash: str) -> None:
+        """
+        writes the index to the cache file, tagged with the hash of the data file
+        """
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump((CACHE_VERSION, data_hash, self.postings, self.doc_lengths), f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path, data_hash: str) -> "SearchIndex | None":
+        """
+        returns the cached index, or None if there is no cache for this data file
+        """
+        try:
+            with open(path, "rb") as f:
+                version, cached_hash, postings, doc_lengths = pickle.load(f)
+        except (OSError, ValueError, EOFError, pickle.UnpicklingError):
+            return None
+        if version != CACHE_VERSION or cached_hash != data_hash:
+            return None
+        index = cls()
+        index.postings = postings
+        index.doc_lengths = doc_lengths
+        index.total_length = sum(doc_lengths.values())
+        return index
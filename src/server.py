@@ -0,0 +1,161 @@
+"""
+This module contains the multi-user web server mode.
+
+Every browser session signs in with a user name. The questions are read from
+one shared, read-only bank (and one shared search index), the progress of
+every user is kept in a database of their own under the progress folder and
+is handled by an engine of their own (see src.quiz.QuizEngine), which the
+sessions of the same user share. Sessions run as async handlers, the store
+work happens on worker threads so a slow user never blocks the others.
+
+There is no authentication: a user name is all it takes to sign in, so
+anyone who can reach the server can open (and change) the progress of any
+user. Only serve it on a trusted network or behind a proxy that
+authenticates the users.
+
+    python -m src.server [--host 0.0.0.0] [--port 8550] [--progress-dir progress]
+"""
+import argparse
+import asyncio
+import re
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable
+
+import flet as ft
+
+from src.app import main
+from src.progress_store import ProgressStore
+from src.question_index import LazyQuestionBank, file_hash
+from src.quiz import QUESTIONS_ANSWERS_FILE, QuizEngine
+from src.search import SearchIndex, question_text
+
+USER_NAME = re.compile(r"[A-Za-z0-9_.-]{1,64}")
+
+
+class SessionManager:
+    """
+    Opens the engine of a user for their first session and closes it after
+    their last one, the sessions of different users never wait on each other
+    """
+
+    def __init__(self, data_file: Path, progress_dir: Path):
+        self.data_file = Path(data_file)
+        self.progress_dir = Path(progress_dir)
+        self.progress_dir.mkdir(parents=True, exist_ok=True)
+        self.bank = LazyQuestionBank(self.data_file, self.data_file.with_suffix(".idx"))
+        self._search_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="search")
+        self.search_index: Future[SearchIndex] = self._search_executor.submit(self._load_search_index)
+        self._engines: dict[str, QuizEngine] = {}
+        self._sessions: dict[str, int] = {}
+        # one lock per user, only held while their engine is opened or closed
+        self._locks: dict[str, asyncio.Lock] = {}
+
+    def _load_search_index(self) -> SearchIndex:
+        cache_file = self.data_file.with_suffix(".search")
+        data_hash = file_hash(self.data_file)
+        index = SearchIndex.load(cache_file, data_hash)
+        if index is None:
+            index = SearchIndex.build((idx, question_text(self.bank[idx])) for idx in range(len(self.bank)))
+            index.save(cache_file, data_hash)
+        return index
+
+    def _open(self, user: str) -> QuizEngine:
+        store = ProgressStore(self.bank, self.progress_dir / f"{user}.db")
+        return QuizEngine(store, search_index=self.search_index)
+
+    async def acquire(self, user: str) -> QuizEngine:
+        """
+        returns the engine of the user, opening it if this is their first session
+        """
+        async with self._locks.setdefault(user, asyncio.Lock()):
+            if user not in self._engines:
+                self._engines[user] = await asyncio.to_thread(self._open, user)
+                self._sessions[user] = 0
+            self._sessions[user] += 1
+            return self._engines[user]
+
+    async def release(self, user: str) -> None:
+        """
+        ends a session of the user, their engine is flushed and closed after the last one
+        """
+        async with self._locks.setdefault(user, asyncio.Lock()):
+            if user not in self._engines:
+                return
+            self._sessions[user] -= 1
+            if self._sessions[user] > 0:
+                return
+            engine = self._engines.pop(user)
+            del self._sessions[user]
+            await asyncio.to_thread(engine.close)
+
+    def close(self) -> None:
+        """
+        closes the engines of the users that are still signed in
+        """
+        for engine in self._engines.values():
+            engine.close()
+        self._engines.clear()
+        self._sessions.clear()
+        self.bank.close()
+        self._search_executor.shutdown(wait=False)
+
+
+def serve(manager: SessionManager, host: str | None, port: int) -> None:
+    async def session_main(page: ft.Page):
+        page.title = "AWS Solutions Architect Associate Exam Prep"
+        user_input = ft.TextField(label="User name", autofocus=True)
+        error_text = ft.Text(color=ft.colors.RED_400)
+
+        async def _on_sign_in(_: ft.ControlEvent):
+            if page.session.contains_key("user"):
+                # already signed in
+                return
+            user = (user_input.value or "").strip()
+            if not USER_NAME.fullmatch(user):
+                error_text.value = "Use 1 to 64 letters, digits, '.', '_' or '-'"
+                error_text.update()
+                return
+            engine = await manager.acquire(user)
+            # connection-level state, every session of the user shares the engine
+            page.session.set("user", user)
+            close_session: Callable[[], None] | None = None
+            is_closed = False
+
+            async def _on_close(_):
+                nonlocal is_closed
+                is_closed = True
+                if close_session is not None:
+                    close_session()
+                await manager.release(user)
+
+            page.on_close = _on_close
+            page.clean()
+            close_session = await asyncio.to_thread(main, page, engine)
+            if is_closed:
+                # the session was closed while the app was being built
+                close_session()
+
+        user_input.on_submit = _on_sign_in
+        page.add(ft.Column([
+            ft.Text("AWS Solutions Architect Associate Exam Prep", size=28),
+            ft.Text("Sign in to keep your own progress", size=18),
+            user_input,
+            error_text,
+            ft.FilledButton("Sign in", on_click=_on_sign_in),
+        ]))
+
+    try:
+        ft.app(session_main, host=host, port=port, view=ft.AppView.WEB_BROWSER)
+    finally:
+        manager.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the quiz to several users over the web")
+    parser.add_argument("--host", default=None, help="address to listen on")
+    parser.add_argument("--port", type=int, default=8550)
+    parser.add_argument("--data-file", type=Path, default=Path(QUESTIONS_ANSWERS_FILE), help="shared question bank")
+    parser.add_argument("--progress-dir", type=Path, default=Path("progress"), help="folder of the progress databases")
+    args = parser.parse_args()
+    serve(SessionManager(args.data_file, args.progress_dir), args.host, args.port)
@@ -0,0 +1,330 @@
+"""
+This module contains the SQLite storage backend and the importer for the
+json question banks.
+
+Usage::
+
+    python -m src.sqlite_store data.db data.json [merged.json ...]
+"""
+import json
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+
+from src.attempt_history import HISTORY_WINDOW, AttemptHistory
+from src.journal import diff_records
+from src.storage import QuestionStore
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS questions (
+    id INTEGER PRIMARY KEY,
+    question TEXT NOT NULL,
+    answers TEXT NOT NULL,
+    options TEXT NOT NULL,
+    explination TEXT,
+    topic TEXT,
+    views TEXT,
+    extra TEXT NOT NULL DEFAULT '{}',
+    total_times_question_attempted INTEGER NOT NULL DEFAULT 0,
+    correct_times_question_attempted INTEGER NOT NULL DEFAULT 0,
+    current_probability REAL NOT NULL DEFAULT 0,
+    ease REAL NOT NULL DEFAULT 0,
+    interval_days REAL NOT NULL DEFAULT 0,
+    due_at REAL NOT NULL DEFAULT 0,
+    repetitions INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS questions_topic ON questions (topic);
+
+CREATE TABLE IF NOT EXISTS tags (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS question_tags (
+    question_id INTEGER NOT NULL REFERENCES questions (id),
+    tag_id INTEGER NOT NULL REFERENCES tags (id),
+    position INTEGER NOT NULL,
+    PRIMARY KEY (question_id, tag_id)
+);
+CREATE INDEX IF NOT EXISTS question_tags_tag ON question_tags (tag_id, question_id);
+
+CREATE TABLE IF NOT EXISTS attempts (
+    id INTEGER PRIMARY KEY,
+    question_id INTEGER NOT NULL REFERENCES questions (id),
+    is_correct INTEGER NOT NULL,
+    attempted_at REAL
+);
+CREATE INDEX IF NOT EXISTS attempts_question ON attempts (question_id, id);
+CREATE INDEX IF NOT EXISTS attempts_time ON attempts (attempted_at);
+"""
+
+# json encoded list/dict columns of the questions table
+JSON_COLUMNS = ["answers", "options", "views"]
+TEXT_COLUMNS = ["question", "explination", "topic"]
+STATS_COLUMNS = [
+    "total_times_question_attempted",
+    "correct_times_question_attempted",
+    "current_probability",
+    "ease",
+    "interval_days",
+    "due_at",
+    "repetitions",
+]
+# columns added after the first version of the schema, with their definition
+ADDED_COLUMNS = {
+    "ease": "REAL NOT NULL DEFAULT 0",
+    "interval_days": "REAL NOT NULL DEFAULT 0",
+    "due_at": "REAL NOT NULL DEFAULT 0",
+    "repetitions": "INTEGER NOT NULL DEFAULT 0",
+}
+# question fields that are not stored in the `extra` column
+KNOWN_FIELDS = {*JSON_COLUMNS, *TEXT_COLUMNS, *STATS_COLUMNS, "tags", "attempt_history"}
+
+
+class SqliteStore(QuestionStore):
+    """
+    Stores the questions, their tags and every single attempt in a SQLite
+    database, saving a question is one small transaction
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(SCHEMA)
+        existing = {row[1] for row in self._conn.execute("PRAGMA table_info(questions)")}
+        for name, definition in ADDED_COLUMNS.items():
+            if name not in existing:
+                self._conn.execute(f"ALTER TABLE questions ADD COLUMN {name} {definition}")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM questions").fetchone()[0]
+
+    def load(self, idx: int) -> dict:
+        columns = [*TEXT_COLUMNS, *JSON_COLUMNS, *STATS_COLUMNS]
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(columns)}, extra FROM questions WHERE id = ?", (idx,)
+            ).fetchone()
+            if row is None:
+                raise IndexError(f"No question at index {idx}")
+            tags = self._conn.execute(
+                "SELECT tags.name FROM question_tags JOIN tags ON tags.id = question_tags.tag_id"
+                " WHERE question_tags.question_id = ? ORDER BY question_tags.position",
+                (idx,),
+            ).fetchall()
+            # every attempt is kept in the table, the question only carries the last ones
+            history = self._conn.execute(
+                "SELECT is_correct FROM attempts WHERE question_id = ? ORDER BY id DESC LIMIT ?",
+                (idx, HISTORY_WINDOW or -1),
+            ).fetchall()
+        ques = json.loads(row[-1])
+        for name, value in zip(columns, row):
+            if name in JSON_COLUMNS:
+                value = json.loads(value) if value is not None else None
+            if value is not None or name == "views":
+                ques[name] = value
+        ques["tags"] = [name for name, in tags]
+        ques["attempt_history"] = AttemptHistory(is_correct for is_correct, in reversed(history)).to_json()
+        return ques
+
+    def save(self, idx: int, ques: dict) -> None:
+        self.save_many({idx: ques})
+
+    def save_many(self, questions: dict[int, dict]) -> None:
+        records = []
+        for idx, ques in questions.items():
+            old = self.load(idx)
+            records.extend(diff_records(idx, old, {**old, **ques}))
+        with self._lock, self._conn:
+            for record in records:
+                self._apply(record)
+
+    def save_stats(self, stats: dict[int, dict]) -> None:
+        with self._lock, self._conn:
+            for idx, values in stats.items():
+                names = [name for name in STATS_COLUMNS if name in values]
+                self._conn.execute(
+                    f"UPDATE questions SET {', '.join(f'{name} = ?' for name in names)} WHERE id = ?",
+                    (*(values[name] for name in names), idx),
+                )
+
+    def probabilities(self) -> list[float]:
+        return self.column("current_probability")
+
+    def column(self, name: str) -> list:
+        if name not in STATS_COLUMNS:
+            raise ValueError(f"Unknown stats column {name}")
+        with self._lock:
+            rows = self._conn.execute(f"SELECT {name} FROM questions ORDER BY id")
+            return [value for value, in rows]
+
+    def tags(self) -> dict[int, list[str]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT question_tags.question_id, tags.name FROM question_tags"
+                " JOIN tags ON tags.id = question_tags.tag_id"
+                " ORDER BY question_tags.question_id, question_tags.position"
+            ).fetchall()
+        tags: dict[int, list[str]] = {}
+        for idx, name in rows:
+            tags.setdefault(idx, []).append(name)
+        return tags
+
+    def questions_with_tag(self, tag: str) -> list[int]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT question_tags.question_id FROM tags"
+                " JOIN question_tags ON question_tags.tag_id = tags.id"
+                " WHERE tags.name = ? ORDER BY question_tags.question_id",
+                (tag,),
+            )
+            return [idx for idx, in rows]
+
+    def topics(self) -> dict[int, str]:
+        with self._lock:
+            return dict(self._conn.execute("SELECT id, topic FROM questions WHERE topic IS NOT NULL AND topic != ''"))
+
+    def histories(self) -> dict[int, AttemptHistory]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT question_id, is_correct FROM attempts ORDER BY question_id, id"
+            ).fetchall()
+        attempts: dict[int, list[bool]] = {}
+        for idx, is_correct in rows:
+            attempts.setdefault(idx, []).append(bool(is_correct))
+        return {idx: AttemptHistory(history) for idx, history in attempts.items()}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def import_questions(self, questions: list[dict]) -> int:
+        """
+        appends the questions to the database in one transaction, returns the
+        number of imported questions
+        """
+        with self._lock, self._conn:
+            start = self._conn.execute("SELECT COUNT(*) FROM questions").fetchone()[0]
+            for idx, ques in enumerate(questions, start):
+                self._insert(idx, ques)
+        return len(questions)
+
+    def _insert(self, idx: int, ques: dict) -> None:
+        self._conn.execute(
+            "INSERT INTO questions (id, question, answers, options, explination, topic, views, extra,"
+            f" {', '.join(STATS_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, {', '.join('?' * len(STATS_COLUMNS))})",
+            (
+                idx,
+                ques["question"],
+                json.dumps(ques.get("answers", [])),
+                json.dumps(ques["options"]),
+                ques.get("explination"),
+                ques.get("topic"),
+                json.dumps(ques["views"]) if ques.get("views") is not None else None,
+                json.dumps({key: value for key, value in ques.items() if key not in KNOWN_FIELDS}),
+                *(ques.get(name, 0) or 0 for name in STATS_COLUMNS),
+            ),
+        )
+        for tag in ques.get("tags") or []:
+            self._add_tag(idx, tag)
+        # the time of the attempts made before the import is unknown
+        self._conn.executemany(
+            "INSERT INTO attempts (question_id, is_correct, attempted_at) VALUES (?, ?, NULL)",
+            [(idx, is_correct) for is_correct in AttemptHistory.from_json(ques.get("attempt_history"))],
+        )
+
+    def _apply(self, record: dict) -> None:
+        """
+        applies a change record (see `src.journal.diff_records`) to the database
+        """
+        idx = record["index"]
+        op = record["op"]
+        if op == "attempt":
+            self._conn.execute(
+                "INSERT INTO attempts (question_id, is_correct, attempted_at) VALUES (?, ?, ?)",
+                (idx, record["correct"], time.time()),
+            )
+            self._conn.execute(
+                "UPDATE questions SET total_times_question_attempted = ?,"
+                " correct_times_question_attempted = ?, current_probability = ? WHERE id = ?",
+                (record["total"], record["correct_total"], record["probability"], idx),
+            )
+        elif op == "tag_add":
+            self._add_tag(idx, record["tag"])
+        elif op == "tag_remove":
+            self._conn.execute(
+                "DELETE FROM question_tags WHERE question_id = ?"
+                " AND tag_id = (SELECT id FROM tags WHERE name = ?)",
+                (idx, record["tag"]),
+            )
+        elif op == "answers":
+            self._conn.execute(
+                "UPDATE questions SET answers = ? WHERE id = ?", (json.dumps(record["answers"]), idx)
+            )
+        elif op == "set":
+            self._set_fields(idx, record["fields"])
+        else:
+            raise ValueError(f"Invalid change record {op}")
+
+    def _set_fields(self, idx: int, fields: dict) -> None:
+        extra = {}
+        for name, value in fields.items():
+            if name in JSON_COLUMNS:
+                value = json.dumps(value) if value is not None else None
+            if name in (*JSON_COLUMNS, *TEXT_COLUMNS, *STATS_COLUMNS):
+                self._conn.execute(f"UPDATE questions SET {name} = ? WHERE id = ?", (value, idx))
+            elif name == "attempt_history":
+                # only a full rewrite of the history ends up here
+                self._conn.execute("DELETE FROM attempts WHERE question_id = ?", (idx,))
+                self._conn.executemany(
+                    "INSERT INTO attempts (question_id, is_correct, attempted_at) VALUES (?, ?, NULL)",
+                    [(idx, is_correct) for is_correct in AttemptHistory.from_json(value)],
+                )
+            else:
+                extra[name] = value
+        if extra:
+            row = self._conn.execute("SELECT extra FROM questions WHERE id = ?", (idx,)).fetchone()
+            self._conn.execute(
+                "UPDATE questions SET extra = ? WHERE id = ?",
+                (json.dumps({**json.loads(row[0]), **extra}), idx),
+            )
+
+    def _add_tag(self, idx: int, tag: str) -> None:
+        self._conn.execute("INSERT OR IGNORE INTO tags (name) VALUES (?)", (tag,))
+        self._conn.execute(
+            "INSERT OR IGNORE INTO question_tags (question_id, tag_id, position)"
+            " SELECT ?, id, (SELECT COALESCE(MAX(position) + 1, 0) FROM question_tags WHERE question_id = ?)"
+            " FROM tags WHERE name = ?",
+            (idx, idx, tag),
+        )
+
+
+def import_json(db_path: Path, json_paths: list[Path]) -> int:
+    """
+    imports the json question banks into the database, returns the number of
+    imported questions
+    """
+    store = SqliteStore(db_path)
+    total = 0
+    try:
+        for json_path in json_paths:
+            with open(json_path, encoding="utf-8") as f:
+                total += store.import_questions(json.load(f))
+    finally:
+        store.close()
+    return total
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage: python -m src.sqlite_store <database> <json file> [<json file> ...]")
+        sys.exit(1)
+    count = import_json(Path(sys.argv[1]), [Path(arg) for arg in sys.argv[2:]])
+    print(f"Imported {count} questions into {sys.argv[1]}")
@@ -0,0 +1,225 @@
+"""
+This module contains the fixed-width store for the mutable question stats.
+
+The counters of every question are kept in a small binary file with one
+column per stat, indexed by the question index. The file is memory-mapped so
+updating a counter is an in-place write of a few bytes and reading all the
+stats (eg. for analytics) is a zero-copy view over the mapping.
+
+File layout::
+
+    header  magic, count, capacity, number of columns, fingerprint of the data
+    columns name (32 bytes) and array typecode (1 byte) per column
+    data    one array of `capacity` items per column, 8 byte aligned
+"""
+import mmap
+import struct
+from array import array
+from pathlib import Path
+from typing import Callable
+
+MAGIC = b"QSTATS02"
+_HEADER = struct.Struct("<8sIII32s")
+_FINGERPRINT_OFFSET = 20
+_COLUMN = struct.Struct("<32sc")
+
+# name and array typecode of every stored column
+STATS_COLUMNS: tuple[tuple[str, str], ...] = (
+    ("total_times_question_attempted", "i"),
+    ("correct_times_question_attempted", "i"),
+    ("current_probability", "d"),
+    # SM-2 state, see src.scheduler
+    ("ease", "d"),
+    ("interval_days", "d"),
+    ("due_at", "d"),
+    ("repetitions", "i"),
+)
+
+
+def _pack_fingerprint(fingerprint: str) -> bytes:
+    data = fingerprint.encode()
+    if len(data) > 32:
+        raise ValueError("The fingerprint must be at most 32 bytes")
+    return data.ljust(32, b"\0")
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+class StatsStore:
+    """
+    Memory-mapped columns of question stats
+    """
+
+    def __init__(self, path: Path, count: int, seed: Callable[[int], dict],
+                 columns: tuple[tuple[str, str], ...] = STATS_COLUMNS, fingerprint: str = ""):
+        """
+        opens the stats file at `path`, the file is (re)created from `seed`
+        when it is missing, has other columns, holds more questions than
+        `count` or was seeded from other data than `fingerprint` (eg. the hash
+        of the data file), questions missing from the file are seeded from `seed`
+        """
+        self.path = Path(path)
+        self.columns = columns
+        self.fingerprint = fingerprint
+        self._mmap: mmap.mmap | None = None
+        self._views: dict[str, memoryview] = {}
+        if not self._open() or len(self) > count:
+            seeds = [seed(i) for i in range(count)]
+            self._create(count, {
+                name: array(typecode, (ques.get(name, 0) or 0 for ques in seeds))
+                for name, typecode in self.columns
+            })
+        while len(self) < count:
+            self.append(seed(len(self)))
+
+    def __len__(self) -> int:
+        return self._count
+
+    def column(self, name: str) -> memoryview:
+        """
+        returns a zero-copy view of the values of a column
+        """
+        return self._views[name][:self._count]
+
+    def get(self, idx: int) -> dict:
+        """
+        returns the stats of a question as a dict
+        """
+        self._check_index(idx)
+        return {name: self._views[name][idx] for name, _ in self.columns}
+
+    def set(self, idx: int, values: dict) -> None:
+        """
+        writes the given stats of a question in place, unknown keys are ignored
+        """
+        self._check_index(idx)
+        for name, _ in self.columns:
+            if name in values:
+                self._views[name][idx] = values[name]
+
+    def append(self, values: dict) -> None:
+        """
+        adds the stats of a new question, the file grows by doubling its capacity
+        """
+        if self._count == self._capacity:
+            self._create(self._capacity * 2, self.snapshot())
+        self._count += 1
+        self._write_count()
+        self.set(self._count - 1, {name: values.get(name, 0) for name, _ in self.columns})
+
+    def snapshot(self) -> dict[str, array]:
+        """
+        returns a copy of every column
+        """
+        copies = {}
+        for name, typecode in self.columns:
+            copies[name] = array(typecode)
+            copies[name].frombytes(self.column(name).tobytes())
+        return copies
+
+    def set_fingerprint(self, fingerprint: str) -> None:
+        """
+        records that the stats match the data with this fingerprint, eg. after
+        the stats were merged into a rewritten data file
+        """
+        assert self._mmap is not None
+        self.fingerprint = fingerprint
+        self._mmap[_FINGERPRINT_OFFSET:_FINGERPRINT_OFFSET + 32] = _pack_fingerprint(fingerprint)
+
+    def flush(self) -> None:
+        if self._mmap is not None:
+            self._mmap.flush()
+
+    def close(self) -> None:
+        self.flush()
+        self._release()
+
+    def _check_index(self, idx: int) -> None:
+        if not 0 <= idx < self._count:
+            raise IndexError(f"No stats for question {idx}")
+
+    def _layout(self, capacity: int) -> tuple[int, list[int], int]:
+        """
+        returns the header size, the offset of every column and the file size
+        """
+        offset = _align(_HEADER.size + _COLUMN.size * len(self.columns))
+        header_size = offset
+        offsets = []
+        for _, typecode in self.columns:
+            offsets.append(offset)
+            offset = _align(offset + capacity * array(typecode).itemsize)
+        return header_size, offsets, offset
+
+    def _open(self) -> bool:
+        """
+        maps an existing stats file, returns False if it can not be used
+        """
+        if not self.path.exists():
+            return False
+        with open(self.path, "rb") as f:
+            header = f.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                return False
+            magic, count, capacity, n_columns, fingerprint = _HEADER.unpack(header)
+            if magic != MAGIC or n_columns != len(self.columns):
+                return False
+            if fingerprint != _pack_fingerprint(self.fingerprint):
+                # the data file was replaced, the counters would be matched to other questions
+                return False
+            for name, typecode in self.columns:
+                raw_name, raw_typecode = _COLUMN.unpack(f.read(_COLUMN.size))
+                if raw_name.rstrip(b"\0").decode() != name or raw_typecode.decode() != typecode:
+                    return False
+        if self.path.stat().st_size != self._layout(capacity)[2]:
+            return False
+        self._map(count, capacity)
+        return True
+
+    def _create(self, capacity: int, values: dict[str, array]) -> None:
+        """
+        writes a new stats file holding the `values` of every column and maps it
+        """
+        self._release()
+        count = len(values[self.columns[0][0]])
+        capacity = max(capacity, count, 1)
+        header_size, offsets, size = self._layout(capacity)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, count, capacity, len(self.columns), _pack_fingerprint(self.fingerprint)))
+            for name, typecode in self.columns:
+                f.write(_COLUMN.pack(name.encode(), typecode.encode()))
+            for (name, _), offset in zip(self.columns, offsets):
+                f.seek(offset)
+                f.write(values[name].tobytes())
+            f.truncate(size)
+        tmp_path.replace(self.path)
+        self._map(count, capacity)
+
+    def _map(self, count: int, capacity: int) -> None:
+        self._count = count
+        self._capacity = capacity
+        with open(self.path, "r+b") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0)
+        _, offsets, _ = self._layout(capacity)
+        buffer = memoryview(self._mmap)
+        for (name, typecode), offset in zip(self.columns, offsets):
+            size = array(typecode).itemsize
+            self._views[name] = buffer[offset:offset + capacity * size].cast(typecode)
+
+    def _write_count(self) -> None:
+        assert self._mmap is not None
+        self._mmap[8:12] = struct.pack("<I", self._count)
+
+    def _release(self) -> None:
+        for view in self._views.values():
+            view.release()
+        self._views = {}
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # a caller still holds a column view, the mapping is closed once it is dropped
+                pass
+            self._mmap = None
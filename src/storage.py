@@ -0,0 +1,215 @@
+"""
+This module contains the storage interface of the question bank and its
+default json implementation
+"""
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+from src.attempt_history import AttemptHistory
+from src.journal import Journal, apply_record, diff_records
+from src.question_index import LazyQuestionBank
+from src.stats_store import STATS_COLUMNS, StatsStore
+
+# counters that live in the stats store instead of the question dicts
+STATS_FIELDS = [name for name, _ in STATS_COLUMNS]
+
+
+class QuestionStore(ABC):
+    """
+    Storage backend of the questions, questions are identified by their index
+    and exchanged as dicts in the data.json format
+    """
+
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+
+    @abstractmethod
+    def load(self, idx: int) -> dict:
+        """
+        returns the question at the given index including its stats
+        """
+
+    @abstractmethod
+    def save(self, idx: int, ques: dict) -> None:
+        """
+        persists the changes between the stored question and `ques`
+        """
+
+    def save_many(self, questions: dict[int, dict]) -> None:
+        """
+        persists a batch of questions (index -> question)
+        """
+        for idx, ques in questions.items():
+            self.save(idx, ques)
+
+    def save_stats(self, stats: dict[int, dict]) -> None:
+        """
+        writes some of the STATS_FIELDS of a batch of questions (index ->
+        values), the rest of the questions is not touched
+        """
+        self.save_many(stats)
+
+    @abstractmethod
+    def probabilities(self) -> list[float]:
+        """
+        returns the current probability of every question
+        """
+
+    @abstractmethod
+    def column(self, name: str) -> list:
+        """
+        returns the value of one of the STATS_FIELDS for every question
+        """
+
+    @abstractmethod
+    def tags(self) -> dict[int, list[str]]:
+        """
+        returns the tags of every question that has any
+        """
+
+    @abstractmethod
+    def questions_with_tag(self, tag: str) -> list[int]:
+        """
+        returns the indexes of the questions tagged with `tag`
+        """
+
+    def topics(self) -> dict[int, str]:
+        """
+        returns the topic of every question that has one
+        """
+        return {idx: topic for idx in range(len(self)) if (topic := self.load(idx).get("topic"))}
+
+    def histories(self) -> dict[int, AttemptHistory]:
+        """
+        returns the attempt history of every answered question, only those are decoded
+        """
+        return {
+            idx: AttemptHistory.from_json(self.load(idx).get("attempt_history"))
+            for idx, total in enumerate(self.column("total_times_question_attempted"))
+            if total
+        }
+
+    def close(self) -> None:
+        """
+        flushes pending work and releases the store
+        """
+
+
+class JsonStore(QuestionStore):
+    """
+    Stores the questions in a json file, the counters in a memory-mapped stats
+    file and the changes in an append-only journal next to it
+    """
+
+    # number of journal records after which the journal is folded into the data file
+    COMPACT_EVERY = 200
+
+    def __init__(self, path: Path):
+        path = Path(path)
+        # questions are decoded on demand, only their tags and stats stay in memory
+        self.questions = LazyQuestionBank(path, path.with_suffix(".idx"))
+        # questions whose stats were written by `save_stats` and are not in the data file yet
+        self._stats_dirty: set[int] = set()
+        self._dirty_lock = threading.Lock()
+        self.journal = Journal(path.with_suffix(".journal"), self._write_snapshot)
+        replayed = set()
+        for record in self.journal.replay():
+            apply_record(self.questions, record)
+            replayed.add(record["index"])
+
+        # the stats are seeded again if the data file is not the one they were kept for
+        self.stats = StatsStore(
+            path.with_suffix(".stats"), len(self.questions), self.questions.__getitem__,
+            fingerprint=self.questions.data_hash,
+        )
+        # the journal is written before the stats, so it wins for the questions it touched
+        for idx in replayed:
+            ques = self.questions[idx]
+            if ques.get("total_times_question_attempted", 0) >= self.stats.get(idx)["total_times_question_attempted"]:
+                self.stats.set(idx, {name: ques.get(name, 0) for name in STATS_FIELDS})
+        self.journal.compact(self._snapshot)
+
+    def __len__(self) -> int:
+        return len(self.questions)
+
+    def load(self, idx: int) -> dict:
+        return {**self.questions[idx], **self.stats.get(idx)}
+
+    def save(self, idx: int, ques: dict) -> None:
+        self.save_many({idx: ques})
+
+    def save_many(self, questions: dict[int, dict]) -> None:
+        records = []
+        updates = []
+        for idx, ques in questions.items():
+            ques = dict(ques)
+            stats_dict = {name: ques.pop(name) for name in STATS_FIELDS if name in ques}
+            # keep the fields that are not part of `ques` (eg. topic)
+            old_dict = self.questions[idx]
+            old_stats = self.stats.get(idx)
+            ques = {**old_dict, **ques}
+            records.extend(diff_records(idx, {**old_dict, **old_stats}, {**ques, **old_stats, **stats_dict}))
+            updates.append((idx, ques, stats_dict))
+        # one write and fsync for the whole batch
+        self.journal.append(records)
+        for idx, ques, stats_dict in updates:
+            # the counters in the dict are stale, compaction merges the stats store in
+            self.questions[idx] = ques
+            # the counters are written in place, the json file is only touched by compaction
+            self.stats.set(idx, stats_dict)
+        if self.journal.pending >= self.COMPACT_EVERY:
+            self.journal.compact(self._snapshot)
+
+    def save_stats(self, stats: dict[int, dict]) -> None:
+        # written in place only, neither the overlay nor the journal is touched,
+        # the questions are merged into the data file by the next compaction
+        for idx, values in stats.items():
+            self.stats.set(idx, values)
+        self.stats.flush()
+        with self._dirty_lock:
+            self._stats_dirty.update(stats)
+        self.journal.compact(self._snapshot, force=True)
+
+    def probabilities(self) -> list[float]:
+        return self.stats.column("current_probability").tolist()
+
+    def column(self, name: str) -> list:
+        return self.stats.column(name).tolist()
+
+    def tags(self) -> dict[int, list[str]]:
+        return self.questions.tags()
+
+    def questions_with_tag(self, tag: str) -> list[int]:
+        return sorted(idx for idx, tags in self.questions.tags().items() if tag in tags)
+
+    def topics(self) -> dict[int, str]:
+        return self.questions.topics()
+
+    def close(self) -> None:
+        self.journal.close(self._snapshot, force=bool(self._stats_dirty))
+        self.stats.close()
+        self.questions.close()
+
+    def _snapshot(self):
+        with self._dirty_lock:
+            dirty, self._stats_dirty = self._stats_dirty, set()
+        return self.questions.snapshot(), self.stats.snapshot(), dirty
+
+    def _write_snapshot(self, snapshot) -> None:
+        """
+        writes the updated questions merged with their stats to the json file
+        """
+        overlay, columns, dirty = snapshot
+        try:
+            self.questions.write(
+                {**{idx: self.questions[idx] for idx in dirty}, **overlay},
+                lambda i, ques: {**ques, **{name: columns[name][i] for name in STATS_FIELDS}},
+            )
+        except BaseException:
+            with self._dirty_lock:
+                self._stats_dirty |= dirty
+            raise
+        self.stats.set_fingerprint(self.questions.data_hash)
+        self.stats.flush()
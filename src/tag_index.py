@@ -0,0 +1,103 @@
+"""
+This module contains the tag -> question inverted index and the tag filter
+used by the tag practice mode
+"""
+from bisect import bisect_left, insort
+from typing import Iterable
+
+from src.sampler import WeightedSampler
+
+
+class TagIndex:
+    """
+    Inverted index from every tag to the questions that have it, the list of
+    tags is kept sorted in place (`sorted_tags`)
+    """
+
+    def __init__(self, tags: dict[int, list[str]]):
+        self.sorted_tags: list[str] = []
+        self._questions: dict[str, set[int]] = {}
+        self._tags: dict[int, set[str]] = {}
+        for idx, ques_tags in tags.items():
+            self.update(idx, ques_tags)
+
+    def update(self, idx: int, tags: Iterable[str]) -> None:
+        """
+        sets the tags of a question
+        """
+        new_tags = set(tags)
+        old_tags = self._tags.get(idx, set())
+        for tag in old_tags - new_tags:
+            questions = self._questions[tag]
+            questions.discard(idx)
+            if not questions:
+                del self._questions[tag]
+                del self.sorted_tags[bisect_left(self.sorted_tags, tag)]
+        for tag in new_tags - old_tags:
+            if tag not in self._questions:
+                self._questions[tag] = set()
+                insort(self.sorted_tags, tag)
+            self._questions[tag].add(idx)
+        if new_tags:
+            self._tags[idx] = new_tags
+        else:
+            self._tags.pop(idx, None)
+
+    def questions(self, tags: Iterable[str], match_all: bool = False) -> list[int]:
+        """
+        returns the sorted indexes of the questions that have all (AND) or
+        any (OR) of the tags
+        """
+        sets = [self._questions.get(tag, set()) for tag in tags]
+        if not sets:
+            return []
+        if match_all:
+            # intersect starting from the smallest set
+            sets.sort(key=len)
+            return sorted(set.intersection(*sets))
+        return sorted(set().union(*sets))
+
+
+class TagFilter:
+    """
+    Weighted sampler restricted to the questions that match a tag query,
+    questions that stop matching keep their slot with a weight of 0
+    """
+
+    def __init__(self, tags: list[str], match_all: bool, questions: list[int], weights: list[float]):
+        self.tags = set(tags)
+        self.match_all = match_all
+        self.questions = list(questions)
+        self._positions = {idx: pos for pos, idx in enumerate(self.questions)}
+        self.sampler = WeightedSampler([weights[idx] for idx in self.questions])
+
+    def matches(self, tags: Iterable[str]) -> bool:
+        tags = set(tags)
+        if self.match_all:
+            return self.tags <= tags
+        return not self.tags.isdisjoint(tags)
+
+    def update(self, idx: int, tags: Iterable[str], weight: float) -> None:
+        """
+        updates the weight of a question and whether it is part of the filter
+        """
+        weight = weight if self.matches(tags) else 0
+        pos = self._positions.get(idx)
+        if pos is not None:
+            self.sampler.update(pos, weight)
+        elif weight > 0:
+            self._positions[idx] = len(self.questions)
+            self.questions.append(idx)
+            self.sampler.append(weight)
+
+    def sample(self) -> int | None:
+        """
+        returns a random matching question or None if none matches anymore
+        """
+        if self.sampler.total <= 0:
+            return None
+        pos = self.sampler.sample()
+        # the total can stay slightly positive from rounding once every weight is 0
+        if self.sampler.weights[pos] <= 0:
+            return None
+        return self.questions[pos]
@@ -0,0 +1,113 @@
+"""
+This module contains the thumbnail cache of the image views.
+
+An image view references a frame on disk, eg. one written by
+preprocessing/extract_images.py:
+
+    {"type": "image", "name": "Architecture", "value": "images/<video>/<i>.jpg"}
+
+The frames are 1080p JPEGs of several MB, so a question page only shows a
+downscaled thumbnail. A thumbnail is made once and kept in the cache folder
+under the hash of the content of the frame, JPEGs are decoded at a reduced
+scale (Image.draft) so the full frame is never in memory. Hashing, decoding
+and resizing happen on worker threads, the full resolution file is only read
+when the user expands the image.
+"""
+import base64
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+
+from PIL import Image
+
+from src.question_index import file_hash
+
+THUMBNAIL_DIR = os.environ.get("QUIZ_THUMBNAIL_DIR", ".thumbnails")
+# longest side of a thumbnail in pixels
+THUMBNAIL_SIZE = 640
+THUMBNAIL_WORKERS = 2
+
+
+def make_thumbnail(source: Path, target: Path, size: int) -> None:
+    """
+    writes a JPEG thumbnail of the image whose longest side is at most `size`
+    """
+    with Image.open(source) as image:
+        # lets the JPEG decoder skip to the smallest scale that is still larger than the thumbnail
+        image.draft("RGB", (size, size))
+        image = image.convert("RGB")
+        image.thumbnail((size, size))
+        # two threads may make the same thumbnail, each writes its own file
+        tmp_file = target.with_name(f"{target.name}.{threading.get_ident()}.tmp")
+        image.save(tmp_file, "JPEG", quality=85)
+    os.replace(tmp_file, target)
+
+
+def read_base64(path: Path) -> str:
+    return base64.b64encode(Path(path).read_bytes()).decode("ascii")
+
+
+class ThumbnailCache:
+    """
+    Makes and caches the thumbnails of the image views on worker threads
+    """
+
+    def __init__(self, cache_dir: Path, size: int = THUMBNAIL_SIZE, workers: int = THUMBNAIL_WORKERS):
+        self.cache_dir = Path(cache_dir)
+        self.size = size
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="thumbnails")
+        self._lock = threading.Lock()
+        # (path, modification time, size) of an image -> its thumbnail, so a file is hashed once
+        self._thumbnails: dict[tuple[str, int, int], Path] = {}
+
+    def thumbnail_path(self, source: Path) -> Path:
+        """
+        returns the path of the thumbnail of the image, making it if no
+        thumbnail of the content of the image was made before. It blocks, the
+        UI uses `thumbnail_base64`
+        """
+        source = Path(source)
+        stat = source.stat()
+        key = (str(source.resolve()), stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            target = self._thumbnails.get(key)
+        if target is None:
+            target = self.cache_dir / f"{file_hash(source)}-{self.size}.jpg"
+            if not target.exists():
+                self.cache_dir.mkdir(parents=True, exist_ok=True)
+                make_thumbnail(source, target, self.size)
+            with self._lock:
+                self._thumbnails[key] = target
+        return target
+
+    def thumbnail_base64(self, source: Path) -> Future[str]:
+        """
+        returns the future base64 of the thumbnail of the image
+        """
+        return self._executor.submit(lambda: read_base64(self.thumbnail_path(source)))
+
+    def full_image_base64(self, source: Path) -> Future[str]:
+        """
+        reads the full resolution image on a worker thread
+        """
+        return self._executor.submit(read_base64, source)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_default_cache: ThumbnailCache | None = None
+_default_cache_lock = threading.Lock()
+
+
+def default_cache() -> ThumbnailCache:
+    """
+    returns the thumbnail cache in THUMBNAIL_DIR, every engine shares it as
+    the thumbnails only depend on the content of the images
+    """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ThumbnailCache(Path(THUMBNAIL_DIR))
+        return _default_cache
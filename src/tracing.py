@@ -0,0 +1,141 @@
+"""
+This module contains the opt-in latency tracing of the UI interactions.
+
+Tracing is enabled with the QUIZ_TRACE environment variable (or the --trace
+flag of main.py) set to the trace file: a .json file is written in the Chrome
+trace format (open it in chrome://tracing or ui.perfetto.dev), any other
+file gets one json span per line. The p50/p95/p99 of every span are printed
+on exit. When tracing is off `span` returns a shared no-op context manager.
+"""
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import nullcontext
+from pathlib import Path
+
+TRACE_ENV = "QUIZ_TRACE"
+_NO_SPAN = nullcontext()
+
+
+class Tracer:
+    """
+    Writes the finished spans to the trace file and keeps their durations
+    for the summary
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.chrome_format = self.path.suffix == ".json"
+        self.durations: dict[str, list[float]] = {}
+        self._lock = threading.Lock()
+        self._file = open(self.path, "w", encoding="utf8")
+        self._first = True
+        self._pid = os.getpid()
+        if self.chrome_format:
+            self._file.write("[\n")
+
+    def record(self, name: str, start_ns: int, end_ns: int, args: dict) -> None:
+        duration_us = (end_ns - start_ns) / 1000
+        if self.chrome_format:
+            event = {
+                "name": name, "ph": "X", "ts": start_ns / 1000, "dur": duration_us,
+                "pid": self._pid, "tid": threading.get_ident(), "args": args,
+            }
+        else:
+            event = {
+                "name": name, "start_us": start_ns / 1000, "duration_us": duration_us,
+                "thread": threading.current_thread().name, **args,
+            }
+        line = json.dumps(event, default=str)
+        with self._lock:
+            if self._file.closed:
+                return
+            self.durations.setdefault(name, []).append(duration_us)
+            if self.chrome_format:
+                line = ("" if self._first else ",\n") + line
+                self._first = False
+            else:
+                line += "\n"
+            self._file.write(line)
+
+    def summary(self) -> str:
+        lines = [f"{'span':<40} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"]
+        with self._lock:
+            durations = {name: sorted(values) for name, values in self.durations.items()}
+        for name, values in sorted(durations.items()):
+            p50, p95, p99 = (values[min(len(values) - 1, int(len(values) * q))] / 1000 for q in (0.5, 0.95, 0.99))
+            lines.append(f"{name:<40} {len(values):>7} {p50:>9.2f} {p95:>9.2f} {p99:>9.2f}")
+        return "\n".join(lines)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file.closed:
+                return
+            if self.chrome_format:
+                self._file.write("\n]\n")
+            self._file.close()
+        print(f"Trace written to {self.path}")
+        print(self.summary())
+
+
+class _Span:
+    __slots__ = ("name", "args", "start_ns")
+
+    def __init__(self, name: str, args: dict):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *_):
+        if _tracer is not None:
+            _tracer.record(self.name, self.start_ns, time.perf_counter_ns(), self.args)
+
+
+_tracer: Tracer | None = None
+
+
+def enable(path: Path | str) -> Tracer:
+    """
+    starts writing the spans to `path`, the trace is closed on exit
+    """
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer(Path(path))
+        atexit.register(_tracer.close)
+    return _tracer
+
+
+def span(name: str, **args):
+    """
+    times the body of a with block
+    """
+    if _tracer is None:
+        return _NO_SPAN
+    return _Span(name, args)
+
+
+def traced(name: str | None = None):
+    """
+    decorator that times every call of the function
+    """
+    def decorator(fn):
+        span_name = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _tracer is None:
+                return fn(*args, **kwargs)
+            with _Span(span_name, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+if os.environ.get(TRACE_ENV):
+    enable(os.environ[TRACE_ENV])
@@ -0,0 +1,6 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+# the app and the preprocessing scripts are imported as src.* and preprocessing.*
+sys.path.insert(0, str(ROOT))
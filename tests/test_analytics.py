@@ -0,0 +1,124 @@
+import json
+import random
+
+import pytest
+
+from src.analytics import Analytics
+from src.attempt_history import AttemptHistory
+from src.progress_store import ProgressStore
+from src.question_index import LazyQuestionBank
+from src.sqlite_store import SqliteStore
+from src.storage import JsonStore
+
+
+def bank(count=40, seed=1) -> list[dict]:
+    rng = random.Random(seed)
+    questions = []
+    for i in range(count):
+        history = [rng.random() < 0.6 for _ in range(rng.randrange(0, 14))] if i % 3 else []
+        ques = {
+            "question": f"Question #{i}\n\nWhich one {i}?",
+            "options": ["A", "B", "C"],
+            "answers": [rng.randrange(3)],
+            "tags": rng.sample(["s3", "iam", "vpc"], rng.randrange(0, 3)),
+        }
+        if i % 4:
+            ques["topic"] = rng.choice(["storage", "security"])
+        if history:
+            ques["total_times_question_attempted"] = len(history)
+            ques["correct_times_question_attempted"] = sum(history)
+            ques["current_probability"] = rng.random()
+            ques["attempt_history"] = AttemptHistory(history).to_json()
+        questions.append(ques)
+    return questions
+
+
+def rebuilt(store) -> Analytics:
+    """
+    the aggregates computed from every decoded question
+    """
+    names = ["total_times_question_attempted", "correct_times_question_attempted", "current_probability"]
+    questions = [store.load(idx) for idx in range(len(store))]
+    return Analytics(
+        {name: [ques.get(name, 0) for ques in questions] for name in names},
+        store.tags(),
+        [ques.get("topic") for ques in questions],
+        [AttemptHistory.from_json(ques.get("attempt_history")) for ques in questions],
+    )
+
+
+@pytest.fixture
+def json_store(tmp_path):
+    data = tmp_path / "data.json"
+    data.write_text(json.dumps(bank()))
+    store = JsonStore(data)
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def sqlite_store(tmp_path):
+    store = SqliteStore(tmp_path / "data.db")
+    questions = bank()
+    for ques in questions:
+        ques.pop("attempt_history", None)
+    store.import_questions(questions)
+    for idx, ques in enumerate(bank()):
+        if ques.get("attempt_history"):
+            store.save(idx, ques)
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def progress_store(tmp_path):
+    data = tmp_path / "data.json"
+    questions = bank()
+    data.write_text(json.dumps([
+        {key: value for key, value in ques.items() if key != "attempt_history" and "times" not in key}
+        for ques in questions
+    ]))
+    store = ProgressStore(LazyQuestionBank(data, data.with_suffix(".idx")), tmp_path / "user.db")
+    store.save_many({idx: ques for idx, ques in enumerate(questions) if ques.get("attempt_history")})
+    yield store
+    store.close()
+
+
+@pytest.mark.parametrize("name", ["json_store", "sqlite_store", "progress_store"])
+def test_from_store_matches_a_full_rebuild(name, request, monkeypatch):
+    store = request.getfixturevalue(name)
+    expected = rebuilt(store).summary()
+    answered = {idx for idx, total in enumerate(store.column("total_times_question_attempted")) if total}
+    loaded = []
+    load = store.load
+    monkeypatch.setattr(store, "load", lambda idx: loaded.append(idx) or load(idx))
+    assert Analytics.from_store(store).summary() == expected
+    # only the answered questions may be decoded, for their history
+    assert set(loaded) <= answered
+    assert expected.learning_curve[0][0] == len(answered)
+
+
+def test_incremental_updates_match_a_rebuild(json_store):
+    analytics = Analytics.from_store(json_store)
+    rng = random.Random(2)
+    for _ in range(60):
+        idx = rng.randrange(len(json_store))
+        ques = json_store.load(idx)
+        history = AttemptHistory.from_json(ques.get("attempt_history"))
+        is_correct = rng.random() < 0.5
+        history.append(is_correct)
+        ques.update(
+            total_times_question_attempted=ques["total_times_question_attempted"] + 1,
+            correct_times_question_attempted=ques["correct_times_question_attempted"] + is_correct,
+            current_probability=rng.random(),
+            attempt_history=history.to_json(),
+        )
+        if rng.random() < 0.2:
+            ques["tags"] = rng.sample(["s3", "iam", "vpc", "kms"], rng.randrange(0, 3))
+        json_store.save(idx, ques)
+        analytics.update(idx, ques)
+    summary = analytics.summary()
+    expected = rebuilt(json_store).summary()
+    assert summary.session_attempts == 50
+    summary.session_attempts = summary.session_correct = 0
+    assert summary == expected
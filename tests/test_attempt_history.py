@@ -0,0 +1,59 @@
+import pytest
+
+from src.attempt_history import AttemptHistory
+
+
+def test_json_round_trip():
+    history = AttemptHistory([True, False, True, True], window=0)
+    assert history.to_json() == "4:b"
+    assert AttemptHistory.from_json("4:b", window=0) == history
+    assert AttemptHistory.from_json([True, False, True, True], window=0) == history
+    assert AttemptHistory.from_json(None) == []
+
+
+def test_leading_wrong_attempts_are_kept():
+    history = AttemptHistory([False, False, True], window=0)
+    assert len(history) == 3
+    assert list(AttemptHistory.from_json(history.to_json(), window=0)) == [False, False, True]
+
+
+def test_window_keeps_the_last_attempts():
+    history = AttemptHistory([True] * 3 + [False, True], window=4)
+    assert list(history) == [True, True, False, True]
+    history.append(False)
+    assert list(history) == [True, False, True, False]
+    assert AttemptHistory.from_json("6:3d", window=4) == [True, True, False, True]
+
+
+def test_indexing_and_counts():
+    history = AttemptHistory([True, False, True], window=0)
+    assert history[0] is True
+    assert history[-2] is False
+    assert history[1:] == [False, True]
+    assert history.correct() == 2
+    with pytest.raises(IndexError):
+        history[3]
+
+
+def test_follows_one_more_attempt():
+    previous = AttemptHistory([True, False], window=3)
+    history = previous.copy()
+    history.append(True)
+    assert history.follows(previous)
+    assert not previous.follows(history)
+    history.append(False)
+    previous.append(True)
+    # both are trimmed to the window
+    assert history.follows(previous)
+
+
+def test_packed_is_right_aligned_big_endian():
+    history = AttemptHistory([True, False, False, False, False, False, False, False, True], window=0)
+    assert history.packed(2) == b"\x01\x01"
+    assert AttemptHistory([], window=0).packed(1) == b"\x00"
+
+
+def test_every_attempt_is_kept_by_default():
+    history = AttemptHistory([True] * 300 + [False])
+    assert len(history) == 301
+    assert AttemptHistory.from_json(history.to_json()) == history
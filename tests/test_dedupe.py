@@ -0,0 +1,76 @@
+import json
+
+from preprocessing.dedupe import conflicting_answers, find_duplicates, fold_cluster, fold_duplicates, normalize
+from preprocessing.merge_jsons import merge_into_data_file
+
+TEXT = (
+    "A company stores video files on premises and wants to process them in the cloud "
+    "with the least operational overhead. Which solution meets these requirements?"
+)
+OPTIONS = ["Use Amazon S3 with S3 Lifecycle rules", "Use Amazon EBS volumes", "Use AWS Storage Gateway"]
+
+
+def question(number, text=TEXT, answers=(0,), **fields) -> dict:
+    return {"question": f"Question #{number}\n\n{text}", "options": list(OPTIONS), "answers": list(answers), **fields}
+
+
+def test_normalize_drops_the_number_and_punctuation():
+    assert normalize("Question #12\n\nWhich  one?") == normalize("Q 7 which one") == "whichone"
+
+
+def test_near_duplicates_are_clustered():
+    other = question(3, "A company needs a database that scales to millions of reads per second.")
+    ocr_copy = question(9, TEXT.replace("overhead.", "overhead .").replace("company", "cornpany"))
+    clusters = find_duplicates([question(1), other, ocr_copy])
+    assert [cluster.indexes for cluster in clusters] == [[0, 2]]
+    assert all(score >= 0.8 for _, _, score in clusters[0].scores)
+    assert find_duplicates([]) == []
+
+
+def test_fold_adds_up_the_stats_of_the_copies():
+    first = question(1, total_times_question_attempted=2, correct_times_question_attempted=1,
+                     current_probability=0.5, attempt_history="2:2", tags=["s3"])
+    second = question(2, answers=(), total_times_question_attempted=1, correct_times_question_attempted=1,
+                      current_probability=0.2, attempt_history="1:1", tags=["storage", "s3"])
+    folded = fold_cluster([first, second])
+    assert folded["question"] == first["question"]
+    assert folded["total_times_question_attempted"] == 3
+    assert folded["correct_times_question_attempted"] == 2
+    assert folded["current_probability"] == (0.5 * 2 + 0.2) / 3
+    assert folded["attempt_history"] == "3:5"
+    assert folded["tags"] == ["s3", "storage"]
+
+
+def test_fold_keeps_a_copy_with_a_valid_answer_key():
+    without_key = question(1, answers=(), explination="see the docs")
+    reordered = {**question(2, answers=(0,)), "options": OPTIONS[::-1]}
+    folded = fold_cluster([without_key, reordered])
+    assert folded["options"][folded["answers"][0]] == OPTIONS[2]
+    # a scraped key past the options is never taken
+    assert fold_cluster([without_key, question(2, answers=(5,))])["answers"] == []
+
+
+def test_conflicting_answer_keys_are_reported():
+    assert conflicting_answers([question(1), {**question(2), "options": OPTIONS[::-1], "answers": [2]}]) == []
+    assert conflicting_answers([question(1), question(2, answers=(2,)), question(3, answers=())]) == [
+        [OPTIONS[0]], [OPTIONS[2]],
+    ]
+
+
+def test_fold_duplicates_keeps_the_position_of_the_first_copy():
+    questions = [question(1), {"question": "Question #2\n\nOther", "options": ["A"], "answers": [0]}, question(3)]
+    folded = fold_duplicates(questions, find_duplicates(questions))
+    assert [ques["question"] for ques in folded] == [questions[0]["question"], questions[1]["question"]]
+
+
+def test_merging_twice_changes_nothing_and_reports_conflicts(tmp_path):
+    data = tmp_path / "data.json"
+    data.write_text(json.dumps([question(1)]))
+    # the same question OCR'd from a video, with another answer
+    ocr_copy = question(7, TEXT.replace("company", "cornpany"), answers=(1,))
+    conflicts = merge_into_data_file(data, [ocr_copy])
+    assert [cluster.indexes for cluster in conflicts] == [[0, 1]]
+    first = data.read_text()
+    assert len(json.loads(first)) == 1
+    assert merge_into_data_file(data, [ocr_copy]) == []
+    assert data.read_text() == first
@@ -0,0 +1,101 @@
+import json
+import random
+from collections import Counter
+
+import pytest
+
+from src.exam import Exam, draw_exam
+from src.quiz import QuizEngine
+from src.storage import JsonStore
+
+
+def test_draws_unique_questions_with_a_weight():
+    weights = [1.0, 0.0, 2.0, 0.5, 0.0, 3.0]
+    for seed in range(50):
+        drawn = draw_exam(weights, 3, rng=random.Random(seed))
+        assert len(drawn) == len(set(drawn)) == 3
+        assert not {1, 4} & set(drawn)
+    # asking for more questions than have a weight only draws those
+    assert sorted(draw_exam(weights, 10, rng=random.Random(0))) == [0, 2, 3, 5]
+
+
+def test_quotas_are_met():
+    weights = [1.0] * 20
+    groups = {"tag:s3": [2, 3, 4, 5], "tag:iam": [10, 11]}
+    for seed in range(50):
+        drawn = set(draw_exam(weights, 6, {"tag:s3": 3, "tag:iam": 5}, groups, random.Random(seed)))
+        assert len(drawn & {2, 3, 4, 5}) >= 3
+        # the group is smaller than its quota
+        assert {10, 11} <= drawn
+
+
+def test_first_draw_follows_the_weights():
+    # drawing without replacement picks the first question proportionally to the weights,
+    # so the question drawn alone follows them
+    weights = [1.0, 2.0, 3.0, 4.0]
+    rng = random.Random(5)
+    draws = 20000
+    counts = Counter(draw_exam(weights, 1, rng=rng)[0] for _ in range(draws))
+    for idx, weight in enumerate(weights):
+        assert counts[idx] / draws == pytest.approx(weight / sum(weights), abs=0.015)
+
+
+def test_heavy_questions_are_drawn_more_often():
+    weights = [10.0] * 5 + [1.0] * 45
+    rng = random.Random(6)
+    counts = Counter(idx for _ in range(2000) for idx in draw_exam(weights, 10, rng=rng))
+    heavy = sum(counts[idx] for idx in range(5)) / 5
+    light = sum(counts[idx] for idx in range(5, 50)) / 45
+    assert heavy > 3 * light
+
+
+def test_answers_are_refused_once_the_time_is_up():
+    exam = Exam([], duration=0)
+    assert exam.is_over()
+    with pytest.raises(RuntimeError):
+        exam.answer(0, [1])
+
+
+def test_finishing_an_exam_twice_saves_the_results_once(tmp_path):
+    data = tmp_path / "data.json"
+    data.write_text(json.dumps([
+        {"question": f"Question {i}\nWhich one?", "options": ["A", "B"], "answers": [0]} for i in range(3)
+    ]))
+    engine = QuizEngine(JsonStore(data), render_warmup=0)
+    try:
+        exam = engine.start_exam(size=3)
+        exam.answer(0, [0])
+        exam.answer(1, [1])
+        first = engine.finish_exam(exam)
+        saved = []
+        engine.update_questions_in_file = saved.append
+        second = engine.finish_exam(exam)
+        del engine.update_questions_in_file
+        assert saved == []
+        assert (first.correct, first.graded) == (second.correct, second.graded) == (1, 3)
+        assert [engine.get_question(idx).total_times_question_attempted for idx in range(3)] == [1, 1, 1]
+    finally:
+        engine.close()
+
+
+@pytest.mark.parametrize("scheduler_name", ["probability", "sm2"])
+def test_start_exam_does_not_write_the_queued_updates(tmp_path, scheduler_name):
+    data = tmp_path / "data.json"
+    data.write_text(json.dumps([
+        {"question": f"Question {i}\nWhich one?", "options": ["A", "B"], "answers": [0]} for i in range(5)
+    ]))
+    engine = QuizEngine(JsonStore(data), scheduler_name=scheduler_name, render_warmup=0)
+    try:
+        engine.persister.delay = engine.persister.max_delay = 60
+        question = engine.get_question(3)
+        question.current_probability = 1e6
+        engine.update_question_in_file(question)
+        saves = []
+        engine.store.save_many = lambda batch: saves.append(batch)
+        exam = engine.start_exam(size=1)
+        assert saves == []
+        # the queued probability is drawn from
+        assert [question.index for question in exam.questions] == [3]
+    finally:
+        del engine.store.save_many
+        engine.close()
@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from preprocessing import extract_text
+from preprocessing.extract_text import OcrEngine, Preprocess, StubEngine, extract_text_from_images
+
+
+class FailingEngine(OcrEngine):
+    """
+    same cache key as the stub, fails if a frame is OCR'd at all
+    """
+
+    name = StubEngine.name
+
+    def image_to_string(self, img) -> str:
+        raise AssertionError("the frame should have come from the cache")
+
+
+@pytest.fixture
+def frames(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(extract_text, "CACHE_FOLDER", tmp_path / "questions" / ".ocr_cache")
+    folder = tmp_path / "images" / "video"
+    folder.mkdir(parents=True)
+    rng = np.random.default_rng(0)
+    for i in range(10):
+        Image.fromarray(rng.integers(0, 255, (48, 64, 3), dtype=np.uint8)).save(folder / f"{i}.jpg")
+    return folder
+
+
+def read_texts(tmp_path) -> dict[str, str]:
+    return {file.name: file.read_text() for file in sorted((tmp_path / "questions" / "video").glob("*.txt"))}
+
+
+def test_stub_engine_is_deterministic(frames, tmp_path):
+    extract_text_from_images("video", StubEngine(), workers=1)
+    first = read_texts(tmp_path)
+    assert len(first) == 10
+    assert len(set(first.values())) == 10
+    assert all(text.startswith("64x48 ") for text in first.values())
+
+
+def test_unchanged_frames_are_cached(frames, tmp_path):
+    extract_text_from_images("video", StubEngine(), workers=1)
+    first = read_texts(tmp_path)
+    extract_text_from_images("video", FailingEngine(), workers=1)
+    assert read_texts(tmp_path) == first
+
+
+def test_changed_frame_is_ocrd_again(frames, tmp_path):
+    extract_text_from_images("video", StubEngine(), workers=1)
+    first = read_texts(tmp_path)
+    Image.fromarray(np.zeros((48, 64, 3), dtype=np.uint8)).save(frames / "3.jpg")
+    extract_text_from_images("video", StubEngine(), workers=1)
+    second = read_texts(tmp_path)
+    assert second["3.txt"] != first["3.txt"]
+    assert {name: text for name, text in second.items() if name != "3.txt"} == {
+        name: text for name, text in first.items() if name != "3.txt"
+    }
+
+
+def test_preprocess_change_invalidates_the_cache(frames, tmp_path):
+    extract_text_from_images("video", StubEngine(), workers=1)
+    with pytest.raises(AssertionError):
+        extract_text_from_images("video", FailingEngine(), Preprocess(crop=(0, 0, 32, 24)), workers=1)
+    extract_text_from_images("video", StubEngine(), Preprocess(crop=(0, 0, 32, 24)), workers=1)
+    assert all(text.startswith("32x24 ") for text in read_texts(tmp_path).values())
+
+
+def test_pool_matches_in_process_run(frames, tmp_path):
+    extract_text_from_images("video", StubEngine(), workers=1)
+    in_process = read_texts(tmp_path)
+    extract_text.CACHE_FOLDER = tmp_path / "other_cache"
+    extract_text_from_images("video", StubEngine(), workers=2)
+    assert read_texts(tmp_path) == in_process
+
+
+def test_failed_pool_falls_back_to_the_process(frames, tmp_path, monkeypatch):
+    class NoProcesses:
+        def __init__(self, *args, **kwargs):
+            raise OSError("no processes")
+
+    monkeypatch.setattr(extract_text, "ProcessPoolExecutor", NoProcesses)
+    extract_text_from_images("video", StubEngine(), workers=4)
+    assert len(read_texts(tmp_path)) == 10
@@ -0,0 +1,98 @@
+import json
+
+from src.journal import Journal, apply_record, diff_records
+
+
+def question(**fields) -> dict:
+    return {
+        "question": "Question 1\nWhich service?",
+        "options": ["S3", "EC2"],
+        "answers": [0],
+        "tags": [],
+        "total_times_question_attempted": 0,
+        "correct_times_question_attempted": 0,
+        "current_probability": 0,
+        "attempt_history": "0:0",
+        **fields,
+    }
+
+
+def answered(ques: dict, is_correct: bool) -> dict:
+    total = ques["total_times_question_attempted"] + 1
+    correct = ques["correct_times_question_attempted"] + is_correct
+    length, _, bits = ques["attempt_history"].partition(":")
+    return {
+        **ques,
+        "total_times_question_attempted": total,
+        "correct_times_question_attempted": correct,
+        "current_probability": 1 - correct / total,
+        "attempt_history": f"{int(length) + 1}:{(int(bits, 16) << 1) | is_correct:x}",
+    }
+
+
+def test_answer_is_one_attempt_record():
+    old = question()
+    new = answered(old, True)
+    records = diff_records(0, old, new)
+    assert [record["op"] for record in records] == ["attempt"]
+    questions = [old]
+    apply_record(questions, records[0])
+    assert questions[0] == new
+
+
+def test_records_round_trip_tags_answers_and_fields():
+    old = question(tags=["s3", "iam"])
+    new = {**old, "tags": ["iam", "vpc"], "answers": [1], "explination": "because"}
+    questions = [old]
+    for record in diff_records(0, old, new):
+        apply_record(questions, record)
+    assert questions[0] == new
+
+
+def test_replaying_compacted_records_is_harmless():
+    old = question()
+    new = answered(answered(old, True), False)
+    records = diff_records(0, old, answered(old, True)) + diff_records(0, answered(old, True), new)
+    questions = [old]
+    for record in records + records:
+        apply_record(questions, record)
+    assert questions[0] == new
+
+
+def test_replay_drops_a_partial_trailing_record(tmp_path):
+    path = tmp_path / "data.journal"
+    records = [{"op": "tag_add", "index": 0, "tag": f"t{i}"} for i in range(3)]
+    path.write_bytes(b"".join(json.dumps(record).encode() + b"\n" for record in records) + b'{"op": "ta')
+    journal = Journal(path, lambda snapshot: None)
+    assert list(journal.replay()) == records
+    journal.close()
+    assert path.read_bytes().endswith(b"\n")
+    assert len(path.read_bytes().splitlines()) == 3
+
+
+def test_compaction_writes_the_snapshot_and_empties_the_journal(tmp_path):
+    written = []
+    journal = Journal(tmp_path / "data.journal", written.append)
+    journal.append([{"op": "tag_add", "index": 0, "tag": "s3"}, {"op": "tag_add", "index": 1, "tag": "iam"}])
+    assert journal.pending == 2
+    journal.compact(lambda: "snapshot", background=False)
+    assert written == ["snapshot"]
+    assert journal.pending == 0
+    assert (tmp_path / "data.journal").read_bytes() == b""
+    journal.close()
+
+
+def test_compaction_keeps_the_records_appended_while_writing(tmp_path):
+    journal = None
+    late = {"op": "tag_add", "index": 2, "tag": "late"}
+
+    def write_snapshot(snapshot):
+        # an answer saved while the data file is being written
+        journal.append([late])
+
+    journal = Journal(tmp_path / "data.journal", write_snapshot)
+    journal.append([{"op": "tag_add", "index": 0, "tag": "s3"}])
+    journal.compact(lambda: None, background=False)
+    assert journal.pending == 1
+    journal.close()
+    assert [json.loads(line) for line in (tmp_path / "data.journal").read_bytes().splitlines()] == [late]
@@ -0,0 +1,88 @@
+import threading
+import time
+
+import pytest
+
+from src.persister import WriteBehindPersister
+
+
+class RecordingStore:
+    def __init__(self, failures: int = 0):
+        self.batches: list[dict[int, dict]] = []
+        self.failures = failures
+        self.written = threading.Event()
+
+    def save_many(self, questions: dict[int, dict]) -> None:
+        if self.failures:
+            self.failures -= 1
+            raise OSError("disk full")
+        self.batches.append(dict(questions))
+        self.written.set()
+
+
+def test_updates_are_coalesced_into_one_batch():
+    store = RecordingStore()
+    persister = WriteBehindPersister(store, delay=0.05, max_delay=1.0)
+    first, second = {"v": 1}, {"v": 2}
+    persister.submit(0, first)
+    persister.submit_many({0: second, 1: {"v": 3}})
+    assert persister.pending(0) is second
+    assert persister.pending_questions() == {0: second, 1: {"v": 3}}
+    assert store.written.wait(2)
+    assert store.batches == [{0: second, 1: {"v": 3}}]
+    assert persister.pending(0) is None
+    persister.close()
+
+
+def test_a_burst_is_written_after_max_delay():
+    store = RecordingStore()
+    persister = WriteBehindPersister(store, delay=0.1, max_delay=0.25)
+    start = time.monotonic()
+    while not store.written.is_set() and time.monotonic() - start < 2:
+        persister.submit(0, {"at": time.monotonic()})
+        time.sleep(0.02)
+    assert store.written.is_set()
+    assert time.monotonic() - start < 1
+    persister.close()
+
+
+def test_flush_writes_on_the_calling_thread_and_close_flushes():
+    store = RecordingStore()
+    persister = WriteBehindPersister(store, delay=60, max_delay=60)
+    persister.submit(0, {"v": 1})
+    persister.flush()
+    assert store.batches == [{0: {"v": 1}}]
+    persister.submit(1, {"v": 2})
+    persister.close()
+    assert store.batches[-1] == {1: {"v": 2}}
+    with pytest.raises(RuntimeError):
+        persister.submit(2, {})
+
+
+def test_a_failed_write_is_retried_with_the_next_batch(capsys):
+    store = RecordingStore(failures=1)
+    persister = WriteBehindPersister(store, delay=0.02, max_delay=0.05)
+    persister.submit(0, {"v": 1})
+    assert store.written.wait(2)
+    assert store.batches == [{0: {"v": 1}}]
+    assert "disk full" in capsys.readouterr().err
+    persister.close()
+
+
+def test_an_update_queued_while_writing_stays_pending():
+    persister = None
+    newer = {"v": 2}
+
+    class SlowStore(RecordingStore):
+        def save_many(self, questions):
+            if not self.batches:
+                persister.submit(0, newer)
+            super().save_many(questions)
+
+    store = SlowStore()
+    persister = WriteBehindPersister(store, delay=60, max_delay=60)
+    persister.submit(0, {"v": 1})
+    persister.flush()
+    assert persister.pending(0) is newer
+    persister.close()
+    assert store.batches == [{0: {"v": 1}}, {0: newer}]
@@ -0,0 +1,80 @@
+import threading
+
+import pytest
+
+from preprocessing.pipeline import Pipeline, Stage
+
+
+def copy_stage(name, source, target, runs, deps=(), params=None) -> Stage:
+    def run():
+        runs.append(name)
+        target.write_text(source.read_text().upper())
+
+    return Stage(name, run, inputs=lambda: [source], outputs=lambda: [target], params=params, deps=list(deps))
+
+
+@pytest.fixture
+def files(tmp_path):
+    source = tmp_path / "source.txt"
+    source.write_text("question")
+    return tmp_path / "manifest.json", source, tmp_path / "upper.txt", tmp_path / "final.txt"
+
+
+def build(files, runs, params=None) -> Pipeline:
+    manifest, source, upper, final = files
+    pipeline = Pipeline(manifest)
+    pipeline.add(copy_stage("upper", source, upper, runs, params=params))
+    pipeline.add(copy_stage("final", upper, final, runs, deps=["upper"]))
+    return pipeline
+
+
+def test_stages_run_once_and_are_skipped_until_an_input_changes(files):
+    _, source, _, final = files
+    runs = []
+    assert build(files, runs).run() == {"upper": "ran", "final": "ran"}
+    assert final.read_text() == "QUESTION"
+    # a new pipeline over the same manifest, as on the next start
+    assert build(files, runs).run() == {"upper": "skipped", "final": "skipped"}
+    assert runs == ["upper", "final"]
+
+    source.write_text("answer")
+    assert build(files, runs).run() == {"upper": "ran", "final": "ran"}
+    assert final.read_text() == "ANSWER"
+
+
+def test_a_stage_reruns_when_its_params_change_or_its_output_is_missing(files):
+    *_, final = files
+    runs = []
+    build(files, runs, params="v1").run()
+    runs.clear()
+    assert build(files, runs, params="v2").run()["upper"] == "ran"
+    # the output of "upper" did not change, so "final" is up to date
+    assert runs == ["upper"]
+    final.unlink()
+    assert build(files, runs, params="v2").run() == {"upper": "skipped", "final": "ran"}
+
+
+def test_a_failed_stage_blocks_its_dependents_and_is_retried(files, capsys):
+    manifest, source, *_ = files
+    pipeline = Pipeline(manifest)
+    pipeline.add(Stage("broken", lambda: 1 / 0, inputs=lambda: [source]))
+    pipeline.add(Stage("after", lambda: None, deps=["broken"]))
+    pipeline.add(Stage("independent", lambda: None))
+    assert pipeline.run() == {"broken": "failed", "after": "blocked", "independent": "ran"}
+    assert "ZeroDivisionError" in capsys.readouterr().err
+    pipeline.stages["broken"].run = lambda: None
+    assert pipeline.run()["broken"] == "ran"
+
+
+def test_independent_stages_run_concurrently(files):
+    manifest, *_ = files
+    both_started = threading.Barrier(2, timeout=2)
+    pipeline = Pipeline(manifest)
+    pipeline.add(Stage("first", both_started.wait))
+    pipeline.add(Stage("second", both_started.wait))
+    assert pipeline.run(jobs=2) == {"first": "ran", "second": "ran"}
+
+
+def test_unknown_dependencies_are_rejected(files):
+    with pytest.raises(ValueError):
+        Pipeline(files[0]).add(Stage("orphan", lambda: None, deps=["missing"]))
@@ -0,0 +1,61 @@
+import json
+
+from src.progress_store import ProgressStore
+from src.question_index import LazyQuestionBank
+
+
+def write_bank(path, questions):
+    path.write_text(json.dumps([
+        {"question": f"Question #{number}\n\n{text}", "options": ["A", "B"], "answers": [0]}
+        for number, text in questions
+    ]))
+
+
+def open_store(tmp_path):
+    data = tmp_path / "data.json"
+    return ProgressStore(LazyQuestionBank(data, data.with_suffix(".idx")), tmp_path / "user.db")
+
+
+def answer(store, idx, tags):
+    ques = store.load(idx)
+    store.save(idx, {**ques, "total_times_question_attempted": 1, "current_probability": 0.5, "tags": tags})
+
+
+def test_progress_follows_its_question_when_the_bank_is_reordered(tmp_path):
+    write_bank(tmp_path / "data.json", [(1, "first"), (2, "second"), (3, "third")])
+    store = open_store(tmp_path)
+    answer(store, 0, ["s3"])
+    store.save_stats({2: {"ease": 2.5}})
+    store.close()
+
+    # sorted and renumbered
+    write_bank(tmp_path / "data.json", [(1, "third"), (2, "first"), (3, "second")])
+    store = open_store(tmp_path)
+    assert store.load(1)["total_times_question_attempted"] == 1
+    assert store.load(1)["tags"] == ["s3"]
+    assert store.column("ease") == [2.5, 0, 0]
+    assert store.load(2)["total_times_question_attempted"] == 0
+    store.close()
+
+
+def test_progress_of_a_removed_question_is_kept_aside(tmp_path):
+    write_bank(tmp_path / "data.json", [(1, "first"), (2, "second")])
+    store = open_store(tmp_path)
+    answer(store, 1, [])
+    store.close()
+
+    write_bank(tmp_path / "data.json", [(1, "first"), (3, "third")])
+    store = open_store(tmp_path)
+    assert store.column("total_times_question_attempted") == [0, 0]
+    assert store._conn.execute("SELECT COUNT(*) FROM unmatched_progress").fetchone()[0] == 1
+    store.close()
+
+
+def test_reopening_the_same_bank_keeps_the_rows(tmp_path):
+    write_bank(tmp_path / "data.json", [(1, "same"), (2, "same")])
+    store = open_store(tmp_path)
+    answer(store, 1, ["iam"])
+    store.close()
+    store = open_store(tmp_path)
+    assert store.tags() == {1: ["iam"]}
+    store.close()
@@ -0,0 +1,125 @@
+import json
+import os
+import threading
+
+import pytest
+
+from src import question_index
+from src.question_index import LazyQuestionBank, file_hash, scan_offsets
+
+QUESTIONS = [
+    {"question": "Question 1\nWhich région?", "options": ["A"], "answers": [0], "tags": ["s3"], "topic": "storage"},
+    {"question": "Question 2\nWhich one?", "options": ["B", "C"], "answers": [1]},
+    {"question": "Question 3\n✓ done?", "options": ["D"], "answers": [0], "tags": ["iam", "vpc"]},
+]
+
+
+@pytest.fixture
+def data(tmp_path):
+    path = tmp_path / "data.json"
+    path.write_text(json.dumps(QUESTIONS, indent=4, ensure_ascii=False), encoding="utf-8")
+    return path
+
+
+def open_bank(path, **kwargs) -> LazyQuestionBank:
+    return LazyQuestionBank(path, path.with_suffix(".idx"), **kwargs)
+
+
+def test_scan_offsets_finds_every_object_of_a_non_ascii_file(data):
+    raw = data.read_bytes()
+    offsets, tags, topics = scan_offsets(raw)
+    assert [json.loads(raw[offsets[2 * i]:offsets[2 * i + 1]]) for i in range(3)] == QUESTIONS
+    assert tags == {0: ["s3"], 2: ["iam", "vpc"]}
+    assert topics == {0: "storage"}
+
+
+def test_questions_are_decoded_on_demand(data):
+    bank = open_bank(data, cache_size=1)
+    assert len(bank) == 3
+    assert [bank[i] for i in range(3)] == QUESTIONS
+    assert len(bank._cache) == 1
+    with pytest.raises(IndexError):
+        bank[3]
+    assert bank.data_hash == file_hash(data)
+    bank.close()
+
+
+def test_the_index_is_reused_until_the_file_changes(data, monkeypatch):
+    open_bank(data).close()
+    scans = []
+    scan = question_index.scan_offsets
+    monkeypatch.setattr(question_index, "scan_offsets", lambda raw: scans.append(1) or scan(raw))
+    bank = open_bank(data)
+    assert scans == []
+    assert bank.tags() == {0: ["s3"], 2: ["iam", "vpc"]}
+    bank.close()
+
+    # a touched file with the same content keeps the index
+    os.utime(data, ns=(0, 0))
+    open_bank(data).close()
+    assert scans == []
+
+    data.write_text(json.dumps(QUESTIONS[:2]))
+    bank = open_bank(data)
+    assert scans == [1]
+    assert len(bank) == 2
+    bank.close()
+
+
+def test_write_folds_the_overlay_into_the_file(data):
+    bank = open_bank(data)
+    edited = {**QUESTIONS[1], "tags": ["kms"], "topic": "security"}
+    bank[1] = edited
+    assert bank[1] == edited
+    assert bank.tags()[1] == ["kms"]
+    bank.write(bank.snapshot(), lambda idx, ques: {**ques, "total_times_question_attempted": 1})
+    assert bank.snapshot() == {}
+    assert json.loads(data.read_text(encoding="utf-8")) == [
+        QUESTIONS[0], {**edited, "total_times_question_attempted": 1}, QUESTIONS[2],
+    ]
+    # the untouched questions are copied byte for byte
+    assert '"Question 1\\nWhich région?"' in data.read_text(encoding="utf-8")
+    assert bank.data_hash == file_hash(data)
+    bank.close()
+
+    bank = open_bank(data)
+    assert bank[1]["topic"] == "security"
+    assert bank.topics() == {0: "storage", 1: "security"}
+    bank.close()
+
+
+def test_a_question_updated_while_writing_stays_in_the_overlay(data):
+    bank = open_bank(data)
+    bank[0] = {**QUESTIONS[0], "tags": []}
+    snapshot = bank.snapshot()
+    newer = {**QUESTIONS[0], "tags": ["late"]}
+
+    def patch(idx, ques):
+        bank[0] = newer
+        return ques
+
+    bank.write(snapshot, patch)
+    assert bank.snapshot() == {0: newer}
+    assert json.loads(data.read_text(encoding="utf-8"))[0]["tags"] == []
+    bank.close()
+
+
+def test_tags_can_be_edited_while_the_bank_is_written(data):
+    bank = open_bank(data)
+    stop = threading.Event()
+
+    def edit():
+        i = 0
+        while not stop.is_set():
+            bank[2] = {**QUESTIONS[2], "tags": [f"t{i}"]}
+            i += 1
+
+    editor = threading.Thread(target=edit)
+    editor.start()
+    try:
+        for _ in range(20):
+            bank.write(bank.snapshot(), lambda idx, ques: ques)
+    finally:
+        stop.set()
+        editor.join()
+    bank.close()
@@ -0,0 +1,52 @@
+import json
+import time
+
+from src import quiz
+from src.analytics import Analytics
+from src.quiz import QuizEngine
+from src.search import SearchIndex
+from src.storage import JsonStore
+
+
+def write_bank(path, count=5):
+    path.write_text(json.dumps([
+        {"question": f"Question {i}\nWhich storage class {i}?", "options": ["A", "B"], "answers": [0]}
+        for i in range(count)
+    ]))
+
+
+def test_close_waits_for_the_background_work(tmp_path, monkeypatch):
+    data = tmp_path / "data.json"
+    write_bank(data)
+    build = SearchIndex.build.__func__
+    from_store = Analytics.from_store.__func__
+
+    def slow_build(cls, docs):
+        time.sleep(0.2)
+        return build(cls, docs)
+
+    def slow_from_store(cls, store):
+        time.sleep(0.2)
+        return from_store(cls, store)
+
+    monkeypatch.setattr(SearchIndex, "build", classmethod(slow_build))
+    monkeypatch.setattr(Analytics, "from_store", classmethod(slow_from_store))
+    engine = QuizEngine(JsonStore(data), data, render_warmup=0)
+    engine.close()
+    assert engine._search_index.exception() is None
+    assert SearchIndex.load(data.with_suffix(".search"), quiz.file_hash(data)) is not None
+
+
+def test_close_skips_a_failed_search_index(tmp_path, monkeypatch):
+    data = tmp_path / "data.json"
+    write_bank(data)
+
+    def failing_build(cls, docs):
+        raise OSError("no space left")
+
+    monkeypatch.setattr(SearchIndex, "build", classmethod(failing_build))
+    engine = QuizEngine(JsonStore(data), data, render_warmup=0)
+    # the data file is rewritten on close, so the index would be cached again
+    engine.update_question_in_file(quiz.update_probability(engine.get_question(0), True))
+    engine.close()
+    assert not data.with_suffix(".search").exists()
@@ -0,0 +1,104 @@
+import json
+from dataclasses import replace
+
+from src import render_cache
+from src.quiz import Question, QuizEngine, View
+from src.render_cache import RenderCache, content_changed, render_question
+from src.storage import JsonStore
+
+
+def make_question(idx: int, text: str = "Q1\nWhich  storage\n class?", views: list[View] | None = None) -> Question:
+    return Question(idx, text, [0], ["A", "B"], 0, 0, 0.5, views=views or [])
+
+
+def count_renders(monkeypatch) -> list[int]:
+    rendered = []
+
+    def counting(question):
+        rendered.append(question.index)
+        return render_question(question)
+
+    monkeypatch.setattr(render_cache, "render_question", counting)
+    return rendered
+
+
+def test_render_question_collapses_the_body_and_renders_json_views():
+    views = [View("json", "Policy", {"Effect": "Allow"}), View("image", "Diagram", "diagram.png")]
+    rendered = render_question(make_question(0, views=views))
+    assert rendered.header == "Q1"
+    assert rendered.body == "Which storage class?"
+    assert rendered.views[0] == f"### Policy\n```json\n{json.dumps({'Effect': 'Allow'}, indent=4)}\n```\n"
+    assert rendered.views[1] is None
+
+
+def test_a_question_is_rendered_once_until_it_is_evicted(monkeypatch):
+    rendered = count_renders(monkeypatch)
+    cache = RenderCache(size=2)
+    first, second, third = (make_question(idx) for idx in range(3))
+    assert cache.get(first) is cache.get(first)
+    cache.get(second)
+    # the first question was used last, the second one is evicted
+    cache.get(first)
+    cache.get(third)
+    assert len(cache) == 2
+    assert cache.contains(0) and not cache.contains(1) and cache.contains(2)
+    cache.get(second)
+    assert rendered == [0, 1, 2, 1]
+
+
+def test_invalidate_rerenders_the_edited_question(monkeypatch):
+    rendered = count_renders(monkeypatch)
+    cache = RenderCache()
+    question = make_question(0)
+    old = cache.get(question)
+    cache.invalidate(0)
+    assert not cache.contains(0)
+    edited = replace(question, question="Q1\nWhich region?")
+    assert cache.get(edited).body == "Which region?"
+    assert old.body == "Which storage class?"
+    assert rendered == [0, 0]
+
+
+def test_a_render_started_before_an_edit_is_not_returned_after_it(monkeypatch):
+    cache = RenderCache()
+    question = make_question(0)
+
+    def edited_while_rendering(question):
+        # the edit lands after the lookup missed and before the render is stored
+        cache.invalidate(question.index)
+        return render_question(question)
+
+    monkeypatch.setattr(render_cache, "render_question", edited_while_rendering)
+    stale = cache.get(question)
+    monkeypatch.setattr(render_cache, "render_question", render_question)
+    assert not cache.contains(0)
+    assert cache.get(replace(question, question="Q1\nWhich region?")) is not stale
+
+
+def test_content_changed_only_looks_at_the_rendered_fields():
+    old = {"question": "Q1", "views": [], "total_times_question_attempted": 0}
+    assert not content_changed(old, {**old, "total_times_question_attempted": 1})
+    assert content_changed(old, {**old, "question": "Q2"})
+    assert content_changed(old, {**old, "views": [{"type": "json", "name": "Policy", "value": {}}]})
+
+
+def test_the_engine_keeps_the_render_of_answered_questions_and_drops_edited_ones(tmp_path):
+    data = tmp_path / "data.json"
+    data.write_text(json.dumps([
+        {"question": f"Q{i}\nWhich storage class {i}?", "options": ["A", "B"], "answers": [0]} for i in range(3)
+    ]))
+    engine = QuizEngine(JsonStore(data), data, render_warmup=0)
+    try:
+        question = engine.get_question(0)
+        rendered = engine.render(question)
+        question.total_times_question_attempted += 1
+        engine.update_question_in_file(question)
+        assert engine.render(engine.get_question(0)) is rendered
+
+        question = engine.get_question(0)
+        question.question = "Q0\nWhich region?"
+        engine.update_question_in_file(question)
+        assert not engine.render_cache.contains(0)
+        assert engine.render(engine.get_question(0)).body == "Which region?"
+    finally:
+        engine.close()
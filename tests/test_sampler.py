@@ -0,0 +1,63 @@
+import random
+from collections import Counter
+
+import pytest
+
+from src.sampler import WeightedSampler
+
+
+def prefix_sums(sampler: WeightedSampler) -> list[float]:
+    return [sampler._prefix_sum(i) for i in range(len(sampler) + 1)]
+
+
+def expected_sums(weights: list[float]) -> list[float]:
+    sums = [0.0]
+    for weight in weights:
+        sums.append(sums[-1] + weight)
+    return sums
+
+
+def test_prefix_sums_follow_updates_and_appends():
+    rng = random.Random(1)
+    weights = [rng.random() for _ in range(37)]
+    sampler = WeightedSampler(weights)
+    for _ in range(200):
+        if rng.random() < 0.2:
+            weights.append(rng.random())
+            sampler.append(weights[-1])
+        else:
+            idx = rng.randrange(len(weights))
+            weights[idx] = rng.random()
+            sampler.update(idx, weights[idx])
+        assert sampler.total == pytest.approx(sum(weights))
+    assert prefix_sums(sampler) == pytest.approx(expected_sums(weights))
+
+
+def test_zero_weights_are_never_drawn():
+    sampler = WeightedSampler([0.0, 1.0, 0.0, 2.0, 0.0])
+    rng = random.Random(2)
+    assert {sampler.sample(rng) for _ in range(2000)} == {1, 3}
+    sampler.update(3, 0.0)
+    assert {sampler.sample(rng) for _ in range(200)} == {1}
+
+
+def test_all_zero_weights_draw_uniformly():
+    sampler = WeightedSampler([0.0, 0.0, 0.0])
+    rng = random.Random(3)
+    assert {sampler.sample(rng) for _ in range(200)} == {0, 1, 2}
+
+
+def test_empty_sampler_raises():
+    with pytest.raises(IndexError):
+        WeightedSampler([]).sample()
+
+
+def test_draws_follow_the_weights():
+    sampler = WeightedSampler([1.0, 1.0, 1.0, 1.0])
+    sampler.update(0, 5.0)
+    sampler.append(3.0)
+    rng = random.Random(4)
+    draws = 40000
+    counts = Counter(sampler.sample(rng) for _ in range(draws))
+    for idx, weight in enumerate(sampler.weights):
+        assert counts[idx] / draws == pytest.approx(weight / sampler.total, abs=0.01)
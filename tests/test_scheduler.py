@@ -0,0 +1,121 @@
+import json
+
+import pytest
+
+from src import scheduler
+from src.scheduler import (
+    DAY, DEFAULT_EASE, DRAWN_DELAY, MAX_INTERVAL_DAYS, MIN_EASE, RELEARN_DELAY,
+    ReviewState, SM2Scheduler, migrate, review, state_from_history,
+)
+from src.storage import JsonStore
+
+NOW = 1_000_000.0
+
+
+def test_correct_answers_grow_the_interval():
+    state = ReviewState()
+    intervals, eases = [], []
+    for _ in range(4):
+        eases.append(state.ease)
+        state = review(state, True, NOW)
+        intervals.append(state.interval_days)
+    assert intervals[:2] == [1.0, 6.0]
+    # the interval is multiplied by the ease before the answer
+    assert intervals[2] == pytest.approx(6.0 * eases[2])
+    assert intervals[3] == pytest.approx(intervals[2] * eases[3])
+    assert eases[3] > eases[2] > DEFAULT_EASE
+    assert state.due_at == pytest.approx(NOW + intervals[3] * DAY)
+    assert state.repetitions == 4
+
+
+def test_interval_is_capped():
+    state = review(ReviewState(DEFAULT_EASE, 300.0, NOW, 5), True, NOW)
+    assert state.interval_days == MAX_INTERVAL_DAYS
+
+
+def test_wrong_answer_relearns():
+    state = review(ReviewState(DEFAULT_EASE, 30.0, NOW, 4), False, NOW)
+    assert state.interval_days == 0.0
+    assert state.repetitions == 0
+    assert state.due_at == NOW + RELEARN_DELAY
+    assert state.ease < DEFAULT_EASE
+
+
+def test_ease_has_a_floor():
+    state = ReviewState()
+    for _ in range(20):
+        state = review(state, False, NOW)
+    assert state.ease == MIN_EASE
+
+
+def test_state_from_history_replays_review():
+    history = [True, True, False, True, True, True]
+    state = ReviewState()
+    for is_correct in history:
+        state = review(state, is_correct, NOW)
+    assert state_from_history(history, NOW) == pytest.approx(state)
+    assert state_from_history([], NOW) == ReviewState()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [NOW]
+    monkeypatch.setattr(scheduler.time, "time", lambda: now[0])
+    return now
+
+
+def test_due_questions_come_before_new_and_later_ones(clock):
+    # 0 and 3 are due (3 first), 1 and 4 are new, 2 is due tomorrow
+    sm2 = SM2Scheduler([NOW - 10, 0, NOW + DAY, NOW - 20, 0])
+    assert [sm2.next() for _ in range(4)] == [3, 0, 1, 4]
+    # the drawn questions are due within the minute, before the one due tomorrow
+    assert sm2.next() in (0, 3)
+
+
+def test_drawn_question_is_held_back_until_answered(clock):
+    sm2 = SM2Scheduler([NOW - 10, NOW - 5])
+    assert sm2.next() == 0
+    assert sm2.next() == 1
+    # nothing is due, the one drawn first comes back first
+    assert sm2.next() == 0
+    assert sm2.due_at[0] == NOW + 2 * DRAWN_DELAY
+
+
+def test_answer_reschedules_and_tag_edit_keeps_the_delay(clock):
+    sm2 = SM2Scheduler([NOW - 10, NOW - 5])
+    assert sm2.next() == 0
+    sm2.update(0, {"due_at": NOW - 10, "tags": ["s3"]})
+    assert sm2.next() == 1
+    sm2.update(1, {"due_at": NOW - 1, "tags": []})
+    assert sm2.next() == 1
+
+
+def test_filter_only_draws_matching_questions(clock):
+    sm2 = SM2Scheduler([NOW - 30, NOW - 20, NOW - 10])
+    sm2.set_filter(["s3"], False, [1, 2])
+    assert sm2.next() == 1
+    # 2 leaves the filter and 0 joins it
+    sm2.update(2, {"due_at": NOW - 10, "tags": []})
+    sm2.update(0, {"due_at": NOW - 30, "tags": ["s3"]})
+    assert sm2.next() == 0
+    # without the filter the question that left it is the only one due
+    sm2.set_filter([], False, [])
+    assert sm2.next() == 2
+
+
+def test_migrated_state_reaches_the_data_file(tmp_path):
+    data = tmp_path / "data.json"
+    data.write_text(json.dumps([
+        {"question": f"Question {i}", "options": ["A", "B"], "answers": [0], "attempt_history": [True, True]}
+        for i in range(3)
+    ]))
+    store = JsonStore(data)
+    assert migrate(store, NOW) == 3
+    assert store.journal.pending == 0
+    store.close()
+    # the stats are seeded from the data file again, eg. after a merge
+    data.with_suffix(".stats").unlink()
+    store = JsonStore(data)
+    assert store.column("interval_days") == [6.0] * 3
+    assert migrate(store, NOW) == 0
+    store.close()
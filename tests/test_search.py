@@ -0,0 +1,81 @@
+import math
+
+import pytest
+
+from src.search import SearchIndex, question_text, tokenize
+
+DOCS = {
+    0: "Which S3 storage class is the cheapest for archives? Glacier Deep Archive",
+    1: "Which service runs containers without servers? Fargate",
+    2: "Which S3 feature replicates objects across regions? Cross-Region Replication",
+    3: "Which database is serverless? Aurora Serverless",
+    4: "Which service caches content at the edge? CloudFront",
+    5: "Which storage is attached to an instance? EBS",
+}
+
+
+def bm25(docs: dict[int, str], query: str) -> dict[int, float]:
+    """
+    BM25 computed from scratch over every question
+    """
+    tokens = {idx: tokenize(text) for idx, text in docs.items()}
+    avg_length = sum(len(doc) for doc in tokens.values()) / len(tokens)
+    scores = {}
+    for term in set(tokenize(query)):
+        having = [idx for idx, doc in tokens.items() if term in doc]
+        if not having:
+            continue
+        idf = math.log(1 + (len(docs) - len(having) + 0.5) / (len(having) + 0.5))
+        for idx in having:
+            freq = tokens[idx].count(term)
+            norm = SearchIndex.K1 * (1 - SearchIndex.B + SearchIndex.B * len(tokens[idx]) / avg_length)
+            scores[idx] = scores.get(idx, 0.0) + idf * freq * (SearchIndex.K1 + 1) / (freq + norm)
+    return scores
+
+
+def test_ranking_matches_bm25():
+    index = SearchIndex.build(DOCS.items())
+    for query in ["s3 storage", "serverless database", "glacier archive", "edge"]:
+        results = index.search(query)
+        expected = bm25(DOCS, query)
+        assert dict(results) == pytest.approx(expected)
+        assert [score for _, score in results] == sorted(expected.values(), reverse=True)
+    assert index.search("kubernetes") == []
+    assert index.search("s3", limit=1)[0][0] in (0, 2)
+
+
+def test_common_terms_only_rerank_the_questions_found():
+    index = SearchIndex.build(DOCS.items())
+    # "which" is in every question, it does not add the questions without "fargate"
+    assert [idx for idx, _ in index.search("which fargate")] == [1]
+    assert len(index.search("which")) == len(DOCS)
+
+
+def test_updates_match_a_rebuild():
+    index = SearchIndex.build(DOCS.items())
+    docs = dict(DOCS)
+    index.update(3, docs[3], "Which database is a key-value store? DynamoDB")
+    docs[3] = "Which database is a key-value store? DynamoDB"
+    index.update(4, docs[4], docs[4])
+    rebuilt = SearchIndex.build(docs.items())
+    assert index.postings == rebuilt.postings
+    assert index.total_length == rebuilt.total_length
+    assert index.search("serverless") == []
+    assert index.search("dynamodb")[0][0] == 3
+
+
+def test_the_cache_is_keyed_by_the_data_hash(tmp_path):
+    path = tmp_path / "data.search"
+    index = SearchIndex.build(DOCS.items())
+    index.save(path, "abc")
+    loaded = SearchIndex.load(path, "abc")
+    assert loaded.search("s3 storage") == index.search("s3 storage")
+    assert SearchIndex.load(path, "other") is None
+    assert SearchIndex.load(tmp_path / "missing.search", "abc") is None
+    path.write_bytes(b"not a pickle")
+    assert SearchIndex.load(path, "abc") is None
+
+
+def test_question_text_includes_options_and_explanation():
+    text = question_text({"question": "Q", "options": ["A", "B"], "explination": None})
+    assert text == "Q\nA\nB\n"
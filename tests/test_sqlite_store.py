@@ -0,0 +1,119 @@
+import json
+import sqlite3
+
+import pytest
+
+from src.attempt_history import AttemptHistory
+from src.sqlite_store import SqliteStore, import_json
+
+QUESTION = {
+    "question": "Question 1\nWhich service?",
+    "options": ["S3", "EC2", "RDS"],
+    "answers": [0],
+    "explination": "S3 stores objects",
+    "tags": ["s3", "storage"],
+    "source": "video",
+    "total_times_question_attempted": 2,
+    "correct_times_question_attempted": 1,
+    "current_probability": 0.4,
+    "attempt_history": "2:1",
+}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SqliteStore(tmp_path / "data.db")
+    store.import_questions([QUESTION, {"question": "Question 2", "options": ["A"], "answers": []}])
+    yield store
+    store.close()
+
+
+def test_imported_questions_load_back(store):
+    ques = store.load(0)
+    assert {key: ques[key] for key in QUESTION} == QUESTION
+    assert store.load(1)["attempt_history"] == "0:0"
+    assert store.tags() == {0: ["s3", "storage"]}
+    assert store.questions_with_tag("s3") == [0]
+    assert store.histories() == {0: AttemptHistory([False, True])}
+    with pytest.raises(IndexError):
+        store.load(2)
+
+
+def test_saving_an_answer_adds_one_attempt(store):
+    ques = store.load(0)
+    history = AttemptHistory.from_json(ques["attempt_history"])
+    history.append(True)
+    store.save(0, {
+        **ques,
+        "total_times_question_attempted": 3,
+        "correct_times_question_attempted": 2,
+        "current_probability": 0.2,
+        "attempt_history": history.to_json(),
+    })
+    ques = store.load(0)
+    assert ques["attempt_history"] == history.to_json()
+    assert (ques["total_times_question_attempted"], ques["correct_times_question_attempted"]) == (3, 2)
+    assert store.probabilities() == [0.2, 0]
+    attempted_at = store._conn.execute("SELECT attempted_at FROM attempts ORDER BY id").fetchall()
+    assert [time is not None for time, in attempted_at] == [False, False, True]
+
+
+def test_saving_edits_tags_answers_and_other_fields(store):
+    ques = store.load(0)
+    store.save(0, {
+        **ques,
+        "tags": ["storage", "s3-glacier"],
+        "answers": [0, 2],
+        "explination": "see the docs",
+        "source": "html",
+        "attempt_history": "3:5",
+    })
+    ques = store.load(0)
+    assert ques["tags"] == ["storage", "s3-glacier"]
+    assert ques["answers"] == [0, 2]
+    assert (ques["explination"], ques["source"]) == ("see the docs", "html")
+    # a history that is not one more attempt is rewritten
+    assert ques["attempt_history"] == "3:5"
+    assert store.questions_with_tag("s3") == []
+
+
+def test_save_stats_only_writes_the_given_columns(store):
+    store.save_stats({1: {"ease": 2.5, "due_at": 10.0}})
+    assert store.column("ease") == [0, 2.5]
+    assert store.load(1)["total_times_question_attempted"] == 0
+    with pytest.raises(ValueError):
+        store.column("question")
+
+
+def test_invalid_records_are_rejected(store):
+    with pytest.raises(ValueError):
+        store._apply({"index": 0, "op": "rename"})
+
+
+def test_a_database_of_the_first_schema_gets_the_new_columns(tmp_path):
+    path = tmp_path / "old.db"
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE questions (
+            id INTEGER PRIMARY KEY, question TEXT NOT NULL, answers TEXT NOT NULL, options TEXT NOT NULL,
+            explination TEXT, topic TEXT, views TEXT, extra TEXT NOT NULL DEFAULT '{}',
+            total_times_question_attempted INTEGER NOT NULL DEFAULT 0,
+            correct_times_question_attempted INTEGER NOT NULL DEFAULT 0,
+            current_probability REAL NOT NULL DEFAULT 0
+        );
+        INSERT INTO questions (id, question, answers, options) VALUES (0, 'Question 1', '[0]', '["A"]');
+    """)
+    conn.close()
+    store = SqliteStore(path)
+    assert store.column("ease") == [0]
+    assert store.load(0)["repetitions"] == 0
+    store.close()
+
+
+def test_import_json(tmp_path):
+    bank = tmp_path / "data.json"
+    bank.write_text(json.dumps([QUESTION] * 3))
+    assert import_json(tmp_path / "data.db", [bank, bank]) == 6
+    store = SqliteStore(tmp_path / "data.db")
+    assert len(store) == 6
+    store.close()
@@ -0,0 +1,100 @@
+import json
+
+import pytest
+
+from src.stats_store import StatsStore
+from src.storage import JsonStore
+
+COLUMNS = (("total", "i"), ("probability", "d"))
+
+
+def seed(idx: int) -> dict:
+    return {"total": idx, "probability": idx / 10}
+
+
+def test_values_are_written_in_place_and_survive_a_reopen(tmp_path):
+    path = tmp_path / "data.stats"
+    store = StatsStore(path, 3, seed, COLUMNS, fingerprint="abc")
+    assert store.column("total").tolist() == [0, 1, 2]
+    store.set(1, {"total": 7, "unknown": 1})
+    assert store.get(1) == {"total": 7, "probability": 0.1}
+    store.close()
+
+    seeded = []
+    store = StatsStore(path, 3, lambda idx: seeded.append(idx) or seed(idx), COLUMNS, fingerprint="abc")
+    assert seeded == []
+    assert store.column("total").tolist() == [0, 7, 2]
+    with pytest.raises(IndexError):
+        store.get(3)
+    store.close()
+
+
+def test_append_grows_the_file(tmp_path):
+    store = StatsStore(tmp_path / "data.stats", 1, seed, COLUMNS)
+    for idx in range(1, 10):
+        store.append(seed(idx))
+    assert len(store) == 10
+    assert store.column("probability").tolist() == pytest.approx([idx / 10 for idx in range(10)])
+    snapshot = store.snapshot()
+    store.set(0, {"total": 99})
+    assert snapshot["total"][0] == 0
+    store.close()
+
+
+def test_new_questions_are_seeded_on_open(tmp_path):
+    path = tmp_path / "data.stats"
+    StatsStore(path, 2, seed, COLUMNS).close()
+    store = StatsStore(path, 4, lambda idx: {"total": 100 + idx}, COLUMNS)
+    assert store.column("total").tolist() == [0, 1, 102, 103]
+    store.close()
+
+
+@pytest.mark.parametrize("change", [
+    {"fingerprint": "other data"},
+    {"count": 2},
+    {"columns": (("total", "i"),)},
+    {"columns": (("total", "q"), ("probability", "d"))},
+])
+def test_the_file_is_reseeded_when_it_does_not_match(tmp_path, change):
+    path = tmp_path / "data.stats"
+    store = StatsStore(path, 3, seed, COLUMNS, fingerprint="abc")
+    store.set(0, {"total": 42})
+    store.close()
+    options = {"count": 3, "columns": COLUMNS, "fingerprint": "abc", **change}
+    store = StatsStore(path, options["count"], seed, options["columns"], fingerprint=options["fingerprint"])
+    assert store.get(0)["total"] == 0
+    store.close()
+
+
+def test_set_fingerprint_is_kept_across_a_reopen(tmp_path):
+    path = tmp_path / "data.stats"
+    store = StatsStore(path, 2, seed, COLUMNS, fingerprint="old")
+    store.set(1, {"total": 5})
+    store.set_fingerprint("new")
+    store.close()
+    store = StatsStore(path, 2, seed, COLUMNS, fingerprint="new")
+    assert store.get(1)["total"] == 5
+    store.close()
+    with pytest.raises(ValueError):
+        StatsStore(tmp_path / "other.stats", 1, seed, COLUMNS, fingerprint="x" * 33)
+
+
+def test_json_store_reseeds_the_stats_of_a_replaced_data_file(tmp_path):
+    data = tmp_path / "data.json"
+    questions = [
+        {"question": f"Question {i}", "options": ["A"], "answers": [0], "total_times_question_attempted": i}
+        for i in range(3)
+    ]
+    data.write_text(json.dumps(questions))
+    store = JsonStore(data)
+    store.save_stats({0: {"total_times_question_attempted": 9}})
+    store.close()
+    # the stats are merged into the data file and still match it
+    store = JsonStore(data)
+    assert store.column("total_times_question_attempted") == [9, 1, 2]
+    store.close()
+
+    data.write_text(json.dumps(questions[::-1]))
+    store = JsonStore(data)
+    assert store.column("total_times_question_attempted") == [2, 1, 0]
+    store.close()
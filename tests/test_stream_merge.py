@@ -0,0 +1,64 @@
+import json
+
+import pytest
+
+from preprocessing import stream_merge
+from preprocessing.find_missing import sort_json_on_ques_no
+from preprocessing.stream_merge import iter_records, merge_banks, sorted_records, write_records
+
+
+def record(number, text="Which one?", answers=(0,)) -> dict:
+    return {"question": f"Question #{number}\n\n{text}", "options": ["A", "B"], "answers": list(answers)}
+
+
+def numbers(records) -> list[int | None]:
+    return [stream_merge.question_number(record) for record in records]
+
+
+def test_iter_records_reads_records_across_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(stream_merge, "READ_SIZE", 16)
+    records = [record(i, "x" * i) for i in range(1, 30)]
+    path = tmp_path / "bank.json"
+    path.write_text(json.dumps(records, indent=4))
+    assert list(iter_records(path)) == records
+    jsonl = tmp_path / "bank.jsonl"
+    assert write_records(jsonl, records) == len(records)
+    assert list(iter_records(jsonl)) == records
+    empty = tmp_path / "empty.json"
+    empty.write_text("[]")
+    assert list(iter_records(empty)) == []
+
+
+def test_sorted_records_spills_runs_and_keeps_ties_in_order(tmp_path):
+    first, second = tmp_path / "first.json", tmp_path / "second.jsonl"
+    write_records(first, [record(5), record(3, "first"), {"question": "Unnumbered", "options": [], "answers": []}])
+    write_records(second, [record(3, "second"), record(1), record(4)])
+    merged = list(sorted_records([first, second], chunk_size=2))
+    assert numbers(merged) == [1, 3, 3, 4, 5, None]
+    assert [r["question"].endswith("first") for r in merged[1:3]] == [True, False]
+
+
+def test_invalid_records_are_dropped_or_raise(tmp_path, capsys):
+    path = tmp_path / "bank.json"
+    write_records(path, [record(1), record(2, answers=[5]), "not a question"])
+    assert numbers(sorted_records([path])) == [1]
+    assert "answer out of the range" in capsys.readouterr().err
+    with pytest.raises(ValueError):
+        list(sorted_records([path], strict=True))
+
+
+def test_sorting_in_place_keeps_the_invalid_records(tmp_path):
+    path = tmp_path / "data.json"
+    write_records(path, [record(2), record(1, answers=[7]), record(1)])
+    assert sort_json_on_ques_no(path) == 2
+    assert numbers(iter_records(path)) == [1, 2]
+    assert list(iter_records(tmp_path / "data.rejected.jsonl")) == [record(1, answers=[7])]
+
+
+def test_merging_into_a_new_file_leaves_no_rejected_file(tmp_path):
+    source = tmp_path / "bank.json"
+    write_records(source, [record(2), record(1)])
+    output = tmp_path / "merged.json"
+    assert merge_banks(output, [source], renumber_questions=True) == 2
+    assert numbers(iter_records(output)) == [1, 2]
+    assert not list(tmp_path.glob("*.rejected.jsonl"))
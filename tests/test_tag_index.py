@@ -0,0 +1,54 @@
+import random
+
+from src.scheduler import ProbabilityScheduler
+from src.tag_index import TagFilter, TagIndex
+
+
+def test_index_answers_and_or_queries():
+    index = TagIndex({0: ["s3", "iam"], 1: ["s3"], 2: ["vpc"], 4: ["iam", "s3", "vpc"]})
+    assert index.sorted_tags == ["iam", "s3", "vpc"]
+    assert index.questions(["s3", "iam"]) == [0, 1, 4]
+    assert index.questions(["s3", "iam"], match_all=True) == [0, 4]
+    assert index.questions(["kms"]) == []
+    assert index.questions([]) == []
+
+
+def test_updates_keep_the_sorted_tags_in_place():
+    index = TagIndex({0: ["s3"], 1: ["vpc"]})
+    sorted_tags = index.sorted_tags
+    index.update(1, ["iam", "vpc"])
+    index.update(0, [])
+    assert sorted_tags == ["iam", "vpc"]
+    assert index.questions(["s3"]) == []
+    assert index.questions(["iam", "vpc"], match_all=True) == [1]
+
+
+def test_filter_only_samples_matching_questions():
+    weights = [1.0, 1.0, 1.0, 1.0]
+    tag_filter = TagFilter(["s3"], False, [0, 2], weights)
+    random.seed(1)
+    assert {tag_filter.sample() for _ in range(200)} == {0, 2}
+
+    # a question that stops matching keeps its slot with no weight, a new one is appended
+    tag_filter.update(0, ["iam"], 1.0)
+    tag_filter.update(3, ["s3"], 2.0)
+    assert {tag_filter.sample() for _ in range(200)} == {2, 3}
+    tag_filter.update(2, [], 1.0)
+    tag_filter.update(3, [], 1.0)
+    assert tag_filter.sample() is None
+
+
+def test_match_all_filter():
+    tag_filter = TagFilter(["s3", "iam"], True, [], [1.0])
+    assert tag_filter.matches(["iam", "s3", "vpc"])
+    assert not tag_filter.matches(["s3"])
+
+
+def test_scheduler_falls_back_to_every_question_when_the_filter_is_empty():
+    scheduler = ProbabilityScheduler([0.5, 0.5, 0.5])
+    scheduler.set_filter(["s3"], False, [1])
+    assert {scheduler.next() for _ in range(50)} == {1}
+    scheduler.update(1, {"current_probability": 0.5, "tags": []})
+    assert {scheduler.next() for _ in range(200)} == {0, 1, 2}
+    scheduler.set_filter([], False, [])
+    assert scheduler.tag_filter is None